@@ -1,4 +1,38 @@
 # -*- coding: utf-8 -*-
 """Import future ... so the future is now ?
+
+Main classes are available from the package, their module is imported on
+first access (python 3.7+):
+
+    >>> import artron
+    >>> manager = artron.Manager(builder)
 """
 from __future__ import (absolute_import, print_function,)
+
+import importlib
+
+#: public name as key and module defining it as value
+_LAZY = {
+    'Manager': 'artron.manager',
+    'Task': 'artron.task',
+    'Result': 'artron.task',
+    'Worker': 'artron.worker',
+    'submit': 'artron.worker',
+    'Limit': 'artron.limits',
+    'plan': 'artron.planner',
+}
+
+__all__ = sorted(_LAZY)
+
+
+def __getattr__(name):
+    """Import the module of a public name on first access"""
+    if name not in _LAZY:
+        raise AttributeError("module 'artron' has no attribute %r" % name)
+    value = getattr(importlib.import_module(_LAZY[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
@@ -29,6 +29,13 @@ if PY2:
         """
         pass
 
+    from Queue import Queue, Empty as QueueEmpty
+
+    def http_server():
+        """Import HTTP server classes on demand, slow to import"""
+        from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+        return HTTPServer, BaseHTTPRequestHandler
+
 else:
     text_type = str
     string_types = (str,)
@@ -42,3 +49,10 @@ else:
     iteritems = lambda x: iter(x.items())
 
     TimeoutError = TimeoutError
+
+    from queue import Queue, Empty as QueueEmpty
+
+    def http_server():
+        """Import HTTP server classes on demand, slow to import"""
+        from http.server import HTTPServer, BaseHTTPRequestHandler
+        return HTTPServer, BaseHTTPRequestHandler
@@ -5,10 +5,334 @@ artron.graph
 
 artron graph management
 """
+# standard
+import array
+import collections
+
 # local
-from artron._py6 import iteritems, itervalues
+from artron._py6 import iteritems, itervalues, range_type
 from artron.task import Task
 
+
+class GraphError(Exception):
+    """Occurs when the tasks graph can't be run"""
+    pass
+
+
+class GraphCycleError(GraphError):
+    """Occurs when tasks require each other
+
+    Attributes:
+        path (list): task ids of the cycle, first and last are the same.
+    """
+    def __init__(self, path):
+        self.path = path
+        if len(path) == 2:
+            msg = "Task {} requires itself".format(path[0])
+        else:
+            msg = "Cycle detected: {}".format(' -> '.join(path))
+        super(GraphCycleError, self).__init__(msg)
+
+
+class GraphDependencyError(GraphError):
+    """Occurs when a task requires an unknown task
+
+    Attributes:
+        missing (dict): task id as key, list of unknown required ids as value.
+    """
+    def __init__(self, missing):
+        self.missing = missing
+        super(GraphDependencyError, self).__init__(
+            "Unknown requirements: {}".format('; '.join(
+                "{} requires {}".format(tid, ', '.join(requires))
+                for tid, requires in sorted(iteritems(missing))
+            ))
+        )
+
+
+def validate(tasks):
+    """Ensure pending tasks could all be run, in O(V+E).
+
+    Only tasks in state init are checked, as `Graph` does.
+
+    Args:
+        tasks (dict): dict with key as task id and value as task obj
+
+    Raises:
+        GraphDependencyError: If a task requires an unknown task id.
+        GraphCycleError: If tasks require each other, including self-loops.
+
+    Examples:
+        >>> task1 = Task('tid1', {}, 'func', require=['tid2'])
+        >>> task2 = Task('tid2', {}, 'func', require=['tid1'])
+        >>> validate({task1.tid: task1, task2.tid: task2})
+        Traceback (most recent call last):
+        ...
+        GraphCycleError: Cycle detected: tid1 -> tid2 -> tid1
+    """
+    requires = {}
+    missing = {}
+    for task_id, task in iteritems(tasks):
+        if task.state != Task.STATE_INIT:
+            continue
+        requires[task_id] = task.require or []
+        unknown = [tid for tid in requires[task_id] if tid not in tasks]
+        if unknown:
+            missing[task_id] = unknown
+
+    if missing:
+        raise GraphDependencyError(missing)
+
+    # iterative depth first search, vertices on the stack are grey
+    visiting, done = 1, 2
+    color = {}
+    for root in requires:
+        if root in color:
+            continue
+        color[root] = visiting
+        path = [root]
+        stack = [iter(requires[root])]
+        while stack:
+            for neighbour in stack[-1]:
+                # finished tasks are not part of the run
+                if neighbour not in requires:
+                    continue
+                if color.get(neighbour) == visiting:
+                    raise GraphCycleError(
+                        path[path.index(neighbour):] + [neighbour])
+                if neighbour not in color:
+                    color[neighbour] = visiting
+                    path.append(neighbour)
+                    stack.append(iter(requires[neighbour]))
+                    break
+            else:
+                color[path.pop()] = done
+                stack.pop()
+
+
+def order(tasks):
+    """Sort task ids so requirements come first, in O(V+E).
+
+    All tasks are sorted whatever their state. Requirements unknown in
+    `tasks` are ignored and tasks in a cycle are left out.
+
+    Args:
+        tasks (dict): dict with key as task id and value as task obj
+
+    Returns:
+        list: task ids in topological order.
+
+    Examples:
+        >>> task1 = Task('tid1', {}, 'func', require=['tid2'])
+        >>> task2 = Task('tid2', {}, 'func')
+        >>> order({task1.tid: task1, task2.tid: task2})
+        ['tid2', 'tid1']
+    """
+    indegree = {}
+    childs = {}
+    for task_id, task in iteritems(tasks):
+        indegree[task_id] = 0
+        for r_tid in set(task.require or []):
+            if r_tid in tasks and r_tid != task_id:
+                indegree[task_id] += 1
+                childs.setdefault(r_tid, []).append(task_id)
+
+    ready = collections.deque(
+        task_id for task_id, count in iteritems(indegree) if not count)
+    ordered = []
+    while ready:
+        task_id = ready.popleft()
+        ordered.append(task_id)
+        for child in childs.get(task_id, ()):
+            indegree[child] -= 1
+            if not indegree[child]:
+                ready.append(child)
+    return ordered
+
+
+def levels(tasks):
+    """Group task ids by topological level, in O(V+E).
+
+    Tasks without known requirement are on level 0, others one level after
+    their deepest requirement. Tasks of a level could all run in parallel.
+
+    Args:
+        tasks (dict): dict with key as task id and value as task obj
+
+    Returns:
+        list: list of task ids by level.
+
+    Examples:
+        >>> levels(tasks)
+        [['for_test-tid3', 'for_test-tid4'], ['for_test-tid2'],
+         ['for_test-tid1']]
+    """
+    depth = {}
+    grouped = []
+    for task_id in order(tasks):
+        level = max([depth[r_tid] + 1 for r_tid in tasks[task_id].require \
+            if r_tid in depth] or [0])
+        depth[task_id] = level
+        if level == len(grouped):
+            grouped.append([])
+        grouped[level].append(task_id)
+    return grouped
+
+
+def ancestors(tasks, task_ids):
+    """Task ids and all the tasks they require, in O(V+E).
+
+    Args:
+        tasks (dict): dict with key as task id and value as task obj
+        task_ids (iterable): task ids to start from.
+
+    Returns:
+        set: task ids, including `task_ids`.
+    """
+    seen = set()
+    stack = list(task_ids)
+    while stack:
+        task_id = stack.pop()
+        if task_id in seen or task_id not in tasks:
+            continue
+        seen.add(task_id)
+        stack.extend(tasks[task_id].require or [])
+    return seen
+
+
+def descendants(tasks, task_ids):
+    """Task ids and all the tasks requiring them, in O(V+E).
+
+    Args:
+        tasks (dict): dict with key as task id and value as task obj
+        task_ids (iterable): task ids to start from.
+
+    Returns:
+        set: task ids, including `task_ids`.
+    """
+    childs = {}
+    for task_id, task in iteritems(tasks):
+        for r_tid in task.require or []:
+            childs.setdefault(r_tid, []).append(task_id)
+
+    seen = set()
+    stack = list(task_ids)
+    while stack:
+        task_id = stack.pop()
+        if task_id in seen or task_id not in tasks:
+            continue
+        seen.add(task_id)
+        stack.extend(childs.get(task_id, ()))
+    return seen
+
+
+def select(tasks, targets=None, from_=None):
+    """Select the sub graph needed by `targets` and/or following `from_`.
+
+    Args:
+        tasks (dict): dict with key as task id and value as task obj
+        targets (Optional[list]): keep these tasks and their ancestors.
+        from_ (Optional[list]): keep these tasks and their descendants.
+
+    Returns:
+        set: selected task ids, all when both are None.
+
+    Raises:
+        ValueError: If a task id is unknown.
+
+    Examples:
+        >>> select(tasks, targets=['report'])
+        set(['report', 'download', 'parse'])
+        >>> select(tasks, from_=['parse'])
+        set(['report', 'parse'])
+    """
+    unknown = [task_id for task_id in (targets or []) + (from_ or []) \
+        if task_id not in tasks]
+    if unknown:
+        raise ValueError("Unknown task ids %s" % ', '.join(unknown))
+
+    selected = set(tasks)
+    if targets is not None:
+        selected &= ancestors(tasks, targets)
+    if from_ is not None:
+        selected &= descendants(tasks, from_)
+    return selected
+
+
+def transitive_reduction(tasks):
+    """Remove requirements of pending tasks implied by other requirements.
+
+    When a task requires `a` and `b`, and `b` already requires `a` (directly
+    or not), `a` is dropped from its `require`: tasks run in the same order.
+    Duplicated requirements are dropped too. Only paths through pending
+    tasks are followed, `require` of other tasks is left unchanged.
+
+    Each task with several requirements walks its ancestors down to its
+    earliest requirement in topological order, O(V.E) in the worst case but
+    close to linear on graphs with local dependencies. The graph must be
+    valid, see `validate`.
+
+    Args:
+        tasks (dict): dict with key as task id and value as task obj,
+            updated in place.
+
+    Returns:
+        dict: updated task id as key and number of removed requirements as
+            value, sum the values to get the number of removed edges.
+
+    Examples:
+        >>> task1.require
+        ['for_test-tid2', 'for_test-tid3', 'for_test-tid4']
+        >>> transitive_reduction(tasks)
+        {'for_test-tid1': 1}
+        >>> task1.require
+        ['for_test-tid2', 'for_test-tid3']
+    """
+    graph = CSRGraph(tasks)
+    pending, offsets, targets = graph.pending, graph.offsets, graph.targets
+
+    # position of pending vertices in topological order, requirements first
+    position = array.array('l', [0]) * pending
+    for rank, vertex in enumerate(graph._order()): # pylint: disable=protected-access
+        position[vertex] = rank
+
+    # seen[u] == stamp when u is reachable from the current task
+    seen = array.array('l', [0]) * len(graph)
+    removed = {}
+    for vertex in range_type(pending):
+        requires = targets[offsets[vertex]:offsets[vertex + 1]]
+        if len(requires) < 2:
+            continue
+
+        stamp = vertex + 1
+        # ancestors earlier than every pending requirement can't reach one
+        lowest = min([position[r_vtx] for r_vtx in requires \
+            if r_vtx < pending] or [0])
+        stack = [r_vtx for r_vtx in requires if r_vtx < pending]
+        while stack:
+            current = stack.pop()
+            for target in targets[offsets[current]:offsets[current + 1]]:
+                if seen[target] == stamp:
+                    continue
+                seen[target] = stamp
+                if target < pending and position[target] >= lowest:
+                    stack.append(target)
+
+        kept = []
+        for r_vtx in requires:
+            # implied by another requirement or duplicated
+            if seen[r_vtx] == stamp or seen[r_vtx] == -stamp:
+                continue
+            seen[r_vtx] = -stamp
+            kept.append(graph.ids[r_vtx])
+
+        task = tasks[graph.ids[vertex]]
+        if len(kept) < len(task.require):
+            removed[task.tid] = len(task.require) - len(kept)
+            task.require = kept
+    return removed
+
+
 class Graph(dict):
     """Graph class is an oriented graph are directed graphs having
     no bidirected edges.
@@ -160,3 +484,241 @@ class Graph(dict):
             # isolated node
             if not task.require:
                 yield (task.tid, task.tid,)
+
+
+class CSRGraph(object):
+    """Compact read-only graph for large runs.
+
+    Same vertices and edges as `Graph`: pending tasks and their
+    requirements, self-loops dropped. Task ids are interned to integers and
+    adjacency is stored in CSR arrays, both for requirements and childs, so
+    a vertex costs a few machine integers instead of a list per task.
+
+    Requirements of vertex `i` are `targets[offsets[i]:offsets[i + 1]]`,
+    childs are `rtargets[roffsets[i]:roffsets[i + 1]]`. Vertices of pending
+    tasks come first, required ids which are not pending tasks (finished or
+    unknown) are interned after them and have no requirement.
+
+    Args:
+        tasks (dict): dict with key as task id and value as task obj
+
+    Attributes:
+        size (int): Graph's tasks size.
+        ids (list): task id by vertex.
+        index (dict): vertex by task id.
+        pending (int): number of vertices of pending tasks.
+        offsets (array.array): start of requirements by vertex.
+        targets (array.array): required vertices.
+        roffsets (array.array): start of childs by vertex.
+        rtargets (array.array): child vertices.
+
+    Examples:
+        >>> graph = CSRGraph(tasks)
+        >>> graph.order()
+        ['for_test-tid3', 'for_test-tid4', 'for_test-tid2', 'for_test-tid1']
+        >>> sorted(graph.ancestors(['for_test-tid2']))
+        ['for_test-tid2', 'for_test-tid4']
+    """
+    def __init__(self, tasks):
+        self.size = len(tasks)
+        self.ids = [
+            task_id for task_id, task in iteritems(tasks) \
+                if task.state == Task.STATE_INIT
+        ]
+        self.index = dict((task_id, vertex) \
+            for vertex, task_id in enumerate(self.ids))
+        self.pending = len(self.ids)
+
+        # rows are appended in vertex order, unknown ids interned after
+        ids, index = self.ids, self.index
+        offsets = self.offsets = array.array('l', [0])
+        targets = self.targets = array.array('i')
+        for vertex in range_type(self.pending):
+            for r_tid in tasks[ids[vertex]].require or []:
+                target = index.get(r_tid)
+                if target is None:
+                    target = index[r_tid] = len(ids)
+                    ids.append(r_tid)
+                if target != vertex:
+                    targets.append(target)
+            offsets.append(len(targets))
+        # interned requirements have no row
+        offsets.extend([len(targets)] * (len(ids) - self.pending))
+
+        # reverse edges with a counting sort on targets
+        counts = array.array('l', [0]) * (len(ids) + 1)
+        for target in targets:
+            counts[target + 1] += 1
+        for vertex in range_type(len(ids)):
+            counts[vertex + 1] += counts[vertex]
+        self.roffsets = array.array('l', counts)
+        rtargets = self.rtargets = array.array('i', [0]) * len(targets)
+        vertex = 0
+        for pos, target in enumerate(targets):
+            while offsets[vertex + 1] <= pos:
+                vertex += 1
+            rtargets[counts[target]] = vertex
+            counts[target] += 1
+
+    def __len__(self):
+        """Number of vertices"""
+        return len(self.ids)
+
+    def __contains__(self, task_id):
+        return task_id in self.index
+
+    def requires(self, task_id):
+        """Task ids required by a task.
+
+        Args:
+            task_id (str): task id.
+
+        Returns:
+            list: required task ids.
+        """
+        vertex = self.index[task_id]
+        return [self.ids[target] for target in \
+            self.targets[self.offsets[vertex]:self.offsets[vertex + 1]]]
+
+    def childs(self, task_id):
+        """Pending task ids requiring a task.
+
+        Args:
+            task_id (str): task id.
+
+        Returns:
+            list: task ids.
+        """
+        vertex = self.index[task_id]
+        return [self.ids[child] for child in \
+            self.rtargets[self.roffsets[vertex]:self.roffsets[vertex + 1]]]
+
+    def edges(self):
+        """Generate oriented graph's edges, as `Graph.edges`.
+
+        Yields:
+            tuple: a tuple of 2 vertices the edge ie. (A,B,)
+                   where A depends on B
+        """
+        for vertex in range_type(self.pending):
+            start, end = self.offsets[vertex], self.offsets[vertex + 1]
+            task_id = self.ids[vertex]
+            if start == end:
+                yield (task_id, task_id,)
+            for pos in range_type(start, end):
+                yield (task_id, self.ids[self.targets[pos]],)
+
+    def isolated_vertices(self):
+        """Generate pending task ids without requirement, as
+        `Graph.isolated_vertices`.
+
+        Yields:
+            str : isolated vertices.
+        """
+        for vertex in range_type(self.pending):
+            if self.offsets[vertex] == self.offsets[vertex + 1]:
+                yield self.ids[vertex]
+
+    def _order(self):
+        """Pending vertices in topological order, in O(V+E).
+
+        Requirements which are not pending tasks are satisfied, vertices in
+        a cycle are left out.
+
+        Returns:
+            array.array: vertices.
+        """
+        pending, offsets, targets = self.pending, self.offsets, self.targets
+        roffsets, rtargets = self.roffsets, self.rtargets
+
+        indegree = array.array('l', [0]) * pending
+        for vertex in range_type(pending):
+            for target in targets[offsets[vertex]:offsets[vertex + 1]]:
+                if target < pending:
+                    indegree[vertex] += 1
+
+        ordered = array.array('i', (
+            vertex for vertex in range_type(pending) if not indegree[vertex]))
+        # ordered is also the queue, read up to its growing end
+        head = 0
+        while head < len(ordered):
+            vertex = ordered[head]
+            head += 1
+            for child in rtargets[roffsets[vertex]:roffsets[vertex + 1]]:
+                indegree[child] -= 1
+                if not indegree[child]:
+                    ordered.append(child)
+        return ordered
+
+    def order(self):
+        """Sort pending task ids so requirements come first, as
+        `artron.graph.order`.
+
+        Returns:
+            list: task ids in topological order.
+        """
+        ids = self.ids
+        return [ids[vertex] for vertex in self._order()]
+
+    def levels(self):
+        """Group pending task ids by topological level, as
+        `artron.graph.levels`.
+
+        Returns:
+            list: list of task ids by level.
+        """
+        pending, offsets, targets = self.pending, self.offsets, self.targets
+        depth = array.array('l', [0]) * pending
+        grouped = []
+        for vertex in self._order():
+            level = 0
+            for target in targets[offsets[vertex]:offsets[vertex + 1]]:
+                if target < pending and depth[target] >= level:
+                    level = depth[target] + 1
+            depth[vertex] = level
+            if level == len(grouped):
+                grouped.append([])
+            grouped[level].append(self.ids[vertex])
+        return grouped
+
+    def _walk(self, task_ids, offsets, targets):
+        """Vertices reachable from `task_ids`, with a bitmap of visited
+        vertices.
+
+        Returns:
+            set: task ids, including `task_ids`.
+        """
+        seen = bytearray(len(self))
+        stack = [self.index[task_id] for task_id in task_ids \
+            if task_id in self.index]
+        found = []
+        while stack:
+            vertex = stack.pop()
+            if seen[vertex]:
+                continue
+            seen[vertex] = 1
+            found.append(vertex)
+            stack.extend(targets[offsets[vertex]:offsets[vertex + 1]])
+        return set(self.ids[vertex] for vertex in found)
+
+    def ancestors(self, task_ids):
+        """Task ids and all the task ids they require, in O(V+E).
+
+        Args:
+            task_ids (iterable): task ids to start from.
+
+        Returns:
+            set: task ids, including `task_ids`.
+        """
+        return self._walk(task_ids, self.offsets, self.targets)
+
+    def descendants(self, task_ids):
+        """Task ids and all the pending tasks requiring them, in O(V+E).
+
+        Args:
+            task_ids (iterable): task ids to start from.
+
+        Returns:
+            set: task ids, including `task_ids`.
+        """
+        return self._walk(task_ids, self.roffsets, self.rtargets)
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+artron.incremental
+~~~~~~~~~~~~~~~~~~
+
+artron incremental runs based on task fingerprints
+"""
+# standard
+import os
+import json
+import hashlib
+import logging
+
+# local
+from artron.task import Task, canonical
+from artron.graph import order
+
+LOGGER = logging.getLogger(__name__)
+
+
+def fingerprints(tasks):
+    """Compute the fingerprint of each task, in O(V+E).
+
+    A fingerprint is a hash of the task `func`, its `inputs` and the
+    fingerprints of its requirements, so any change upstream changes the
+    fingerprints of all descendants.
+
+    Tasks with inputs which are not plain JSON, see `artron.task.canonical`,
+    have no fingerprint: they and their descendants always run.
+
+    Args:
+        tasks (dict): dict with key as task id and value as task obj
+
+    Returns:
+        dict: task id as key and fingerprint, or None, as value.
+    """
+    prints = {}
+    for task_id in order(tasks):
+        task = tasks[task_id]
+        try:
+            content = json.dumps(
+                [task.func, canonical(task.inputs),
+                 [prints.get(r_tid) or '' \
+                    for r_tid in sorted(task.require or [])]],
+                sort_keys=True,
+            )
+        except TypeError:
+            prints[task_id] = None
+            continue
+        prints[task_id] = hashlib.sha1(content.encode('utf-8')).hexdigest()
+    return prints
+
+
+class Fingerprints(object):
+    """Fingerprints and results of successful tasks of previous runs.
+
+    They are stored in a JSON file. Tasks with results which can't be
+    serialized in JSON are not stored and always run.
+
+    Args:
+        path (str): JSON file path.
+
+    Attributes:
+        records (dict): task id as key and dict with 'fingerprint' and
+            'results' as value.
+
+    Examples:
+        >>> store = Fingerprints('.artron.json')
+        >>> store.load()
+        >>> prints, uptodate = store.plan(tasks)
+    """
+    def __init__(self, path):
+        self.path = path
+        self.records = {}
+
+    def load(self):
+        """Read records of the previous run, if any."""
+        if not os.path.exists(self.path):
+            self.records = {}
+            return
+        with open(self.path) as fd:
+            self.records = json.load(fd)
+
+    def save(self):
+        """Write records, atomically."""
+        tmp = '%s.%d.tmp' % (self.path, os.getpid())
+        with open(tmp, 'w') as fd:
+            json.dump(self.records, fd, sort_keys=True)
+        os.rename(tmp, self.path)
+
+    def plan(self, tasks):
+        """Find tasks which don't need to run again.
+
+        A task is up-to-date when its fingerprint is the recorded one and
+        all its requirements are up-to-date.
+
+        Args:
+            tasks (dict): dict with key as task id and value as task obj
+
+        Returns:
+            tuple: (fingerprints by task id, set of up-to-date task ids in
+                state init).
+        """
+        prints = fingerprints(tasks)
+        clean = set()
+        for task_id in order(tasks):
+            record = self.records.get(task_id)
+            if record is None or prints[task_id] is None \
+                    or record['fingerprint'] != prints[task_id]:
+                continue
+            if all(r_tid in clean for r_tid in tasks[task_id].require or []):
+                clean.add(task_id)
+
+        uptodate = set(task_id for task_id in clean \
+            if tasks[task_id].state == Task.STATE_INIT)
+        return prints, uptodate
+
+    def record(self, task, fingerprint):
+        """Record the end of a task.
+
+        Args:
+            task (artron.task.Task): finished task.
+            fingerprint (str): task fingerprint, None to never skip it.
+        """
+        if task.state != Task.STATE_SUCCESS or fingerprint is None:
+            self.records.pop(task.tid, None)
+            return
+        try:
+            json.dumps(task.results)
+        except (TypeError, ValueError):
+            LOGGER.debug("results of %s are not JSON, not recorded", task.tid)
+            self.records.pop(task.tid, None)
+            return
+        self.records[task.tid] = {
+            'fingerprint': fingerprint,
+            'results': task.results,
+        }
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+artron.limits
+~~~~~~~~~~~~~
+
+artron concurrency and rate limits by func or tag
+"""
+# standard
+import time
+import logging
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Limit(object):
+    """Limit on tasks of a func or a tag.
+
+    Args:
+        concurrency (Optional[int]): maximum number of tasks sent to workers
+            and not finished. Defaults to None, no limit.
+        rate (Optional[float]): maximum number of tasks sent by `per`
+            seconds, as a token bucket. Defaults to None, no limit.
+        per (float): rate period in seconds. Defaults to 1.
+        burst (Optional[int]): tasks which could be sent at once when no task
+            was sent for a while. Defaults to `rate`, at least 1.
+
+    Attributes:
+        running (int): number of tasks sent and not finished.
+        tokens (float): tasks which could be sent now according to `rate`.
+
+    Raises:
+        ValueError: If `concurrency` or `burst` is lower than 1 or if `rate`
+            is not positive.
+
+    Examples:
+        >>> Limit(concurrency=5, rate=100, per=60)
+    """
+    def __init__(self, concurrency=None, rate=None, per=1.0, burst=None):
+        if concurrency is not None and concurrency < 1:
+            raise ValueError("Wrong concurrency %s. Required >= 1." \
+                % concurrency)
+        if rate is not None and rate <= 0:
+            raise ValueError("Wrong rate %s. Required > 0." % rate)
+        # a task needs a whole token, a smaller bucket never allows one
+        if burst is None and rate is not None:
+            burst = max(1, rate)
+        if burst is not None and burst < 1:
+            raise ValueError("Wrong burst %s. Required >= 1." % burst)
+        self.concurrency = concurrency
+        self.rate = rate
+        self.per = float(per)
+        self.burst = burst
+        self.running = 0
+        self.tokens = float(self.burst or 0)
+        self._updated = time.time()
+
+    def _refill(self):
+        """Add tokens for the time elapsed since the last refill."""
+        now = time.time()
+        if self.rate is not None:
+            self.tokens = min(
+                float(self.burst),
+                self.tokens + (now - self._updated) * self.rate / self.per,
+            )
+        self._updated = now
+
+    def allows(self):
+        """Could a task be sent now
+
+        Returns:
+            bool: True if neither concurrency nor rate is exceeded.
+        """
+        if self.concurrency is not None and self.running >= self.concurrency:
+            return False
+        if self.rate is not None:
+            self._refill()
+            if self.tokens < 1:
+                return False
+        return True
+
+    def acquire(self):
+        """A task is sent."""
+        self.running += 1
+        if self.rate is not None:
+            self.tokens -= 1
+
+    def release(self):
+        """A task is finished."""
+        self.running -= 1
+
+    def delay(self):
+        """Seconds until the rate allows a new task.
+
+        Returns:
+            float: 0 if a token is available or without rate.
+        """
+        if self.rate is None:
+            return 0.0
+        self._refill()
+        return max(0.0, (1 - self.tokens) * self.per / self.rate)
+
+
+class Limiter(object):
+    """Apply `Limit` objects to tasks by func or by tag.
+
+    Args:
+        limits (dict): func name or tag as key and `Limit` as value.
+
+    Attributes:
+        limits (dict): func name or tag as key and `Limit` as value.
+        running (dict): limit keys of sent tasks not finished, by task id.
+
+    Raises:
+        ValueError: If a value is not a `Limit`.
+
+    Examples:
+        >>> limiter = Limiter({'call_api': Limit(concurrency=5)})
+        >>> limiter.blocking(task)
+        >>> limiter.acquire(task)
+    """
+    def __init__(self, limits):
+        for key, limit in limits.items():
+            if not isinstance(limit, Limit):
+                raise ValueError("Wrong type %s for limit %s. Required "\
+                    "artron.limits.Limit." % (type(limit).__name__, key))
+        self.limits = dict(limits)
+        self.running = {}
+
+    def keys(self, task):
+        """Limit keys which apply to a task.
+
+        Args:
+            task (artron.task.Task): task.
+
+        Returns:
+            list: func and tags of the task with a limit.
+        """
+        keys = [task.func] + list(getattr(task, 'tags', None) or [])
+        return [key for key in keys if key in self.limits]
+
+    def blocking(self, task):
+        """First limit key which doesn't allow the task now.
+
+        Args:
+            task (artron.task.Task): task to send.
+
+        Returns:
+            str: limit key, None if the task could be sent.
+        """
+        for key in self.keys(task):
+            if not self.limits[key].allows():
+                return key
+        return None
+
+    def acquire(self, task):
+        """Count a task sent in its limits.
+
+        Args:
+            task (artron.task.Task): task sent.
+        """
+        keys = self.keys(task)
+        if not keys:
+            return
+        for key in keys:
+            self.limits[key].acquire()
+        self.running[task.tid] = keys
+
+    def release(self, task_id):
+        """Count a task finished in its limits.
+
+        Args:
+            task_id (str): task id.
+        """
+        for key in self.running.pop(task_id, ()):
+            self.limits[key].release()
+
+    def delay(self, keys):
+        """Seconds until one of the rate limits of `keys` allows a task.
+
+        Args:
+            keys (iterable): limit keys.
+
+        Returns:
+            float: delay, None without rate limit waiting.
+        """
+        delays = [self.limits[key].delay() for key in keys \
+            if self.limits[key].rate is not None]
+        delays = [delay for delay in delays if delay > 0]
+        return min(delays) if delays else None
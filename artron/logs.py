@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+artron.logs
+~~~~~~~~~~~
+
+artron worker logs sent through a queue to the manager process
+"""
+# standard
+import os
+import logging
+import logging.handlers
+
+# python 3.2+, workers log directly to their own handlers otherwise
+# pylint: disable=invalid-name
+QueueHandler = getattr(logging.handlers, 'QueueHandler', None)
+QueueListener = getattr(logging.handlers, 'QueueListener', None)
+
+#: logger of the package, its handlers only run in the manager process
+NAME = 'artron'
+
+_CONFIGURED = {'done': False}
+
+
+def configure():
+    """Log `artron` records to stderr at $ARTRON_LEVEL, ERROR by default.
+
+    Done once, when a run starts rather than on import, so importing artron
+    doesn't load `logging.config`. Nothing is done if the application set
+    up logging already: a level or handlers on the `artron` logger, or
+    handlers on the root logger.
+    """
+    if _CONFIGURED['done']:
+        return
+    _CONFIGURED['done'] = True
+
+    logger = logging.getLogger(NAME)
+    if logger.handlers or logger.level != logging.NOTSET \
+            or logging.getLogger().handlers:
+        return
+
+    from logging import config as logging_config
+
+    level = os.environ.get('ARTRON_LEVEL', 'ERROR').upper()
+    logging_config.dictConfig({
+        'version': 1,
+        'disable_existing_loggers': False,
+        'formatters': {
+            'simple': {
+                '()': 'logging.Formatter',
+                'format': 'artron: [%(levelname)s] %(message)s'
+            }
+        },
+        'handlers': {
+            'console':{
+                'level': level,
+                'class': 'logging.StreamHandler',
+                'formatter': 'simple'
+            }
+        },
+        'loggers': {
+            NAME: {
+                'level': level,
+                'handlers': ['console']
+            }
+        }
+    })
+
+
+def redirect(queue, name=NAME):
+    """Send records of `name` logger to `queue` instead of its handlers.
+
+    Called in a worker process. Records below the logger level are dropped
+    before being formatted, the others are formatted once and sent without
+    waiting for any handler I/O.
+
+    Args:
+        queue (multiprocessing.Manager.Queue): queue read by `LogListener`.
+        name (str): logger name. Defaults to 'artron'.
+
+    Returns:
+        logging.Handler: the queue handler, None if not available.
+    """
+    if QueueHandler is None:
+        return None
+    logger = logging.getLogger(name)
+    handler = QueueHandler(queue)
+    for old in list(logger.handlers):
+        logger.removeHandler(old)
+    logger.addHandler(handler)
+    logger.propagate = False
+    return handler
+
+
+class _Relay(logging.Handler):
+    """Give each record to the logger which created it, in this process."""
+
+    def emit(self, record):
+        logging.getLogger(record.name).handle(record)
+
+
+class LogListener(object):
+    """Handle records sent by workers with the handlers of the manager.
+
+    A thread reads `queue` and gives each record to the logger of the same
+    name in this process, so it goes through the handlers of this logger
+    and of its parents up to the root logger, each handler filters on its
+    level.
+
+    Args:
+        queue (multiprocessing.Manager.Queue): queue workers log to.
+
+    Examples:
+        >>> listener = LogListener(queue)
+        >>> listener.start()
+        >>> redirect(queue)  # in each worker
+        >>> listener.stop()
+    """
+    def __init__(self, queue):
+        self.queue = queue
+        self.listener = None
+
+    def start(self):
+        """Start handling records in a thread."""
+        if QueueListener is None or self.listener is not None:
+            return
+        self.listener = QueueListener(self.queue, _Relay())
+        self.listener.start()
+
+    def stop(self):
+        """Handle records left in the queue and stop the thread."""
+        if self.listener is None:
+            return
+        self.listener.stop()
+        self.listener = None
@@ -6,43 +6,30 @@ atron.manager
 # standard
 import os
 import time
+import heapq
+import threading
+import collections
 import multiprocessing
 
 import logging
-import logging.config
-import logging.handlers
 
 # local
 from artron import utils
-from artron.task import Task
-from artron.graph import Graph
+from artron.task import Task, Barrier
+from artron.graph import validate, select, transitive_reduction, order, \
+    GraphDependencyError
+from artron.incremental import Fingerprints
+from artron.limits import Limiter
+from artron.logs import LogListener, QueueListener, configure
+from artron.planner import chains
+from artron.report import Report
+from artron.serializer import PickleSerializer
+from artron.scheduler import Scheduler, LazyTasks
 from artron.worker import Worker
-from artron._py6 import range_type, TimeoutError
+from artron.metrics import Metrics, MetricsExporter, FINAL_STATES
+from artron._py6 import range_type, TimeoutError, QueueEmpty
 
 
-logging.config.dictConfig({
-    'version': 1,
-    'disable_existing_loggers': False,
-    'formatters': {
-        'simple': {
-            '()': 'logging.Formatter',
-            'format': 'artron: [%(levelname)s] %(message)s'
-        }
-    },
-    'handlers': {
-        'console':{
-            'level': os.environ.get('ARTRON_LEVEL', 'ERROR').upper(),
-            'class': 'logging.StreamHandler',
-            'formatter': 'simple'
-        }
-    },
-    'loggers': {
-        'artron': {
-            'level': os.environ.get('ARTRON_LEVEL', 'ERROR').upper(),
-            'handlers': ['console']
-        }
-    }
-})
 LOGGER = logging.getLogger(__name__)
 
 
@@ -50,17 +37,52 @@ class Manager(object): # pylint: disable=too-many-instance-attributes
     """Manager class is the central piece of Artron.
     It takes care of creating, start and queueing jobs.
 
+    Tasks are kept in this process until `start`, which spawns the server
+    of queues and tasks shared with workers. Accessing `queue`, `events`,
+    `logs`, `workers` or `inboxes` before starts it too.
+
     Attributes:
         builder (obj): Builder object with the `func` to run.
+        events (multiprocessing.Manager.Queue): task state changes sent by
+            workers.
+        logs (multiprocessing.Manager.Queue): log records sent by workers,
+            handled by the `artron` logger handlers of this process during
+            `start`. None without `logging.handlers.QueueListener`.
+        address (tuple): (host, port) served to remote workers, None when
+            running only local workers.
+        exporter (artron.metrics.MetricsExporter): metrics publisher, None
+            when neither `metrics_path` nor `metrics_port` is set.
+        fingerprints (artron.incremental.Fingerprints): records of previous
+            runs, None unless `incremental` is set.
+        generators (list): `artron.scheduler.LazyTasks` registered with
+            `generate` or `map`.
+        report (artron.report.Report): JSON lines report, None when
+            `report` is not set.
+        limiter (artron.limits.Limiter): limits by func or tag, None when
+            `limits` is not set.
+        inboxes (collections.OrderedDict): worker name as key and its own
+            queue as value, empty unless `steal` is set.
+        affinities (dict): task affinity key as key and worker name as value.
+        aborted_by (str): id of the failed task which aborted the run, None
+            if the run was not aborted.
+        values (dict): results of finished tasks still used as input by
+            pending tasks, task id as key.
         lock (multiprocessing.Lock): Lock on ressource access.
         max_retry (int): Number of retry when task fail.
+        metrics (artron.metrics.Metrics): live run counters.
+        scheduler (artron.scheduler.Scheduler): dependencies of the run.
         progress (obj): Progress bar.
         queue (multiprocessing.Manager.Queue): queue can be shared between
             subprocesses.
+        remote_workers (set): names of remote workers connected.
+        server (artron.remote.RemoteManager): server of queue and tasks when
+            `address` is set.
         sleep (int): sleep value in seconds when iterating edges.
         tasks (multiprocessing.managers.DictProxy): shared dict object and
             return a proxy for it.
         timeout (int): timestamp when timeout will be triggered.
+        uptodate (set): task ids not run because unchanged since the
+            previous run.
         workers (list):  list of `artron.worker.Worker`
 
     Args:
@@ -71,56 +93,314 @@ class Manager(object): # pylint: disable=too-many-instance-attributes
             subprocesses.
         run_timeout (int): number of seconds for timeout. Will be added to
             attribute timeout with current timestamp.
-        sleep (int): sleep value itasks (multiprocessing.managers.DictProxy):
-            shared dict object and return a proxy for it.tasks=None
+        sleep (int): sleep value in seconds when iterating edges.
+        tasks (multiprocessing.managers.DictProxy): shared dict object and
+            return a proxy for it. An iterable of `artron.task.Task` is
+            loaded in bulk with `add_many`.
         max_retry (int): Number of retry when task fail.
-        progress (obj): Progress bar.
+        progress (obj): Progress bar, updated from task events. Its
+            `set_postfix_str` method, if any, receives the ETA.
+        metrics_path (Optional[str]): textfile-collector file where metrics
+            are written during the run. Defaults to None.
+        metrics_port (Optional[int]): serve metrics over HTTP on this local
+            port during the run. Defaults to None.
+        metrics_interval (int): seconds between two metrics file writes.
+        steal (bool): give each worker its own queue. Tasks released by a
+            worker are sent to its queue and idle workers steal tasks from
+            others. Defaults to False.
+        prefetch (int): number of task ids each worker fetches while a task
+            runs, hides the queue round trip between short tasks. Defaults
+            to 0.
+        address (Optional[tuple]): (host, port) to serve queue and tasks on,
+            for workers started on other hosts with `artron-worker`.
+            Defaults to None.
+        authkey (Optional[bytes]): secret remote workers must send. Defaults
+            to $ARTRON_AUTHKEY.
+        limits (Optional[dict]): func name or task tag as key and
+            `artron.limits.Limit` as value. Ready tasks over a limit wait in
+            the manager while other ready tasks are sent. Defaults to None.
+        costs (Optional[dict]): estimated duration in seconds by task id or
+            func used for the ETA, see `artron.planner.cost_hints`. Defaults
+            to None, observed durations only.
+        report (Optional[str]): JSON lines file where each task is written
+            when it finishes, other tasks of the run at its end, then a
+            summary. `start` results have no 'tasks' then, so memory doesn't
+            grow with the run. Defaults to None.
+        fail_fast (bool): abort the run on the first failed task, running
+            tasks are terminated. Otherwise only the failure of a task with
+            `critical` set aborts the run. Defaults to False.
+        aging (int): number of tasks made ready after a task to be worth one
+            level of `artron.task.Task.priority`, so low priority tasks are
+            not starved. Defaults to 1000.
+        incremental (Optional[str]): JSON file where fingerprints of
+            successful tasks are stored. Tasks unchanged since the previous
+            run, with their requirements, are not run again. Defaults to None.
+        reduce_edges (bool): drop requirements implied by other ones before
+            the run, see `artron.graph.transitive_reduction`. The number of
+            removed edges is in `start` results. Defaults to False.
+        coalesce (bool): run only once tasks with the same `func` and
+            `inputs`, see `artron.task.Task.signature`. The other ones wait
+            for it and copy its state and results. The number of coalesced
+            tasks is in `start` results. Defaults to False.
+        serializer (Optional[artron.serializer.Serializer]): serialize
+            results used as input of other tasks. The manager forwards them
+            as is and deserializes them once, to write them back to `tasks`
+            when no pending task references them. Defaults to
+            `artron.serializer.PickleSerializer`, remote workers use it too.
 
 
     Examples:
         >>> manager = Manager(builder, max_retry=2)
+        >>> manager = Manager(builder, metrics_path='/var/lib/node/artron.prom')
+        >>> manager = Manager(builder, nb_workers=0, address=('', 50000),
+        ...                   authkey=b'secret')
+        >>> manager = Manager(builder, incremental='.artron.json')
+        >>> manager = Manager(builder, limits={
+        ...     'call_api': Limit(concurrency=5, rate=100, per=60),
+        ... })
     """
-    # pylint: disable=too-many-arguments
+    #: tasks a worker queue could have over the least loaded one before tasks
+    #: of its affinity keys go to other workers
+    AFFINITY_SLACK = 4
+
+    # pylint: disable=too-many-arguments,too-many-locals
     def __init__(self, builder, nb_workers=None, workers=None, queue=None, \
                  run_timeout=3600, sleep=1, tasks=None, max_retry=3, \
-                 progress=None):
+                 progress=None, metrics_path=None, metrics_port=None, \
+                 metrics_interval=15, steal=False, prefetch=0, \
+                 address=None, authkey=None, incremental=None, aging=1000, \
+                 limits=None, fail_fast=False, costs=None, report=None, \
+                 serializer=None, reduce_edges=False, coalesce=False):
         self.builder = builder
         self.nb_workers = nb_workers
-        self.queue = queue
+        self._queue = queue
         self.tasks = tasks
-        self.workers = workers
+        self._workers = workers
         self.timeout = time.time() + run_timeout
         self.sleep = sleep
         self.max_retry = max_retry
         self.progress = progress
+        self.metrics = Metrics()
+        self.exporter = None
+        self.aging = aging
+        self.scheduler = Scheduler(aging)
+        self.generators = []
+        self.address = None
+        self.server = None
+        self.remote_workers = set()
+        self._lazy = {}
+        self._forgotten = 0
+        self._generators_failed = 0
+        self.fingerprints = None
+        self.uptodate = set()
+        self._pruned = set()
+        self.fail_fast = fail_fast
+        self.reduce_edges = reduce_edges
+        self.coalesce = coalesce
+        # coalesced task id as key and task id run instead as value
+        self.aliases = {}
+        # task id ran by signature, number of aliases waiting by task id
+        self._signatures = {}
+        self._aliased = {}
+        self.costs = costs
+        # heap of (-chain duration, task id) for the ETA
+        self._chains = []
+        self.aborted_by = None
+        self._critical = set()
+        self.limiter = Limiter(limits) if limits else None
+        self.report = Report(report) if report else None
+        # tasks of the run already finished when it starts
+        self._settled = set()
+        # ready tasks waiting for a limit, by limit key
+        self._held = collections.OrderedDict()
+        # tasks sent to workers and not finished
+        self._sent = set()
+
+        if incremental:
+            self.fingerprints = Fingerprints(incremental)
+
+        if metrics_path or metrics_port is not None:
+            self.exporter = MetricsExporter(
+                self.metrics,
+                path=metrics_path,
+                port=metrics_port,
+                interval=metrics_interval,
+            )
 
         if self.nb_workers is None:
             self.nb_workers = multiprocessing.cpu_count()
 
-        mng = multiprocessing.Manager()
+        # tasks are kept in this process until the server starts
+        self._local = not hasattr(self.tasks, 'keys')
+        if self.tasks is None:
+            self.tasks = {}
 
-        if self.queue is None:
-            self.queue = mng.Queue()
+        # iterable of tasks, load them in bulk
+        elif self._local:
+            self.tasks = self._batch(self.tasks)
 
-        if self.tasks is None:
-            self.tasks = mng.dict()
+        # set lock on tasks access, shared once the server starts
+        self.lock = threading.RLock()
+
+        # one queue by worker to steal from each other
+        self._inboxes = collections.OrderedDict()
+        self._next_target = 0
+        self.affinities = {}
+        # tasks sent and not finished by worker queue
+        self._loads = {}
+        self._routed = {}
+        # dataflow: serialized results kept while pending tasks reference them
+        self.values = {}
+        self._consumers = {}
+        self._references = {}
+        self.serializer = serializer or PickleSerializer()
+
+        # server, queues and workers are created by `_connect`
+        self._connected = False
+        self._events = None
+        self._logs = None
+        self._options = {
+            'address': address,
+            'authkey': authkey,
+            'steal': steal,
+            'prefetch': prefetch,
+        }
+
+        # remote workers need the address before the run starts
+        if address is not None:
+            self._connect()
 
-        # set lock on tasks access
-        self.lock = mng.RLock()
+    def _connect(self):
+        """Start the server of queues and tasks shared with workers, then
+        create workers.
 
-        if self.workers is None:
-            self.workers = [
+        Done once, by `start` or on first access to an attribute which needs
+        the server, so tasks could be added, listed or planned without
+        spawning any process.
+        """
+        if self._connected:
+            return
+        self._connected = True
+        options = self._options
+
+        if options['address'] is None:
+            mng = multiprocessing.Manager()
+            new_queue, new_dict, new_lock = mng.Queue, mng.dict, mng.RLock
+            new_events = new_logs = mng.Queue
+        else:
+            mng = self._serve(options['address'], options['authkey'])
+            new_queue, new_dict, new_lock = \
+                mng.get_queue, mng.get_tasks, mng.get_lock
+            new_events, new_logs = mng.get_events, mng.get_logs
+
+        if self._queue is None:
+            self._queue = new_queue()
+
+        # tasks added before, sent in bulk
+        if self._local:
+            tasks = new_dict()
+            tasks.update(self.tasks)
+            self.tasks = tasks
+
+        self.lock = new_lock()
+
+        # task state changes pushed by workers
+        self._events = new_events()
+
+        # log records of workers, handled in this process
+        if QueueListener is not None:
+            self._logs = new_logs()
+
+        if self._workers is None:
+            names = ["worker-%d" % wid for wid in range_type(self.nb_workers)]
+            if options['steal']:
+                for name in names:
+                    self._inboxes[name] = new_queue()
+                    self._loads[name] = 0
+
+            self._workers = [
                 Worker(
                     self.builder,
-                    self.queue,
-                    "worker-%d" % wid,
+                    self._inboxes.get(name, self._queue),
+                    name,
                     self.tasks,
-                    max_retry,
+                    self.max_retry,
                     self.lock,
+                    events=self._events,
+                    update_childs=False,
+                    peers=([
+                        inbox for peer, inbox in self._inboxes.items() \
+                            if peer != name
+                    ] + [self._queue]) if options['steal'] else None,
+                    prefetch=options['prefetch'],
+                    serializer=self.serializer,
+                    logs=self._logs,
                 )
-                for wid in range_type(self.nb_workers)
+                for name in names
             ]
 
+    @property
+    def queue(self):
+        """multiprocessing.Manager.Queue: queue shared by workers."""
+        self._connect()
+        return self._queue
+
+    @property
+    def events(self):
+        """multiprocessing.Manager.Queue: task state changes sent by
+        workers."""
+        self._connect()
+        return self._events
+
+    @property
+    def logs(self):
+        """multiprocessing.Manager.Queue: log records sent by workers."""
+        self._connect()
+        return self._logs
+
+    @property
+    def workers(self):
+        """list: `artron.worker.Worker` of the run."""
+        self._connect()
+        return self._workers
+
+    @property
+    def inboxes(self):
+        """collections.OrderedDict: own queue of each worker."""
+        self._connect()
+        return self._inboxes
+
+    def _serve(self, address, authkey):
+        """Start the server of queue and tasks for remote workers.
+
+        Args:
+            address (tuple): (host, port) to listen on, port 0 for any.
+            authkey (Optional[bytes]): secret remote workers must send.
+
+        Returns:
+            artron.remote.RemoteManager: the started server.
+
+        Raises:
+            ValueError: If no `authkey` is given nor set in $ARTRON_AUTHKEY.
+        """
+        if authkey is None:
+            authkey = os.environ.get('ARTRON_AUTHKEY')
+        if not authkey:
+            raise ValueError("authkey is required to serve tasks on %s:%d" \
+                % tuple(address))
+        if not isinstance(authkey, bytes):
+            authkey = authkey.encode('utf-8')
+
+        # argparse, socket... only needed to serve remote workers
+        from artron.remote import RemoteManager
+
+        self.server = RemoteManager(address=tuple(address), authkey=authkey)
+        self.server.start()
+        self.address = self.server.address
+        self.server.get_config().update({'max_retry': self.max_retry})
+        LOGGER.debug("serve tasks on %s:%d", *self.address)
+        return self.server
+
     def add(self, task):
         """Add task to manager
 
@@ -131,10 +411,765 @@ class Manager(object): # pylint: disable=too-many-instance-attributes
         with self.lock:
             self.tasks[task.tid] = task
 
+    @staticmethod
+    def _batch(tasks):
+        """Check and index tasks locally before sending them.
+
+        Args:
+            tasks (iterable): `artron.task.Task` objects.
+
+        Returns:
+            dict: dict with key as task id and value as task obj
+
+        Raises:
+            ValueError: If an item is not a task or a task id is duplicated.
+        """
+        batch = {}
+        for task in tasks:
+            if not isinstance(task, Task):
+                raise ValueError("Wrong type %s. Required artron.task.Task." \
+                    % type(task).__name__)
+            if task.tid in batch:
+                raise ValueError("Duplicate task id %s" % task.tid)
+            batch[task.tid] = task
+        return batch
+
+    def add_many(self, tasks):
+        """Add tasks to manager in bulk
+
+        Tasks are checked and indexed locally, then sent with one lock
+        acquisition and one `update` on the shared dict, instead of a round
+        trip per task with `add`.
+
+        Args:
+            tasks (iterable): `artron.task.Task` objects to add.
+
+        Returns:
+            int: number of tasks added.
+
+        Raises:
+            ValueError: If an item is not a task or a task id is duplicated.
+
+        Examples:
+            >>> manager.add_many(
+            ...     Task('tid-%d' % idx, {'msg': idx}, 'func')
+            ...     for idx in range(200000)
+            ... )
+            200000
+        """
+        batch = self._batch(tasks)
+        with self.lock:
+            self.tasks.update(batch)
+        return len(batch)
+
+    def generate(self, tasks, window=None, require=None, keep=False):
+        """Add tasks materialized lazily during the run
+
+        Tasks are read from `tasks` only when all `require` tasks succeeded,
+        and only while less than `window` of them are not finished. Use it
+        for huge fan-outs which would not fit in memory.
+
+        Args:
+            tasks (iterable): `artron.task.Task` objects, usually a generator.
+                Their requirements must be known when they are materialized.
+            window (Optional[int]): maximum number of materialized tasks not
+                finished. Defaults to twice the number of workers.
+            require (Optional[list]): task ids which must succeed before the
+                first task is materialized. Defaults to None.
+            keep (bool): keep successful tasks in `tasks` and in the run
+                results. Otherwise they are removed once finished and only
+                counted. Defaults to False.
+
+        Returns:
+            artron.scheduler.LazyTasks: the registered generator.
+        """
+        if window is None:
+            window = 2 * self.nb_workers
+        lazy = LazyTasks(tasks, window, require=require, keep=keep,
+                         name='generator-%d' % len(self.generators))
+        self.generators.append(lazy)
+        return lazy
+
+    # pylint: disable=too-many-arguments
+    def map(self, name, func, inputs, require=None, window=None, keep=False):
+        """Run one `func` over an iterable of inputs, lazily
+
+        Task ids are `name` followed by the input index.
+
+        Args:
+            name (str): prefix of generated task ids.
+            func (str): function name to use on the `builder`.
+            inputs (iterable): kwargs to send to `func`, one dict per task.
+            require (Optional[list]): task ids which must succeed before the
+                first task is materialized. Defaults to None.
+            window (Optional[int]): maximum number of materialized tasks not
+                finished. Defaults to twice the number of workers.
+            keep (bool): keep successful tasks, see `generate`.
+
+        Returns:
+            artron.scheduler.LazyTasks: the registered generator.
+
+        Examples:
+            >>> manager.add(Task('download', {}, 'download'))
+            >>> manager.map(
+            ...     'process',
+            ...     'process',
+            ...     ({'path': path} for path in iter_files()),
+            ...     require=['download'],
+            ...     window=64,
+            ... )
+        """
+        lazy = self.generate(
+            (Task('%s-%d' % (name, idx), kwargs, func) \
+                for idx, kwargs in enumerate(inputs)),
+            window=window,
+            require=require,
+            keep=keep,
+        )
+        lazy.name = name
+        return lazy
+
+    def _generate(self):
+        """Materialize tasks of generators up to their window."""
+        for lazy in self.generators:
+            tasks = lazy.take(self.scheduler.states)
+            if lazy.failed:
+                LOGGER.error("%s stopped after %d tasks, requirement %s "\
+                    "failed", lazy.name, lazy.created, lazy.failed)
+                lazy.failed = None
+                self._generators_failed += 1
+            if not tasks:
+                continue
+
+            batch = self._submit(tasks, [])
+            for task in tasks:
+                if batch.get(task.tid) is not task:
+                    lazy.done()
+                    continue
+                self._lazy[task.tid] = lazy
+                # wrong or failed by dependency when submitted
+                state = self.scheduler.states[task.tid]
+                if state < Task.STATE_INIT:
+                    self._forget(task.tid, state)
+
+    def _generating(self):
+        """Is there any generator with tasks left
+
+        Returns:
+            bool: True if a generator could still create or run tasks.
+        """
+        return any(lazy.active for lazy in self.generators)
+
+    def _forget(self, task_id, state):
+        """Release a generated task from its generator.
+
+        Successful tasks are removed from `tasks` unless the generator keeps
+        them, and only counted, so memory stays bounded by the window. The
+        states of the last `window` ones are kept so the next generated
+        tasks could still require them, older states are dropped unless a
+        generator requires them.
+
+        Args:
+            task_id (str): task id.
+            state (int): final task state.
+        """
+        lazy = self._lazy.pop(task_id, None)
+        if lazy is None:
+            return
+        lazy.done()
+        # results still referenced are read by workers from tasks
+        if state == Task.STATE_SUCCESS and not lazy.keep \
+                and task_id not in self._consumers \
+                and not self._aliased.get(task_id):
+            with self.lock:
+                task = self.tasks.pop(task_id)
+            # a later task with the same signature runs again
+            signature = task.signature() if self.coalesce else None
+            if signature is not None \
+                    and self._signatures.get(signature) == task_id:
+                del self._signatures[signature]
+            self._forgotten += 1
+            lazy.recent.append(task_id)
+            if len(lazy.recent) > lazy.window:
+                old = lazy.recent.popleft()
+                if not any(old in other.require for other in self.generators):
+                    del self.scheduler.states[old]
+
+    def _plan(self, snapshot):
+        """Mark tasks unchanged since the previous run as successful.
+
+        Their results are restored from the previous run.
+
+        Args:
+            snapshot (dict): copy of `tasks`, updated in place.
+
+        Returns:
+            dict: fingerprints by task id, empty without `incremental`.
+        """
+        self.uptodate = set()
+        if self.fingerprints is None:
+            return {}
+
+        self.fingerprints.load()
+        prints, self.uptodate = self.fingerprints.plan(snapshot)
+        for task_id in self.uptodate:
+            task = snapshot[task_id]
+            task.state = Task.STATE_SUCCESS
+            task.require = []
+            task.results = self.fingerprints.records[task_id]['results']
+        with self.lock:
+            self.tasks.update(dict(
+                (task_id, snapshot[task_id]) for task_id in self.uptodate))
+        LOGGER.debug("%d tasks up-to-date", len(self.uptodate))
+        return prints
+
+    def _wire(self, task):
+        """Register `artron.task.Result` inputs and critical flag of a
+        pending task.
+
+        Args:
+            task (artron.task.Task): task in state init.
+        """
+        if getattr(task, 'critical', False):
+            self._critical.add(task.tid)
+        references = task.references()
+        if not references:
+            return
+        self._references[task.tid] = references
+        for r_tid in references:
+            self._consumers[r_tid] = self._consumers.get(r_tid, 0) + 1
+
+    def _unwire(self, task_id):
+        """Drop results no pending task references anymore.
+
+        Args:
+            task_id (str): task id which won't run anymore.
+        """
+        for r_tid in self._references.pop(task_id, ()):
+            self._consumers[r_tid] -= 1
+            if not self._consumers[r_tid]:
+                del self._consumers[r_tid]
+                self._restore(r_tid)
+
+    def _results(self, task_id):
+        """Results of a finished task.
+
+        Args:
+            task_id (str): task id.
+
+        Returns:
+            obj: results, deserialized when they are still only in `values`.
+        """
+        if task_id in self.values:
+            return self.serializer.loads(self.values[task_id])
+        with self.lock:
+            return self.tasks[task_id].results
+
+    def _restore(self, task_id):
+        """Write results only sent with the event of a task back to
+        `tasks`, once they are not sent to other tasks anymore.
+
+        Args:
+            task_id (str): task id.
+        """
+        if task_id not in self.values:
+            return
+        results = self.serializer.loads(self.values.pop(task_id))
+        with self.lock:
+            task = self.tasks[task_id]
+            task.results = results
+            self.tasks[task_id] = task
+
+    def _track(self, task_id, state):
+        """Record a task state change in scheduler and metrics.
+
+        Args:
+            task_id (str): task id.
+            state (int): new task state.
+        """
+        self.metrics.transition(self.scheduler.states.get(task_id), state)
+        self.scheduler.states[task_id] = state
+
+    def _coalesce(self, task):
+        """Make a pending task wait for a task with the same signature
+        instead of running.
+
+        The first pending task of a signature runs, later ones are aliases
+        of it while it's pending, running or successful.
+
+        Args:
+            task (artron.task.Task): task registered in the scheduler.
+
+        Returns:
+            str: task id run instead, None if `task` runs.
+        """
+        if isinstance(task, Barrier) or task.tid not in self.scheduler.requires:
+            return None
+        signature = task.signature()
+        if signature is None:
+            return None
+        origin = self._signatures.get(signature)
+        if origin is None \
+                or not self.scheduler.link(task.tid, origin):
+            self._signatures[signature] = task.tid
+            return None
+        self.aliases[task.tid] = origin
+        # kept in tasks until its aliases copied its results
+        self._aliased[origin] = self._aliased.get(origin, 0) + 1
+        LOGGER.debug("task %s coalesced with task %s", task.tid, origin)
+        return origin
+
+    def _unalias(self, task_id):
+        """Release the task run instead of a finished alias.
+
+        Args:
+            task_id (str): task id.
+
+        Returns:
+            str: task id run instead, None if `task_id` isn't an alias.
+        """
+        origin = self.aliases.get(task_id)
+        if origin is not None and self._aliased.get(origin):
+            self._aliased[origin] -= 1
+            if not self._aliased[origin]:
+                del self._aliased[origin]
+        return origin
+
+    def _fail(self, failed):
+        """Mark tasks failed by dependency.
+
+        An alias of a failed task gets its state and results instead. The
+        run is aborted when a critical task can't run anymore.
+
+        Args:
+            failed (list): (task id, requirements left) from the scheduler.
+        """
+        for task_id, require in failed:
+            origin = self._unalias(task_id)
+            with self.lock:
+                task = self.tasks[task_id]
+                task.state = Task.STATE_DEPENDENCY
+                task.require = require
+                if origin is not None and self.scheduler.states.get(origin) \
+                        in (Task.STATE_ERROR, Task.STATE_WRONG):
+                    source = self.tasks[origin]
+                    task.state = source.state
+                    task.results = source.results
+                self.tasks[task_id] = task
+            self._track(task_id, task.state)
+            if task_id in self._critical:
+                self._critical.discard(task_id)
+                if self.aborted_by is None:
+                    LOGGER.error("task %s failed by dependency, abort run",
+                                 task_id)
+                    self.aborted_by = task_id
+            if self.report:
+                self.report.write(task)
+            self._unwire(task_id)
+            self._forget(task_id, task.state)
+
+    def _route(self, worker=None, affinity=None):
+        """Choose the queue of a ready task.
+
+        Without worker queues, this is the shared queue. Otherwise a task
+        with an `affinity` goes to the worker owning this key, a task
+        released by a local worker goes to its own queue to keep locality,
+        others are spread round robin, including the shared queue read by
+        remote workers.
+
+        Args:
+            worker (Optional[str]): name of the worker which released the task.
+            affinity (Optional[str]): task affinity key.
+
+        Returns:
+            str: worker name of the queue, None for the shared queue.
+        """
+        if not self.inboxes:
+            return None
+        if affinity is not None:
+            return self._affine(affinity)
+        if worker in self.inboxes:
+            return worker
+        if worker in self.remote_workers:
+            return None
+
+        targets = list(self.inboxes)
+        if self.remote_workers:
+            targets.append(None)
+        self._next_target = (self._next_target + 1) % len(targets)
+        return targets[self._next_target]
+
+    def _affine(self, affinity):
+        """Choose the worker queue of an affinity key.
+
+        A new key is owned by the least loaded worker. Under imbalance, when
+        the owner has `AFFINITY_SLACK` tasks more than the least loaded
+        worker, the task goes to the least loaded one and the key is kept.
+
+        Args:
+            affinity (str): task affinity key.
+
+        Returns:
+            str: worker name.
+        """
+        idle = min(self._loads, key=self._loads.get)
+        owner = self.affinities.setdefault(affinity, idle)
+        if self._loads[owner] - self._loads[idle] > self.AFFINITY_SLACK:
+            LOGGER.debug("worker %s overloaded, send %s task to %s",
+                         owner, affinity, idle)
+            return idle
+        return owner
+
+    def _slots(self):
+        """Number of tasks workers could take now.
+
+        Each worker runs one task and fetches `prefetch` ones ahead.
+
+        Returns:
+            int: free slots, could be negative when workers left.
+        """
+        workers = len(self.workers) + len(self.remote_workers)
+        return workers * (1 + self._options['prefetch']) - len(self._sent)
+
+    def _dispatch(self, worker=None):
+        """Send ready tasks to workers, up to their free slots.
+
+        Other ready tasks stay in the scheduler, so a task made ready later
+        with a higher priority is sent before them. Workers queues are FIFO.
+
+        Tasks over a limit are held and sent first when the limit allows
+        it, other ready tasks are sent meanwhile.
+
+        Args:
+            worker (Optional[str]): name of the worker which released them.
+        """
+        slots = self._slots()
+        for key in list(self._held):
+            held = self._held[key]
+            while held and slots > 0:
+                task_id, task = held[0]
+                blocking = self.limiter.blocking(task)
+                if blocking == key:
+                    break
+                held.popleft()
+                if blocking is None:
+                    self._send(task_id, task, worker)
+                    slots -= 1
+                else:
+                    self._held.setdefault(blocking, collections.deque()) \
+                        .append((task_id, task))
+            if not held:
+                del self._held[key]
+
+        while slots > 0:
+            task_id = self.scheduler.pop()
+            if task_id is None:
+                break
+            # childs of a barrier are ready at once, popped by this loop
+            if task_id in self.scheduler.barriers or task_id in self.aliases:
+                self._pass(task_id)
+                continue
+            with self.lock:
+                task = self.tasks[task_id]
+            blocking = self.limiter.blocking(task) if self.limiter else None
+            if blocking is None:
+                self._send(task_id, task, worker)
+                slots -= 1
+            else:
+                LOGGER.debug("hold task(%s) by limit %s", task_id, blocking)
+                self._held.setdefault(blocking, collections.deque()) \
+                    .append((task_id, task))
+
+        self.metrics.queued = len(self.scheduler.ready) \
+            + sum(len(held) for held in self._held.values())
+
+    def _pass(self, task_id):
+        """Finish a ready `artron.task.Barrier` or alias without sending it.
+
+        An alias copies the results of the task run instead.
+
+        Args:
+            task_id (str): task id.
+        """
+        origin = self._unalias(task_id)
+        with self.lock:
+            task = self.tasks[task_id]
+            task.require = []
+            if origin is None:
+                task.run(None, retry=1)
+            else:
+                task.date_start = task.date_end = utils.strdate()
+                task.results = self._results(origin)
+                task.state = Task.STATE_SUCCESS
+            self.tasks[task_id] = task
+        self._track(task_id, task.state)
+        self._finished(task_id, task.state)
+
+    def _send(self, task_id, task_new, worker=None):
+        """Send a ready task to a worker.
+
+        Queue items are (task id,) or (task id, options) with options:
+        'publish' when the results are used by other tasks and 'values' with
+        the referenced results. The task could be stolen by any worker, so
+        results are sent even to the worker which produced them, it takes
+        them from its cache without deserializing them.
+
+        Args:
+            task_id (str): task id.
+            task_new (artron.task.Task): the task.
+            worker (Optional[str]): name of the worker which released it.
+        """
+        LOGGER.debug("send task(%s)", task_id)
+
+        # update task status because put in queue != is running
+        # so to avoid multiple queue send, mark it as ready
+        with self.lock:
+            task_new.state = Task.STATE_READY
+            task_new.require = []
+            self.tasks[task_id] = task_new
+        if self.limiter:
+            self.limiter.acquire(task_new)
+
+        target = self._route(worker, getattr(task_new, 'affinity', None))
+
+        options = {}
+        if task_id in self._consumers:
+            options['publish'] = True
+        values = dict(
+            (r_tid, self.values[r_tid]) \
+                for r_tid in self._references.get(task_id, ()) \
+                if r_tid in self.values
+        )
+        if values:
+            options['values'] = values
+        item = (task_id, options) if options else (task_id,)
+        self._sent.add(task_id)
+
+        if target is None:
+            self._queue.put(item)
+        else:
+            self._inboxes[target].put(item)
+            self._loads[target] += 1
+            self._routed[task_id] = target
+        self._track(task_id, Task.STATE_READY)
+
+    def _submit(self, tasks, childs):
+        """Add tasks sent by a running task with `artron.worker.submit`.
+
+        Tasks with an unknown requirement or not in STATE_INIT are not run
+        and marked with STATE_WRONG, tasks with a known id are dropped.
+
+        Args:
+            tasks (list): `artron.task.Task` to add.
+            childs (list): pending task ids which must wait for `tasks`.
+
+        Returns:
+            dict: added tasks with key as task id and value as task obj
+        """
+        batch = {}
+        for task in tasks:
+            unknown = [r_tid for r_tid in task.require or [] \
+                if r_tid not in self.scheduler.states and r_tid not in batch]
+            if task.tid in self.scheduler.states or task.tid in batch:
+                LOGGER.error("submitted task %s already exists", task.tid)
+                continue
+            if task.state != Task.STATE_INIT:
+                LOGGER.error("submitted task %s has state %s instead of %s",
+                             task.tid, task.state, Task.STATE_INIT)
+                task.state = Task.STATE_WRONG
+            elif unknown:
+                LOGGER.error("submitted task %s has unknown requirements %s",
+                             task.tid, ', '.join(unknown))
+                task.state = Task.STATE_WRONG
+            batch[task.tid] = task
+
+        with self.lock:
+            self.tasks.update(batch)
+
+        for task in batch.values():
+            self._track(task.tid, task.state)
+            if task.state == Task.STATE_WRONG and self.report:
+                self.report.write(task)
+            if task.state == Task.STATE_INIT:
+                self._wire(task)
+                self._fail(self.scheduler.add(task.tid, task.require or [],
+                                              getattr(task, 'priority', 0),
+                                              isinstance(task, Barrier)))
+                if self.coalesce:
+                    self._coalesce(task)
+
+        for child in childs:
+            linked = [task_id for task_id in batch \
+                if self.scheduler.link(child, task_id)]
+            if len(linked) != len(batch):
+                LOGGER.error("task %s can't wait for submitted tasks, "\
+                    "it already started or it would create a cycle", child)
+            with self.lock:
+                task = self.tasks[child]
+                task.require.extend(linked)
+                self.tasks[child] = task
+
+        return batch
+
+    def _handle(self, task_id, state, info):
+        """Apply a state change sent by a worker.
+
+        Args:
+            task_id (str): task id, None when tasks are submitted.
+            state (int): new task state.
+            info (dict): extra run informations.
+        """
+        if 'tasks' in info:
+            self._submit(info['tasks'], info['childs'])
+            return
+
+        if 'hello' in info:
+            LOGGER.debug("remote worker %s connected", info['worker'])
+            self.remote_workers.add(info['worker'])
+            self.metrics.workers += 1
+            return
+
+        self._track(task_id, state)
+        # published results are not in tasks, only in the event
+        if 'results' in info:
+            self.values[task_id] = info['results']
+            if task_id not in self._consumers:
+                self._restore(task_id)
+        if info.get('duration') is not None:
+            self.metrics.observe(
+                info['func'], info['duration'], info.get('retry', 1))
+
+        if state not in (Task.STATE_READY, Task.STATE_RUNNING):
+            self._finished(task_id, state)
+            # childs released by this worker
+            if self.aborted_by is None:
+                self._dispatch(info.get('worker'))
+
+    def _finished(self, task_id, state):
+        """Release resources of a finished task, then its childs in the
+        scheduler.
+
+        Args:
+            task_id (str): task id.
+            state (int): final task state.
+        """
+        self._sent.discard(task_id)
+        if task_id in self._routed:
+            self._loads[self._routed.pop(task_id)] -= 1
+        if self.limiter:
+            self.limiter.release(task_id)
+        if state in (Task.STATE_ERROR, Task.STATE_WRONG) \
+                and self.aborted_by is None \
+                and (self.fail_fast or task_id in self._critical):
+            LOGGER.error("task %s failed, abort run", task_id)
+            self.aborted_by = task_id
+        if self.report:
+            with self.lock:
+                task = self.tasks[task_id]
+            if task_id in self.values:
+                task.results = self._results(task_id)
+            self.report.write(task)
+        self._critical.discard(task_id)
+        self._unwire(task_id)
+        self._fail(self.scheduler.finish(task_id, state))
+        self._forget(task_id, state)
+
+    def eta(self):
+        """Estimate the remaining run time.
+
+        The longest of the remaining work shared by workers and of the
+        longest remaining chain of requirements. Durations are the mean
+        observed duration, or `costs` when set.
+
+        Returns:
+            float: seconds, None before any duration is known.
+        """
+        unfinished = sum(self.metrics.states.get(state, 0) for state in \
+            (Task.STATE_INIT, Task.STATE_READY, Task.STATE_RUNNING))
+        if not unfinished:
+            return 0.0
+
+        mean = self.metrics.mean_duration
+        if mean is None and self.costs:
+            mean = sum(self.costs.values()) / float(len(self.costs))
+        if mean is None:
+            return None
+
+        # chains are in seconds with costs, in number of tasks otherwise
+        while self._chains and self.scheduler.states.get(
+                self._chains[0][1]) not in (Task.STATE_INIT,
+                                            Task.STATE_READY,
+                                            Task.STATE_RUNNING):
+            heapq.heappop(self._chains)
+        chain = -self._chains[0][0] if self._chains else 0.0
+        if not self.costs:
+            chain *= mean
+
+        workers = max(1, len(self.workers) + len(self.remote_workers))
+        return max(chain, unfinished * mean / workers)
+
+    def _update_progress(self):
+        """Move the progress bar to the number of finished tasks, in O(1)."""
+        if not self.progress:
+            return
+        count = self.metrics.finished - self.progress.n
+        if count > 0:
+            self.progress.update(count)
+        if hasattr(self.progress, 'set_postfix_str'):
+            eta = self.eta()
+            if eta is not None:
+                self.progress.set_postfix_str(
+                    'eta %s' % utils.strgmtime(float(eta)))
+
+    def _wait(self):
+        """Seconds to wait for workers before sending tasks again.
+
+        Returns:
+            float: `sleep`, less when a rate limit allows a held task sooner.
+        """
+        if not self._held:
+            return self.sleep
+        delay = self.limiter.delay(self._held)
+        if delay is None:
+            return self.sleep
+        return min(self.sleep, delay)
+
+    def _drain_events(self, timeout=0):
+        """Consume all state changes sent by workers.
+
+        Args:
+            timeout (int): seconds to wait for the first event.
+        """
+        block = timeout > 0
+        while True:
+            try:
+                if block:
+                    event = self._events.get(True, timeout)
+                    block = False
+                else:
+                    event = self._events.get_nowait()
+            except QueueEmpty:
+                break
+            self._handle(*event)
+
+        if self.exporter:
+            self.exporter.tick()
+        if self.report:
+            self.report.tick()
+
     # pylint: disable=too-many-branches,too-many-statements
-    def start(self):
+    def start(self, targets=None, from_=None):
         """Start manager
 
+        With `targets` or `from_`, only the selected tasks run. Other tasks
+        are considered done, left unchanged in `tasks` and not reported.
+
+        Args:
+            targets (Optional[list]): run only these task ids and the tasks
+                they require.
+            from_ (Optional[list]): run only these task ids and the tasks
+                requiring them.
+
         Returns:
             dict: run result in form.
                 >>> {
@@ -148,7 +1183,10 @@ class Manager(object): # pylint: disable=too-many-instance-attributes
                         'failures': 1,
                         'nrun': 0,
                         'ready': 0,
-                        'success': 3
+                        'reduced': 0,
+                        'coalesced': 0,
+                        'success': 3,
+                        'uptodate': 0
                     },
                     'tasks': [
                         {
@@ -178,8 +1216,19 @@ class Manager(object): # pylint: disable=too-many-instance-attributes
                         }
                     ]
                 }
+
+        Raises:
+            artron.graph.GraphError: If the tasks graph has a cycle or an
+                unknown requirement, before any worker starts.
+            ValueError: If `targets` or `from_` has an unknown task id.
+
+        Examples:
+            >>> manager.start(targets=['report'])
+            >>> manager.start(from_=['parse'])
         """
         time_start = time.time()
+        configure()
+        self._connect()
 
         out = {
             'elapsed': 0.0,
@@ -191,75 +1240,148 @@ class Manager(object): # pylint: disable=too-many-instance-attributes
                 'deps': 0,
                 'nrun': 0,
                 'aborted': 0,
-                'ready': 0
+                'ready': 0,
+                'uptodate': 0,
+                'reduced': 0,
+                'coalesced': 0
             },
             'exit_code': 1,
             'tasks': []
         }
 
-        try:
-            # start all workers
-            LOGGER.debug("init %d workers", self.nb_workers)
-            for worker in self.workers:
-                worker.start()
+        # counters are set once, then only updated from events
+        snapshot = self.tasks.copy()
 
-            LOGGER.debug("send resources to queues")
+        # tasks out of the selection are considered done, in this copy only
+        self._pruned = set()
+        if targets is not None or from_ is not None:
+            self._pruned = set(snapshot) - select(snapshot, targets, from_)
+            for task_id in self._pruned:
+                snapshot[task_id].state = Task.STATE_SUCCESS
+            LOGGER.debug("%d tasks not selected", len(self._pruned))
 
-            # generate exec graph
-            graph = Graph(self.tasks)
-            edges = list(graph.edges())
-            LOGGER.debug("Edges %s", edges)
+        # fail before spawning anything rather than waiting for the timeout
+        validate(snapshot)
+        missing = {}
+        for lazy in self.generators:
+            unknown = [r_tid for r_tid in lazy.require if r_tid not in snapshot]
+            if unknown:
+                missing[lazy.name] = unknown
+        if missing:
+            raise GraphDependencyError(missing)
 
-            # while we have non empty graph and don't reach timeout
-            while edges and time.time() < self.timeout:
-                # isolated vertice is task without deps
-                for task_id in graph.isolated_vertices():
+        prints = self._plan(snapshot)
+        if self.reduce_edges:
+            removed = transitive_reduction(snapshot)
+            # a loop, python 2 can't del a name used by a nested scope
+            updated = {}
+            for task_id in removed:
+                updated[task_id] = snapshot[task_id]
+            with self.lock:
+                self.tasks.update(updated)
+            out['results']['reduced'] = sum(removed.values())
+            LOGGER.debug("%d implied requirements removed",
+                         out['results']['reduced'])
 
-                    LOGGER.debug("isolated vertex task(%s) with state(%d)", \
-                        task_id, self.tasks[task_id].state)
+        self.metrics.reset(dict(
+            (task_id, task) for task_id, task in snapshot.items() \
+                if task_id not in self._pruned))
+        self.metrics.workers = len(self.workers)
+        self._settled = set()
+        if self.report:
+            self._settled = set(
+                task_id for task_id, task in snapshot.items() \
+                    if task.state != Task.STATE_INIT \
+                        and task_id not in self._pruned)
+        self.scheduler = Scheduler(self.aging)
+        self.values = {}
+        self._consumers = {}
+        self._references = {}
+        self._held = collections.OrderedDict()
+        self._sent = set()
+        self.aborted_by = None
+        self._critical = set()
+        for task in snapshot.values():
+            if task.state == Task.STATE_INIT:
+                self._wire(task)
+        failed = self.scheduler.load(snapshot)
+        self.aliases = {}
+        self._signatures = {}
+        self._aliased = {}
+        if self.coalesce:
+            # requirements first, so aliases only wait for earlier tasks
+            for task_id in order(snapshot):
+                self._coalesce(snapshot[task_id])
+            LOGGER.debug("%d tasks coalesced", len(self.aliases))
+        self._chains = []
+        if self.progress:
+            self._chains = [(-length, task_id) for task_id, length \
+                in chains(snapshot, self.costs).items()]
+            heapq.heapify(self._chains)
+        self._forgotten = 0
+        self._generators_failed = 0
+        del snapshot
 
-                    if self.tasks[task_id].is_runnable():
-                        LOGGER.debug("send task(%s)", task_id)
+        if self.report:
+            self.report.open()
 
-                        # update task status because put in queue != is running
-                        # so to avoid multiple queue send, mark it as running
-                        with self.lock:
-                            task_new = self.tasks[task_id]
-                            task_new.state = Task.STATE_READY
-                            self.tasks[task_id] = task_new
+        listener = LogListener(self.logs) if self.logs is not None else None
+        try:
+            if self.exporter:
+                self.exporter.start()
+            if listener:
+                listener.start()
 
-                        self.queue.put((task_id,))
+            self._fail(failed)
 
-                graph = Graph(self.tasks)
-                edges = list(graph.edges())
+            # start all workers
+            LOGGER.debug("init %d workers", self.nb_workers)
+            for worker in self.workers:
+                # dependencies are resolved here, workers report changes
+                if isinstance(worker, Worker) and worker.events is None:
+                    worker.events = self.events
+                    worker.update_childs = False
+                if isinstance(worker, Worker) and worker.logs is None:
+                    worker.logs = self.logs
+                worker.start()
 
-                # LOGGER.debug("Task %s", self.tasks)
-                LOGGER.debug("Edges %s", edges)
+            LOGGER.debug("send resources to queues")
 
-                if self.progress:
-                    count = max(0, len([1 for task in self.tasks.values() \
-                        if task.is_finished()]) - self.progress.n)
-                    if count > 0:
-                        self.progress.update(count)
+            # while we have pending tasks and don't reach timeout
+            self._generate()
+            while (self.scheduler.pending or self._generating()) \
+                    and time.time() < self.timeout \
+                    and self.aborted_by is None:
+                self._dispatch()
 
-                time.sleep(self.sleep)
+                # wait for workers, a finished task release its childs
+                self._drain_events(timeout=self._wait())
+                self._generate()
+                self._update_progress()
 
-            if self.progress:
-                count = max(0, len([1 for task in self.tasks.values() \
-                    if task.is_finished()]) - self.progress.n)
-                if count > 0:
-                    self.progress.update(count)
+            self._update_progress()
 
             if time.time() > self.timeout:
                 raise TimeoutError('timeout error')
 
+            # running tasks are terminated with workers
+            if self.aborted_by is not None:
+                raise RuntimeError("task %s failed, run aborted" \
+                    % self.aborted_by)
+
             LOGGER.debug("add end-of-queue markers")
-            for _ in self.workers:
+            for inbox in self.inboxes.values():
+                inbox.put((None,))
+            nb_shared = len(self.workers) - len(self.inboxes) \
+                + len(self.remote_workers)
+            for _ in range_type(nb_shared):
                 # True add the end to mark the end of queue
                 self.queue.put((None,))
 
             LOGGER.debug("blocks until all items in the queue have been "\
                   "gotten and processed.")
+            for inbox in self.inboxes.values():
+                inbox.join()
             self.queue.join()
 
             if self.progress:
@@ -280,10 +1402,78 @@ class Manager(object): # pylint: disable=too-many-instance-attributes
                 worker.join()
                 LOGGER.debug("stop workers %s", worker.name)
 
+            self._drain_events()
+            if listener:
+                listener.stop()
+            if self.exporter:
+                self.exporter.stop()
+
+        # results still kept for tasks which didn't run
+        for task_id in list(self.values):
+            self._restore(task_id)
+
         out['date_end'] = utils.strdate()
 
         # final message
+        if self.report:
+            # tasks not finished during the run are not in the report yet,
+            # read one by one rather than copying the whole tasks table
+            left = [task_id for task_id, state \
+                in self.scheduler.states.items() \
+                if state not in FINAL_STATES and task_id not in self._pruned \
+                    and task_id not in self._settled]
+            for task_id in list(self._settled) + left:
+                with self.lock:
+                    task = self.tasks[task_id]
+                self.report.write(task)
+            self._settled = set()
+
+            # tasks are in the report, counters are enough
+            states = self.metrics.states
+            out['results'].update({
+                'success': states[Task.STATE_SUCCESS],
+                'failures': states[Task.STATE_ERROR],
+                'deps': states[Task.STATE_DEPENDENCY],
+                'nrun': states[Task.STATE_INIT],
+                'aborted': states[Task.STATE_RUNNING],
+                'ready': states[Task.STATE_READY],
+            })
+            total = sum(states.values())
+        else:
+            self._collect(out)
+            # successful generated tasks already removed from tasks
+            out['results']['success'] += self._forgotten
+            total = len(out['tasks']) + self._forgotten
+
+        out['results']['uptodate'] = len(self.uptodate)
+        out['results']['coalesced'] = len(self.aliases)
+        if self.fingerprints is not None:
+            for task_id, fingerprint in prints.items():
+                if task_id in self.tasks and task_id not in self._pruned:
+                    self.fingerprints.record(self.tasks[task_id], fingerprint)
+            self.fingerprints.save()
+
+        if total == out['results']['success'] \
+                and not self._generators_failed:
+            out['exit_code'] = 0
+
+        out['elapsed'] = utils.strgmtime(time.gmtime(time.time() - time_start))
+
+        if self.report:
+            self.report.close(dict(
+                (key, value) for key, value in out.items() if key != 'tasks'))
+
+        return out
+
+    def _collect(self, out):
+        """Add all tasks of the run to `out` and count them by state.
+
+        Args:
+            out (dict): run results.
+        """
         for task in self.tasks.values():
+            if task.tid in self._pruned:
+                continue
             out['tasks'].append(task.__dict__)
             if task.state == Task.STATE_SUCCESS:
                 out['results']['success'] += 1
@@ -302,10 +1492,3 @@ class Manager(object): # pylint: disable=too-many-instance-attributes
 
             elif task.state == Task.STATE_READY:
                 out['results']['ready'] += 1
-
-        if len(out['tasks']) == out['results']['success']:
-            out['exit_code'] = 0
-
-        out['elapsed'] = utils.strgmtime(time.gmtime(time.time() - time_start))
-
-        return out
@@ -0,0 +1,333 @@
+# -*- coding: utf-8 -*-
+"""
+artron.metrics
+~~~~~~~~~~~~~~
+
+artron run metrics in Prometheus text format
+"""
+# standard
+import os
+import time
+import logging
+import threading
+import collections
+
+# local
+from artron.task import Task
+from artron._py6 import iteritems, http_server
+
+LOGGER = logging.getLogger(__name__)
+
+#: label used for each task state in exported metrics
+STATE_NAMES = {
+    Task.STATE_WRONG: 'wrong',
+    Task.STATE_DEPENDENCY: 'deps',
+    Task.STATE_ERROR: 'error',
+    Task.STATE_INIT: 'init',
+    Task.STATE_READY: 'ready',
+    Task.STATE_RUNNING: 'running',
+    Task.STATE_SUCCESS: 'success',
+}
+
+#: states of tasks which won't change anymore during the run
+FINAL_STATES = (
+    Task.STATE_WRONG,
+    Task.STATE_DEPENDENCY,
+    Task.STATE_ERROR,
+    Task.STATE_SUCCESS,
+)
+
+
+class Metrics(object):
+    """Run counters maintained incrementally from task state changes.
+
+    Nothing here reads the tasks table: the manager feeds every transition
+    it sees through `transition` and every finished run through `observe`.
+    Updates and `render` hold `lock` as the HTTP exporter renders from its
+    own thread.
+
+    Args:
+        window (int): number of durations kept per func to compute quantiles.
+
+    Attributes:
+        states (dict): number of tasks by state.
+        completed (int): number of tasks ran by a worker (success or error).
+        retries (dict): number of extra attempts by func.
+        durations (dict): last `window` durations by func.
+        durations_sum (dict): sum of all durations by func.
+        durations_count (dict): number of durations by func.
+        workers (int): number of workers.
+        queued (int): ready tasks not sent yet, waiting for a worker slot or
+            a limit. Set by the manager.
+        time_start (float): timestamp of the first `reset`.
+        lock (threading.Lock): guards counters between updates and `render`.
+
+    Examples:
+        >>> metrics = Metrics()
+        >>> metrics.reset({'tid': task})
+        >>> metrics.transition(Task.STATE_INIT, Task.STATE_READY)
+        >>> metrics.states[Task.STATE_READY]
+        1
+    """
+    QUANTILES = (0.5, 0.95)
+
+    def __init__(self, window=1024):
+        self.window = window
+        self.states = dict((state, 0) for state in STATE_NAMES)
+        self.completed = 0
+        self.retries = {}
+        self.durations = {}
+        self.durations_sum = {}
+        self.durations_count = {}
+        self.workers = 0
+        self.queued = 0
+        self.time_start = time.time()
+        self.lock = threading.Lock()
+
+    def reset(self, tasks):
+        """Count tasks by state, only done once before the run.
+
+        Args:
+            tasks (dict): dict with key as task id and value as task obj
+        """
+        states = dict((state, 0) for state in STATE_NAMES)
+        for task in tasks.values():
+            states[task.state] = states.get(task.state, 0) + 1
+        with self.lock:
+            self.states = states
+            self.time_start = time.time()
+
+    def transition(self, old_state, new_state):
+        """Move one task from `old_state` to `new_state`.
+
+        Args:
+            old_state (int): previous task state, None for a new task.
+            new_state (int): new task state.
+        """
+        if old_state == new_state:
+            return
+        with self.lock:
+            if old_state is not None:
+                self.states[old_state] = \
+                    max(0, self.states.get(old_state, 0) - 1)
+            self.states[new_state] = self.states.get(new_state, 0) + 1
+
+    def observe(self, func, duration, retry=1):
+        """Record a finished task run.
+
+        Args:
+            func (str): function name ran on the builder.
+            duration (float): run duration in seconds.
+            retry (int): attempt number which ended the run.
+        """
+        with self.lock:
+            self.completed += 1
+            if func not in self.durations:
+                self.durations[func] = collections.deque(maxlen=self.window)
+                self.durations_sum[func] = 0.0
+                self.durations_count[func] = 0
+                self.retries[func] = 0
+            self.durations[func].append(duration)
+            self.durations_sum[func] += duration
+            self.durations_count[func] += 1
+            self.retries[func] += max(0, retry - 1)
+
+    @property
+    def finished(self):
+        """int: number of tasks in a final state, in O(1)."""
+        return sum(self.states.get(state, 0) for state in FINAL_STATES)
+
+    @property
+    def mean_duration(self):
+        """float: mean duration of all observed runs, None without any."""
+        count = sum(self.durations_count.values())
+        if not count:
+            return None
+        return sum(self.durations_sum.values()) / count
+
+    @property
+    def rate(self):
+        """float: tasks completed per second since the run started."""
+        elapsed = time.time() - self.time_start
+        if elapsed <= 0:
+            return 0.0
+        return self.completed / elapsed
+
+    def quantile(self, func, quantile):
+        """Duration quantile over the last `window` runs of `func`.
+
+        Args:
+            func (str): function name ran on the builder.
+            quantile (float): quantile between 0 and 1.
+
+        Returns:
+            float: duration in seconds, 0.0 without observation.
+        """
+        with self.lock:
+            values = list(self.durations.get(func, ()))
+        return _quantile(values, quantile)
+
+    def render(self):
+        """Render metrics in Prometheus text exposition format.
+
+        Returns:
+            str: metrics text.
+        """
+        # copy under the lock, format outside of it
+        with self.lock:
+            states = dict(self.states)
+            completed = self.completed
+            retries = dict(self.retries)
+            durations = dict((func, list(values)) \
+                for func, values in iteritems(self.durations))
+            durations_sum = dict(self.durations_sum)
+            durations_count = dict(self.durations_count)
+            elapsed = time.time() - self.time_start
+        rate = completed / elapsed if elapsed > 0 else 0.0
+
+        lines = [
+            '# HELP artron_tasks Number of tasks by state.',
+            '# TYPE artron_tasks gauge',
+        ]
+        for state, name in sorted(iteritems(STATE_NAMES)):
+            lines.append('artron_tasks{state="%s"} %d' \
+                % (name, states.get(state, 0)))
+
+        lines += [
+            '# HELP artron_ready_queue_depth Ready tasks waiting for a '
+            'worker slot or a limit.',
+            '# TYPE artron_ready_queue_depth gauge',
+            'artron_ready_queue_depth %d' % self.queued,
+            '# HELP artron_workers Number of workers.',
+            '# TYPE artron_workers gauge',
+            'artron_workers %d' % self.workers,
+            '# HELP artron_workers_busy Number of workers running a task.',
+            '# TYPE artron_workers_busy gauge',
+            'artron_workers_busy %d' % states.get(Task.STATE_RUNNING, 0),
+            '# HELP artron_tasks_completed_total Tasks ran by a worker.',
+            '# TYPE artron_tasks_completed_total counter',
+            'artron_tasks_completed_total %d' % completed,
+            '# HELP artron_tasks_per_second Tasks completed per second.',
+            '# TYPE artron_tasks_per_second gauge',
+            'artron_tasks_per_second %f' % rate,
+            '# HELP artron_task_retries_total Extra attempts by func.',
+            '# TYPE artron_task_retries_total counter',
+        ]
+        for func in sorted(retries):
+            lines.append('artron_task_retries_total{func="%s"} %d' \
+                % (func, retries[func]))
+
+        lines += [
+            '# HELP artron_task_duration_seconds Task run duration by func.',
+            '# TYPE artron_task_duration_seconds summary',
+        ]
+        for func in sorted(durations):
+            for quantile in self.QUANTILES:
+                lines.append(
+                    'artron_task_duration_seconds{func="%s",quantile="%s"} %f' \
+                    % (func, quantile, _quantile(durations[func], quantile)))
+            lines.append('artron_task_duration_seconds_sum{func="%s"} %f' \
+                % (func, durations_sum[func]))
+            lines.append('artron_task_duration_seconds_count{func="%s"} %d' \
+                % (func, durations_count[func]))
+
+        return '\n'.join(lines) + '\n'
+
+
+def _quantile(values, quantile):
+    """Quantile of `values`, 0.0 when empty."""
+    values = sorted(values)
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(quantile * len(values)))
+    return values[index]
+
+
+class MetricsExporter(object):
+    """Publish `Metrics` to a textfile-collector file and/or over HTTP.
+
+    The file is rewritten atomically at most every `interval` seconds when
+    the manager calls `tick`. The HTTP server runs in a daemon thread and
+    renders metrics on each scrape.
+
+    Args:
+        metrics (artron.metrics.Metrics): metrics to export.
+        path (Optional[str]): textfile-collector file path. Defaults to None.
+        port (Optional[int]): HTTP port to listen on. Defaults to None.
+        interval (int): minimum seconds between two file writes.
+        host (str): HTTP address to bind. Defaults to localhost.
+
+    Examples:
+        >>> exporter = MetricsExporter(metrics, path='/tmp/artron.prom')
+        >>> exporter.start()
+        >>> exporter.tick()
+        >>> exporter.stop()
+    """
+    # pylint: disable=too-many-arguments
+    def __init__(self, metrics, path=None, port=None, interval=15,
+                 host='127.0.0.1'):
+        self.metrics = metrics
+        self.path = path
+        self.port = port
+        self.interval = interval
+        self.host = host
+        self.server = None
+        self.last_write = 0
+
+    def start(self):
+        """Start the HTTP server if a port is set."""
+        if self.port is None or self.server is not None:
+            return
+
+        metrics = self.metrics
+        HTTPServer, BaseHTTPRequestHandler = http_server() # pylint: disable=invalid-name
+
+        class Handler(BaseHTTPRequestHandler):
+            """Serve metrics on any path"""
+            def do_GET(self): # pylint: disable=invalid-name
+                """Render metrics"""
+                body = metrics.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type',
+                                 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args): # pylint: disable=arguments-differ
+                """Keep scrapes out of stderr"""
+                pass
+
+        self.server = HTTPServer((self.host, self.port), Handler)
+        # port 0 ask the system for a free port
+        self.port = self.server.server_address[1]
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        LOGGER.debug("serve metrics on %s:%d", self.host, self.port)
+
+    def tick(self, force=False):
+        """Write the textfile if `interval` is elapsed.
+
+        Args:
+            force (bool): write even if `interval` is not elapsed.
+        """
+        if not self.path:
+            return
+        now = time.time()
+        if not force and now - self.last_write < self.interval:
+            return
+        self.last_write = now
+        tmp = '%s.%d.tmp' % (self.path, os.getpid())
+        with open(tmp, 'w') as fd:
+            fd.write(self.metrics.render())
+        # rename is atomic so collectors never read a partial file
+        os.rename(tmp, self.path)
+
+    def stop(self):
+        """Write metrics a last time and stop the HTTP server."""
+        self.tick(force=True)
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+artron.planner
+~~~~~~~~~~~~~~
+
+artron dry-run: shape and duration of a run without running it
+"""
+# standard
+import heapq
+import multiprocessing
+
+# local
+from artron.task import Task, Barrier
+from artron.graph import order, levels, validate
+
+
+class Plan(object):
+    """Shape of a run computed by `plan`.
+
+    Attributes:
+        levels (list): list of task ids by topological level.
+        costs (dict): estimated duration in seconds by task id.
+        critical_path (list): task ids of the longest chain of requirements.
+        length (float): duration of the critical path, the makespan with
+            unlimited workers.
+        makespan (float): estimated duration with `nb_workers`.
+        nb_workers (int): number of workers of the estimate.
+    """
+    # pylint: disable=too-many-arguments
+    def __init__(self, grouped, costs, critical_path, makespan, nb_workers):
+        self.levels = grouped
+        self.costs = costs
+        self.critical_path = critical_path
+        self.length = sum(costs[task_id] for task_id in critical_path)
+        self.makespan = makespan
+        self.nb_workers = nb_workers
+
+    @property
+    def widths(self):
+        """list: number of tasks by level."""
+        return [len(level) for level in self.levels]
+
+    @property
+    def work(self):
+        """float: sum of all task durations."""
+        return sum(self.costs.values())
+
+    @property
+    def parallelism(self):
+        """float: average number of busy workers, work / makespan."""
+        if not self.makespan:
+            return 0.0
+        return self.work / self.makespan
+
+    def summary(self):
+        """Human readable plan.
+
+        Returns:
+            str: one line by level then totals.
+        """
+        lines = ['level %d: %d tasks' % (idx, width) \
+            for idx, width in enumerate(self.widths)]
+        lines += [
+            'tasks: %d' % len(self.costs),
+            'critical path: %d tasks, %.1fs' \
+                % (len(self.critical_path), self.length),
+            'makespan with %d workers: %.1fs (parallelism %.1f)' \
+                % (self.nb_workers, self.makespan, self.parallelism),
+        ]
+        return '\n'.join(lines)
+
+
+def cost_hints(metrics):
+    """Average duration by func from the metrics of a previous run.
+
+    Args:
+        metrics (artron.metrics.Metrics): metrics, usually `Manager.metrics`.
+
+    Returns:
+        dict: func as key and duration in seconds as value.
+    """
+    return dict(
+        (func, metrics.durations_sum[func] / metrics.durations_count[func])
+        for func in metrics.durations_count
+        if metrics.durations_count[func]
+    )
+
+
+def plan(tasks, nb_workers=None, costs=None, default_cost=1.0):
+    """Plan a run without spawning any worker nor server.
+
+    Only tasks in state init are planned, as `artron.manager.Manager.start`
+    runs. The makespan is estimated by a list scheduling simulation where
+    ready tasks on the longest remaining chain start first.
+
+    Args:
+        tasks (dict): dict with key as task id and value as task obj
+        nb_workers (Optional[int]): number of workers. Defaults to
+            `multiprocessing.cpu_count()`.
+        costs (Optional[dict]): estimated duration in seconds by task id or
+            by func, see `cost_hints`. Defaults to None.
+        default_cost (float): duration of tasks without cost.
+
+    Returns:
+        artron.planner.Plan: the run plan.
+
+    Raises:
+        artron.graph.GraphError: If the graph has a cycle or an unknown
+            requirement.
+
+    Examples:
+        >>> result = plan(tasks, nb_workers=8, costs={'download': 30})
+        >>> result.widths
+        [120, 120, 1]
+        >>> result.makespan
+        482.0
+    """
+    if nb_workers is None:
+        nb_workers = multiprocessing.cpu_count()
+    nb_workers = max(1, nb_workers)
+    costs = costs or {}
+
+    validate(tasks)
+    pending = dict((task_id, task) for task_id, task in tasks.items() \
+        if task.state == Task.STATE_INIT)
+
+    durations, requires, childs = _prepare(pending, costs, default_cost)
+    ordered = order(pending)
+
+    # longest chain ending with each task
+    finish = {}
+    previous = {}
+    for task_id in ordered:
+        start, previous[task_id] = 0.0, None
+        for r_tid in requires[task_id]:
+            if finish[r_tid] > start:
+                start, previous[task_id] = finish[r_tid], r_tid
+        finish[task_id] = start + durations[task_id]
+
+    critical_path = []
+    task_id = max(finish, key=finish.get) if finish else None
+    while task_id is not None:
+        critical_path.append(task_id)
+        task_id = previous[task_id]
+    critical_path.reverse()
+
+    # longest chain starting with each task, used as priority
+    remaining = _chains(ordered, childs, durations)
+
+    return Plan(
+        levels(pending),
+        durations,
+        critical_path,
+        _simulate(ordered, requires, childs, durations, remaining,
+                  nb_workers),
+        nb_workers,
+    )
+
+
+def chains(tasks, costs=None, default_cost=1.0):
+    """Duration of the longest chain starting with each task, in O(V+E).
+
+    Only tasks in state init are considered, the maximum is the length of
+    the critical path.
+
+    Args:
+        tasks (dict): dict with key as task id and value as task obj
+        costs (Optional[dict]): estimated duration in seconds by task id or
+            by func. Defaults to None.
+        default_cost (float): duration of tasks without cost.
+
+    Returns:
+        dict: task id as key and chain duration as value.
+    """
+    pending = dict((task_id, task) for task_id, task in tasks.items() \
+        if task.state == Task.STATE_INIT)
+    durations, _, childs = _prepare(pending, costs or {}, default_cost)
+    return _chains(order(pending), childs, durations)
+
+
+def _prepare(pending, costs, default_cost):
+    """Index durations and edges of pending tasks.
+
+    Args:
+        pending (dict): tasks in state init, task id as key.
+        costs (dict): estimated duration in seconds by task id or by func.
+        default_cost (float): duration of tasks without cost.
+
+    Returns:
+        tuple: (durations, requires, childs) dicts by task id.
+    """
+    durations = {}
+    requires = {}
+    childs = {}
+    for task_id, task in pending.items():
+        if isinstance(task, Barrier):
+            durations[task_id] = 0.0
+        else:
+            durations[task_id] = float(costs.get(
+                task_id, costs.get(task.func, default_cost)))
+        requires[task_id] = [r_tid for r_tid in set(task.require or []) \
+            if r_tid in pending]
+        for r_tid in requires[task_id]:
+            childs.setdefault(r_tid, []).append(task_id)
+    return durations, requires, childs
+
+
+def _chains(ordered, childs, durations):
+    """Longest chain starting with each task.
+
+    Args:
+        ordered (list): task ids in topological order.
+        childs (dict): task ids requiring it by task id.
+        durations (dict): duration in seconds by task id.
+
+    Returns:
+        dict: task id as key and chain duration as value.
+    """
+    remaining = {}
+    for task_id in reversed(ordered):
+        remaining[task_id] = durations[task_id] + max(
+            [remaining[child] for child in childs.get(task_id, ())] or [0.0])
+    return remaining
+
+
+# pylint: disable=too-many-arguments
+def _simulate(ordered, requires, childs, durations, priority, nb_workers):
+    """List scheduling of tasks on `nb_workers`.
+
+    Args:
+        ordered (list): task ids in topological order.
+        requires (dict): required task ids by task id.
+        childs (dict): task ids requiring it by task id.
+        durations (dict): duration in seconds by task id.
+        priority (dict): ready tasks with the highest priority start first.
+        nb_workers (int): number of workers.
+
+    Returns:
+        float: time when the last task ends.
+    """
+    waiting = dict((task_id, len(requires[task_id])) for task_id in ordered)
+    ready = [(-priority[task_id], task_id) for task_id in ordered \
+        if not waiting[task_id]]
+    heapq.heapify(ready)
+    running = []
+    now = 0.0
+
+    while ready or running:
+        while ready and len(running) < nb_workers:
+            _, task_id = heapq.heappop(ready)
+            heapq.heappush(running, (now + durations[task_id], task_id))
+
+        now, task_id = heapq.heappop(running)
+        for child in childs.get(task_id, ()):
+            waiting[child] -= 1
+            if not waiting[child]:
+                heapq.heappush(ready, (-priority[child], child))
+    return now
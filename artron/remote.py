@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+artron.remote
+~~~~~~~~~~~~~
+
+artron remote workers over an authenticated TCP socket
+"""
+# standard
+import os
+import sys
+import socket
+import logging
+import argparse
+import importlib
+import threading
+import multiprocessing
+from multiprocessing.managers import BaseManager, DictProxy, AcquirerProxy
+
+# local
+from artron.task import Task
+from artron.logs import configure
+from artron.worker import Worker
+from artron._py6 import Queue, range_type
+
+LOGGER = logging.getLogger(__name__)
+
+# objects shared by the server process, created on first access
+_SHARED = {}
+
+
+def _shared(name, factory):
+    """Get or create a shared object in the server process.
+
+    Args:
+        name (str): object name.
+        factory (callable): create the object.
+
+    Returns:
+        obj: the shared object.
+    """
+    if name not in _SHARED:
+        _SHARED[name] = factory()
+    return _SHARED[name]
+
+
+def get_queue():
+    """Queue of task ids to run"""
+    return _shared('queue', Queue)
+
+
+def get_events():
+    """Queue of task state changes sent by workers"""
+    return _shared('events', Queue)
+
+
+def get_logs():
+    """Queue of log records sent by workers"""
+    return _shared('logs', Queue)
+
+
+def get_tasks():
+    """Dict with key as task id and value as task obj"""
+    return _shared('tasks', dict)
+
+
+def get_config():
+    """Dict of run settings workers need (max_retry)"""
+    return _shared('config', dict)
+
+
+def get_lock():
+    """Lock on tasks access"""
+    return _shared('lock', threading.RLock)
+
+
+class RemoteManager(BaseManager):
+    """Serve the run queues and tasks on a network address.
+
+    The manager side calls `start` to spawn the server, workers on other
+    hosts call `connect` with the same `address` and `authkey`.
+
+    Args:
+        address (tuple): (host, port) to listen on or to connect to.
+        authkey (bytes): shared secret, connections without it are refused.
+
+    Examples:
+        >>> server = RemoteManager(address=('', 50000), authkey=b'secret')
+        >>> server.start()
+        >>> client = RemoteManager(address=('host', 50000), authkey=b'secret')
+        >>> client.connect()
+        >>> client.get_queue().put(('task-id-1',))
+    """
+    pass
+
+
+RemoteManager.register('get_queue', callable=get_queue)
+RemoteManager.register('get_events', callable=get_events)
+RemoteManager.register('get_logs', callable=get_logs)
+RemoteManager.register('get_tasks', callable=get_tasks, proxytype=DictProxy)
+RemoteManager.register('get_config', callable=get_config, proxytype=DictProxy)
+RemoteManager.register('get_lock', callable=get_lock, proxytype=AcquirerProxy)
+
+
+def parse_address(address):
+    """Convert 'host:port' into a (host, port) tuple.
+
+    Args:
+        address (str): address in form host:port.
+
+    Returns:
+        tuple: (host, port)
+
+    Raises:
+        ValueError: If `address` has no port.
+    """
+    host, sep, port = address.rpartition(':')
+    if not sep or not port.isdigit():
+        raise ValueError("Wrong address %s. Required host:port." % address)
+    return (host, int(port))
+
+
+def load_builder(path):
+    """Import a builder from 'module:attribute'.
+
+    A class is instanciated without argument, any other object (module,
+    instance) is used as is.
+
+    Args:
+        path (str): builder path in form module:attribute.
+
+    Returns:
+        obj: Builder object with the `func` to run.
+    """
+    module, _, attribute = path.partition(':')
+    builder = importlib.import_module(module)
+    if attribute:
+        builder = getattr(builder, attribute)
+    if isinstance(builder, type):
+        builder = builder()
+    return builder
+
+
+# pylint: disable=too-many-arguments
+def work(address, authkey, builder, nb_workers=None, name=None, prefetch=0,
+         serializer=None):
+    """Connect to a manager and run workers until the end of its queue.
+
+    Args:
+        address (tuple): (host, port) of the manager.
+        authkey (bytes): shared secret of the manager.
+        builder (obj): Builder object with the `func` to run.
+        nb_workers (Optional[int]): number of local worker processes.
+            Defaults to `multiprocessing.cpu_count()`.
+        name (Optional[str]): workers name prefix. Defaults to host-pid.
+        prefetch (int): number of task ids each worker fetches while a task
+            runs. Defaults to 0.
+        serializer (Optional[artron.serializer.Serializer]): results
+            serializer, the same as the manager one. Defaults to
+            `artron.serializer.PickleSerializer`.
+
+    Returns:
+        list: exit code of each worker process.
+    """
+    if nb_workers is None:
+        nb_workers = multiprocessing.cpu_count()
+    if name is None:
+        name = '%s-%d' % (socket.gethostname(), os.getpid())
+
+    configure()
+    client = RemoteManager(address=address, authkey=authkey)
+    client.connect()
+
+    events = client.get_events()
+    logs = client.get_logs()
+    workers = [
+        Worker(
+            builder,
+            client.get_queue(),
+            '%s-%d' % (name, wid),
+            client.get_tasks(),
+            client.get_config().get('max_retry', 3),
+            client.get_lock(),
+            events=events,
+            update_childs=False,
+            prefetch=prefetch,
+            serializer=serializer,
+            logs=logs,
+        )
+        for wid in range_type(nb_workers)
+    ]
+
+    for worker in workers:
+        # the manager sends one end-of-queue marker per known worker
+        events.put((None, Task.STATE_INIT, {'hello': True,
+                                            'worker': worker.name}))
+        worker.start()
+
+    for worker in workers:
+        worker.join()
+        LOGGER.debug("stop workers %s", worker.name)
+
+    return [worker.exitcode for worker in workers]
+
+
+def main(argv=None):
+    """artron-worker command line
+
+    Args:
+        argv (Optional[list]): arguments. Defaults to `sys.argv`.
+
+    Returns:
+        int: exit code.
+    """
+    parser = argparse.ArgumentParser(
+        prog='artron-worker',
+        description='Run tasks of a remote artron manager.',
+    )
+    parser.add_argument('--address', required=True,
+                        help='manager address in form host:port')
+    parser.add_argument('--authkey',
+                        default=os.environ.get('ARTRON_AUTHKEY'),
+                        help='manager secret, defaults to $ARTRON_AUTHKEY')
+    parser.add_argument('--builder', required=True,
+                        help='builder in form module:attribute')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of worker processes, defaults to cpu '
+                        'count')
+    parser.add_argument('--name', default=None,
+                        help='workers name prefix, defaults to host-pid')
+    parser.add_argument('--prefetch', type=int, default=0,
+                        help='task ids fetched while a task runs, hides '
+                        'network latency between short tasks')
+    args = parser.parse_args(argv)
+
+    if not args.authkey:
+        parser.error('--authkey or $ARTRON_AUTHKEY is required')
+
+    # builder module is usually next to the caller
+    sys.path.insert(0, os.getcwd())
+
+    exit_codes = work(
+        parse_address(args.address),
+        args.authkey.encode('utf-8'),
+        load_builder(args.builder),
+        nb_workers=args.workers,
+        name=args.name,
+        prefetch=args.prefetch,
+    )
+    return int(any(exit_codes))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+artron.report
+~~~~~~~~~~~~~
+
+artron run report streamed as JSON lines
+"""
+# standard
+import json
+import time
+import logging
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Report(object):
+    """Write one JSON line by finished task, then a summary line.
+
+    Lines are buffered and written by chunks of `chunk` lines or every
+    `interval` seconds, so the file could be followed during the run while
+    memory stays constant.
+
+    Args:
+        path (str): JSON lines file, truncated when opened.
+        chunk (int): number of lines written at once.
+        interval (float): maximum seconds a line stays in the buffer.
+
+    Attributes:
+        count (int): number of task lines written.
+
+    Examples:
+        >>> report = Report('/tmp/run.jsonl')
+        >>> report.open()
+        >>> report.write(task)
+        >>> report.close({'exit_code': 0})
+    """
+    def __init__(self, path, chunk=1000, interval=1.0):
+        self.path = path
+        self.chunk = chunk
+        self.interval = interval
+        self.count = 0
+        self._fd = None
+        self._lines = []
+        self._flushed = 0
+
+    def open(self):
+        """Create the file."""
+        self._fd = open(self.path, 'w')
+        self._lines = []
+        self._flushed = time.time()
+        self.count = 0
+
+    def write(self, task):
+        """Add a finished task.
+
+        Args:
+            task (artron.task.Task): finished task.
+        """
+        self._lines.append(repr(task))
+        self.count += 1
+        if len(self._lines) >= self.chunk:
+            self.flush()
+
+    def tick(self):
+        """Flush if `interval` is elapsed."""
+        if self._lines and time.time() - self._flushed >= self.interval:
+            self.flush()
+
+    def flush(self):
+        """Write buffered lines."""
+        if self._lines:
+            self._fd.write('\n'.join(self._lines) + '\n')
+            self._lines = []
+        self._fd.flush()
+        self._flushed = time.time()
+
+    def close(self, summary):
+        """Write the summary line and close the file.
+
+        Args:
+            summary (dict): run result without tasks.
+        """
+        if self._fd is None:
+            return
+        self._lines.append(json.dumps({'summary': summary}, default=repr))
+        self.flush()
+        self._fd.close()
+        self._fd = None
+        LOGGER.debug("%d tasks reported in %s", self.count, self.path)
@@ -0,0 +1,348 @@
+# -*- coding: utf-8 -*-
+"""
+artron.scheduler
+~~~~~~~~~~~~~~~~
+
+artron incremental dependency resolution
+"""
+# standard
+import heapq
+import collections
+
+# local
+from artron.task import Task, Barrier
+from artron._py6 import iteritems
+
+
+class Scheduler(object):
+    """Scheduler tracks which tasks of a run are ready.
+
+    It is built once from the tasks table, then each finished task only
+    visits its own childs: the graph is never rebuilt and tasks could be
+    added while the run is in progress.
+
+    Task states are owned by the manager which keeps `states` up to date,
+    the scheduler only reads them to know if a requirement is satisfied.
+
+    Ready tasks are sent by priority. To avoid starvation, the priority of a
+    ready task grows with the number of tasks made ready after it: one level
+    of priority is worth `aging` tasks.
+
+    Requirements of a `artron.task.Barrier` are a set, each finished
+    requirement is removed in O(1) however many tasks the stage has.
+
+    Args:
+        aging (int): number of tasks made ready after a task to be worth one
+            level of priority. Defaults to 1000.
+
+    Attributes:
+        states (dict): last known state by task id.
+        requires (dict): task id of pending tasks (not sent to workers) as key
+            and list of unfinished required task ids as value.
+        childs (dict): task id as key and list of pending task ids requiring
+            it as value.
+        ready (list): heap of (key, sequence, task id) of tasks without
+            requirement left.
+        priorities (dict): priority of pending tasks, by task id.
+        barriers (set): task ids of barriers not finished yet, the manager
+            finishes them instead of sending them to workers.
+        pending (int): number of tasks of the run not finished yet.
+
+    Examples:
+        >>> scheduler = Scheduler()
+        >>> scheduler.load(tasks)
+        []
+        >>> scheduler.pop()
+        'task-id-4'
+    """
+    def __init__(self, aging=1000):
+        self.aging = aging
+        self.states = {}
+        self.requires = {}
+        self.childs = {}
+        self.ready = []
+        self.priorities = {}
+        self.barriers = set()
+        self.pending = 0
+        self._sequence = 0
+
+    def _push(self, task_id):
+        """Add a task to the ready heap, in O(log n).
+
+        Args:
+            task_id (str): task id.
+        """
+        self._sequence += 1
+        key = self._sequence - self.priorities.get(task_id, 0) * self.aging
+        heapq.heappush(self.ready, (key, self._sequence, task_id))
+
+    def load(self, tasks):
+        """Register all tasks of the run.
+
+        Only tasks in state init are scheduled, as `artron.graph.Graph` does.
+
+        Args:
+            tasks (dict): dict with key as task id and value as task obj
+
+        Returns:
+            list: (task id, requirements left) of tasks failed by dependency.
+        """
+        for task_id, task in iteritems(tasks):
+            self.states[task_id] = task.state
+
+        failed = []
+        for task_id, task in iteritems(tasks):
+            if task.state == Task.STATE_INIT:
+                failed.extend(self.add(task_id, task.require or [],
+                                       getattr(task, 'priority', 0),
+                                       isinstance(task, Barrier)))
+        return failed
+
+    def add(self, task_id, require, priority=0, barrier=False):
+        """Register a pending task.
+
+        Args:
+            task_id (str): task id.
+            require (list): list of required task ids.
+            priority (int): ready tasks with higher priority are sent first.
+            barrier (bool): the task is a `artron.task.Barrier`.
+
+        Returns:
+            list: (task id, requirements left) of tasks failed by dependency.
+        """
+        self.states.setdefault(task_id, Task.STATE_INIT)
+        self.pending += 1
+
+        remaining = []
+        failed_by = None
+        for r_tid in require:
+            state = self.states.get(r_tid)
+            if state == Task.STATE_SUCCESS:
+                continue
+            if state is not None and state < Task.STATE_INIT:
+                failed_by = r_tid
+            remaining.append(r_tid)
+
+        if barrier:
+            self.barriers.add(task_id)
+            remaining = set(remaining)
+        self.requires[task_id] = remaining
+        if priority:
+            self.priorities[task_id] = priority
+        if failed_by is not None:
+            return self._fail(task_id, failed_by)
+
+        for r_tid in remaining:
+            self.childs.setdefault(r_tid, []).append(task_id)
+        if not remaining:
+            self._push(task_id)
+        return []
+
+    def ancestors(self, task_id):
+        """Pending and running tasks `task_id` transitively waits for.
+
+        Args:
+            task_id (str): task id.
+
+        Returns:
+            set: task ids.
+        """
+        seen = set()
+        stack = list(self.requires.get(task_id, ()))
+        while stack:
+            r_tid = stack.pop()
+            if r_tid in seen:
+                continue
+            seen.add(r_tid)
+            stack.extend(self.requires.get(r_tid, ()))
+        return seen
+
+    def link(self, child, task_id):
+        """Make pending task `child` wait for `task_id`.
+
+        Args:
+            child (str): task id of a task not sent to workers yet.
+            task_id (str): task id to add as dependency.
+
+        Returns:
+            bool: False if `child` is not pending anymore, if `task_id` failed
+                or if it would create a cycle.
+        """
+        if child not in self.requires or child == task_id:
+            return False
+        state = self.states.get(task_id)
+        if state == Task.STATE_SUCCESS:
+            return True
+        if state is None or state < Task.STATE_INIT:
+            return False
+        if child in self.ancestors(task_id):
+            return False
+        requires = self.requires[child]
+        if isinstance(requires, set):
+            if task_id in requires:
+                return True
+            requires.add(task_id)
+        else:
+            requires.append(task_id)
+        self.childs.setdefault(task_id, []).append(child)
+        return True
+
+    def pop(self):
+        """Get the next ready task and remove it from pending tasks.
+
+        Returns:
+            str: task id or None if no task is ready.
+        """
+        while self.ready:
+            task_id = heapq.heappop(self.ready)[2]
+            # could be linked to a new requirement after being ready
+            if task_id in self.requires and not self.requires[task_id]:
+                del self.requires[task_id]
+                self.priorities.pop(task_id, None)
+                return task_id
+        return None
+
+    def finish(self, task_id, state):
+        """Release or fail childs of a finished task.
+
+        Args:
+            task_id (str): task id.
+            state (int): final task state.
+
+        Returns:
+            list: (task id, requirements left) of tasks failed by dependency.
+        """
+        self.pending -= 1
+        self.barriers.discard(task_id)
+        childs = self.childs.pop(task_id, [])
+        if state != Task.STATE_SUCCESS:
+            failed = []
+            for child in childs:
+                failed.extend(self._fail(child, task_id))
+            return failed
+
+        for child in childs:
+            remaining = self.requires.get(child)
+            # already failed by another requirement
+            if remaining is None:
+                continue
+            remaining.remove(task_id)
+            if not remaining:
+                self._push(child)
+        return []
+
+    def _fail(self, task_id, parent):
+        """Fail a pending task and all its descendants.
+
+        Args:
+            task_id (str): task id.
+            parent (str): failed required task id.
+
+        Returns:
+            list: (task id, requirements left) of tasks failed by dependency.
+        """
+        failed = []
+        stack = [(task_id, parent)]
+        while stack:
+            task_id, parent = stack.pop()
+            remaining = self.requires.pop(task_id, None)
+            if remaining is None:
+                continue
+            remaining.remove(parent)
+            self.priorities.pop(task_id, None)
+            self.barriers.discard(task_id)
+            self.pending -= 1
+            failed.append((task_id, list(remaining)))
+            for child in self.childs.pop(task_id, []):
+                stack.append((child, task_id))
+        return failed
+
+
+class LazyTasks(object):
+    """Tasks materialized on demand with a bounded number in flight.
+
+    Nothing is read from `tasks` until all `require` tasks succeeded, then
+    at most `window` tasks exist at the same time.
+
+    Args:
+        tasks (iterable): `artron.task.Task` objects, could be a generator.
+        window (int): maximum number of materialized tasks not finished.
+        require (Optional[list]): task ids which must succeed before the first
+            task is materialized. Defaults to None.
+        keep (bool): keep successful tasks in the tasks table once finished.
+        name (str): name used in logs and errors.
+
+    Attributes:
+        inflight (int): number of materialized tasks not finished.
+        created (int): number of materialized tasks.
+        exhausted (bool): True when `tasks` has no more item.
+        failed (str): task id of the failed requirement, None otherwise.
+        recent (collections.deque): ids of the last `window` tasks removed
+            from the run once successful, next tasks could still require
+            them.
+
+    Examples:
+        >>> lazy = LazyTasks(
+        ...     (Task('tid-%d' % idx, {}, 'func') for idx in range(10)),
+        ...     window=2,
+        ... )
+        >>> [task.tid for task in lazy.take({})]
+        ['tid-0', 'tid-1']
+        >>> lazy.take({})
+        []
+    """
+    # pylint: disable=too-many-arguments
+    def __init__(self, tasks, window, require=None, keep=False,
+                 name='generator'):
+        self.name = name
+        self.tasks = iter(tasks)
+        self.window = max(1, window)
+        self.require = require or []
+        self.keep = keep
+        self.inflight = 0
+        self.created = 0
+        self.exhausted = False
+        self.failed = None
+        self.recent = collections.deque()
+
+    @property
+    def active(self):
+        """bool: True while tasks could still be materialized or run."""
+        return not self.exhausted or self.inflight > 0
+
+    def take(self, states):
+        """Materialize tasks up to the window.
+
+        Args:
+            states (dict): last known state by task id.
+
+        Returns:
+            list: new `artron.task.Task` objects.
+        """
+        if self.exhausted:
+            return []
+
+        for r_tid in self.require:
+            state = states.get(r_tid)
+            if state is not None and state < Task.STATE_INIT:
+                self.failed = r_tid
+                self.exhausted = True
+                return []
+            if state != Task.STATE_SUCCESS:
+                return []
+
+        tasks = []
+        while self.inflight < self.window:
+            try:
+                task = next(self.tasks)
+            except StopIteration:
+                self.exhausted = True
+                break
+            self.inflight += 1
+            self.created += 1
+            tasks.append(task)
+        return tasks
+
+    def done(self):
+        """A materialized task finished."""
+        self.inflight -= 1
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+artron.serializer
+~~~~~~~~~~~~~~~~~
+
+artron serialization of task results sent between processes
+"""
+# standard
+import pickle
+
+#: protocol 5 (python 3.8+) sends contiguous buffers out-of-band
+PROTOCOL = min(5, pickle.HIGHEST_PROTOCOL)
+
+# pylint: disable=invalid-name
+PickleBuffer = getattr(pickle, 'PickleBuffer', None)
+
+
+def _rebuild(kind, buf):
+    """Rebuild bytes or bytearray from an out-of-band buffer, without copy
+    when the buffer already has the right type.
+
+    Args:
+        kind (type): bytes or bytearray.
+        buf (obj): buffer given to `pickle.loads`.
+
+    Returns:
+        obj: `kind` object.
+    """
+    if type(buf) is kind: # pylint: disable=unidiomatic-typecheck
+        return buf
+    return kind(buf)
+
+
+class _OutOfBand(object):
+    """Large bytes or bytearray pickled as a `PickleBuffer`"""
+    __slots__ = ('obj',)
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __reduce_ex__(self, protocol):
+        return _rebuild, (type(self.obj), PickleBuffer(self.obj))
+
+
+def _wrap(obj, threshold):
+    """Mark large bytes and bytearray of an object to be sent out-of-band.
+
+    The pickler saves builtin types without any hook, containers (dict,
+    list, tuple) are walked and copied with their large payloads wrapped.
+    Other objects, as numpy arrays, handle protocol 5 themselves.
+
+    Args:
+        obj (obj): object to serialize.
+        threshold (int): minimum size in bytes of an out-of-band payload.
+
+    Returns:
+        obj: object to pickle.
+    """
+    kind = type(obj)
+    if kind in (bytes, bytearray):
+        return _OutOfBand(obj) if len(obj) >= threshold else obj
+    if kind is dict:
+        return dict((key, _wrap(value, threshold))
+                    for key, value in obj.items())
+    if kind in (list, tuple):
+        return kind(_wrap(value, threshold) for value in obj)
+    return obj
+
+
+class Packed(object):
+    """Serialized object, opaque for processes which only forward it.
+
+    Args:
+        header (bytes): pickled object without its large buffers.
+        buffers (list): out-of-band buffers of the object.
+
+    Attributes:
+        header (bytes): pickled object without its large buffers.
+        buffers (list): out-of-band buffers of the object.
+    """
+    def __init__(self, header, buffers=None):
+        self.header = header
+        self.buffers = buffers or []
+
+    def __len__(self):
+        """Size in bytes"""
+        return len(self.header) + sum(
+            memoryview(buf).nbytes for buf in self.buffers)
+
+    def __reduce_ex__(self, protocol):
+        """Keep buffers out-of-band when the outer pickler allows it.
+
+        `multiprocessing` connections pickle with `pickle.DEFAULT_PROTOCOL`,
+        4 before python 3.14, buffers are copied into the message then.
+        """
+        if protocol >= 5 and PickleBuffer is not None:
+            buffers = [PickleBuffer(buf) for buf in self.buffers]
+        else:
+            buffers = [bytes(buf) for buf in self.buffers]
+        return (Packed, (self.header, buffers))
+
+
+class Serializer(object):
+    """Serialize task results sent to other processes.
+
+    Subclasses implement `dumps` and `loads`, `loads(dumps(obj))` must be
+    equal to `obj`.
+
+    Examples:
+        >>> class JsonSerializer(Serializer):
+        ...     def dumps(self, obj):
+        ...         return json.dumps(obj)
+        ...     def loads(self, data):
+        ...         return json.loads(data)
+        >>> manager = Manager(builder, serializer=JsonSerializer())
+    """
+    def dumps(self, obj):
+        """Serialize an object.
+
+        Args:
+            obj (obj): object to serialize.
+
+        Returns:
+            obj: picklable serialized object.
+        """
+        raise NotImplementedError
+
+    def loads(self, data):
+        """Deserialize an object.
+
+        Args:
+            data (obj): object returned by `dumps`.
+
+        Returns:
+            obj: the object.
+        """
+        raise NotImplementedError
+
+
+class PickleSerializer(Serializer):
+    """Pickle with out-of-band buffers.
+
+    With protocol 5, contiguous payloads (bytes, bytearray, numpy
+    arrays...) are not copied into the pickle, they are kept as buffers next
+    to it and deserialized without copy. The process forwarding a `Packed`
+    object never rebuilds the payload.
+
+    Args:
+        protocol (int): pickle protocol. Defaults to 5 when available.
+        threshold (int): bytes and bytearray from this size are sent
+            out-of-band.
+    """
+    def __init__(self, protocol=PROTOCOL, threshold=65536):
+        self.protocol = protocol
+        self.threshold = threshold
+
+    def dumps(self, obj):
+        """Serialize an object.
+
+        Args:
+            obj (obj): object to serialize.
+
+        Returns:
+            artron.serializer.Packed: pickle and its out-of-band buffers.
+        """
+        if self.protocol < 5 or PickleBuffer is None:
+            return Packed(pickle.dumps(obj, protocol=self.protocol))
+
+        buffers = []
+        header = pickle.dumps(_wrap(obj, self.threshold),
+                              protocol=self.protocol,
+                              buffer_callback=buffers.append)
+        return Packed(header, [buf.raw() for buf in buffers])
+
+    def loads(self, data):
+        """Deserialize an object.
+
+        Args:
+            data (artron.serializer.Packed): object returned by `dumps`.
+
+        Returns:
+            obj: the object.
+        """
+        if data.buffers:
+            return pickle.loads(data.header, buffers=data.buffers)
+        return pickle.loads(data.header)
@@ -8,11 +8,13 @@ artron task management
 # standard
 import copy
 import json
+import hashlib
 import time
 import logging
 import traceback
 
 from artron import utils
+from artron._py6 import string_types, int_types
 
 LOGGER = logging.getLogger(__name__)
 
@@ -22,6 +24,75 @@ class TaskDependenciesError(Exception):
     pass
 
 
+class Result(object):
+    """Reference to the results of another task, used as a task input.
+
+    The referenced task is added to the requirements and its results are
+    sent with the task when it runs.
+
+    Args:
+        tid (str): task id which results are used.
+        key (Optional[str]): use ``results[key]`` instead of results.
+            Defaults to None.
+
+    Examples:
+        >>> Task('parse', {'path': Result('download', 'path')}, 'parse')
+    """
+    def __init__(self, tid, key=None):
+        self.tid = tid
+        self.key = key
+
+    def __repr__(self):
+        if self.key is None:
+            return 'Result(%r)' % self.tid
+        return 'Result(%r, %r)' % (self.tid, self.key)
+
+    def resolve(self, values):
+        """Get the referenced value.
+
+        Args:
+            values (dict): task id as key and results as value.
+
+        Returns:
+            obj: the task results or its `key` item.
+        """
+        value = values[self.tid]
+        if self.key is not None:
+            value = value[self.key]
+        return value
+
+
+def canonical(value):
+    """Tagged copy of a plain JSON value, to hash it.
+
+    Lists and dicts are tagged so `artron.task.Result` references can't be
+    mistaken for them. Other types, even printed the same way, are refused.
+
+    Args:
+        value (obj): str, number, bool, None, list, dict with str keys or
+            `artron.task.Result`, nested.
+
+    Returns:
+        obj: value to dump with ``json.dumps(..., sort_keys=True)``.
+
+    Raises:
+        TypeError: If `value` is not plain JSON.
+    """
+    if value is None or isinstance(value, bool) \
+            or type(value) in string_types + int_types + (float,):
+        return value
+    if type(value) is list:
+        return ['list', [canonical(item) for item in value]]
+    if type(value) is dict:
+        if not all(type(key) in string_types for key in value):
+            raise TypeError("dict keys must be str")
+        return ['dict', dict(
+            (key, canonical(item)) for key, item in value.items())]
+    if isinstance(value, Result):
+        return ['result', value.tid, canonical(value.key)]
+    raise TypeError("%s is not plain JSON" % type(value).__name__)
+
+
 class Task(object): # pylint: disable=too-many-instance-attributes
     """
     A task could run on a `builder`.
@@ -35,11 +106,21 @@ class Task(object): # pylint: disable=too-many-instance-attributes
     Args:
         tasks (dict): dict with key as task id and value as task obj
         tid (str): task uniq identifier.
-        inputs (dict): kwargs format to send to the `func`
+        inputs (dict): kwargs format to send to the `func`, values could be
+                       `Result` of other tasks.
         func (str): function name to use on the `builder`. The builder is not in
                     object but as arg in `run`. Because the task should be
                     runnable on different builders.
         require (Optional[list]): List of required task ids .Defaults to None.
+                                  Tasks referenced with `Result` are added.
+        affinity (Optional[str]): tasks with the same key are sent to the same
+            worker when possible. Defaults to None.
+        priority (int): ready tasks with higher priority are sent first.
+            Defaults to 0.
+        tags (Optional[list]): names used to share limits between funcs,
+            see `artron.limits.Limit`. Defaults to None.
+        critical (bool): abort the whole run if this task fails. Defaults to
+            False.
 
     Attributes:
         tid (str): task uniq identifier.
@@ -48,6 +129,10 @@ class Task(object): # pylint: disable=too-many-instance-attributes
                     object but as arg in `run`. Because the task should be
                     runnable on different builders.
         require (Optional[list]): List of required task ids .Defaults to None.
+        affinity (str): routing key, None for any worker.
+        priority (int): dispatch priority, higher first.
+        tags (list): limit names of the task.
+        critical (bool): the run is aborted if this task fails.
         state (int): Task state, one of TASK_* attribute.
         results (obj): Task's func results.
         date_created (str): date when task created.
@@ -72,13 +157,23 @@ class Task(object): # pylint: disable=too-many-instance-attributes
     STATE_RUNNING = 2
     STATE_SUCCESS = 3
 
-    def __init__(self, tid, inputs, func, require=None):
+    # pylint: disable=too-many-arguments
+    def __init__(self, tid, inputs, func, require=None, affinity=None,
+                 priority=0, tags=None, critical=False):
         self.tid = tid
         self.inputs = inputs
         self.func = func
         self.require = require
         if not self.require:
             self.require = []
+        missing = [r_tid for r_tid in self.references() \
+            if r_tid not in self.require]
+        if missing:
+            self.require = self.require + missing
+        self.affinity = affinity
+        self.priority = priority
+        self.tags = list(tags or [])
+        self.critical = critical
         self.state = 0
         self.results = None
         self.date_created = utils.strdate()
@@ -93,14 +188,43 @@ class Task(object): # pylint: disable=too-many-instance-attributes
         Returns;
             str: json dump of the object.
         """
-        return json.dumps(self.__dict__)
+        return json.dumps(self.__dict__, default=repr)
+
+    def references(self):
+        """Task ids used as input with `Result`
+
+        Returns:
+            list: task ids.
+        """
+        references = []
+        for value in self.inputs.values():
+            if isinstance(value, Result) and value.tid not in references:
+                references.append(value.tid)
+        return references
+
+    def signature(self):
+        """Stable hash of `func` and `inputs`, equal for tasks doing the
+        same work whatever their id.
 
-    def run(self, builder, retry):
+        Returns:
+            str: sha1 hex digest, None if `inputs` are not plain JSON, see
+                `artron.task.canonical`.
+        """
+        try:
+            content = json.dumps([self.func, canonical(self.inputs)],
+                                 sort_keys=True)
+        except TypeError:
+            return None
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+    def run(self, builder, retry, values=None):
         """Run task on specified `builder`.
 
         Args:
             builder (obj): Builder object with the `func` to run.
             retry (bool): number of retry.
+            values (Optional[dict]): results of tasks referenced with
+                `Result`, task id as key.
 
         Raises:
             TaskDependenciesError: If the task has dependencies.
@@ -112,9 +236,14 @@ class Task(object): # pylint: disable=too-many-instance-attributes
             raise TaskDependenciesError("Task {} can't run. Requires {}"\
                 .format(self.tid, ', '.join(self.require)))
         try:
+            inputs = dict(
+                (key, value.resolve(values or {}) \
+                    if isinstance(value, Result) else value)
+                for key, value in self.inputs.items()
+            )
             self.results = getattr(builder, self.func)(
                 retry=retry,
-                **self.inputs
+                **inputs
             )
             self.state = self.STATE_SUCCESS
 
@@ -213,3 +342,48 @@ class Task(object): # pylint: disable=too-many-instance-attributes
                     # recurse and mark child of child as dependency error
                     for item in tasks[child].update_childs(tasks):
                         yield item
+
+
+class Barrier(Task):
+    """Stage boundary between two groups of tasks.
+
+    Tasks requiring a barrier wait for all the tasks it requires: N upstream
+    and M downstream tasks need N + M requirements instead of N x M. A
+    barrier is never sent to workers, the manager marks it successful as
+    soon as its requirements succeed and releases its childs at once.
+
+    Args:
+        tid (str): task uniq identifier.
+        require (Optional[list]): List of required task ids. Defaults to None.
+        priority (int): ready tasks with higher priority are sent first.
+            Defaults to 0.
+
+    Examples:
+        >>> manager.add(Barrier('extracted', require=[
+        ...     'extract-%d' % idx for idx in range(2000)]))
+        >>> manager.add_many(
+        ...     Task('transform-%d' % idx, {'part': idx}, 'transform',
+        ...          require=['extracted'])
+        ...     for idx in range(3000)
+        ... )
+    """
+    def __init__(self, tid, require=None, priority=0):
+        super(Barrier, self).__init__(tid, {}, None, require=require,
+                                      priority=priority)
+
+    def run(self, builder, retry, values=None):
+        """Nothing to run, succeed once requirements are done.
+
+        Args:
+            builder (obj): unused.
+            retry (bool): unused.
+            values (Optional[dict]): unused.
+
+        Raises:
+            TaskDependenciesError: If the task has dependencies.
+        """
+        if self.require:
+            raise TaskDependenciesError("Task {} can't run. Requires {}"\
+                .format(self.tid, ', '.join(self.require)))
+        self.date_start = self.date_end = utils.strdate()
+        self.state = self.STATE_SUCCESS
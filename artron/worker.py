@@ -5,17 +5,62 @@ artron.worker
 
 artron task runner
 """
+import copy
+import random
 import logging
+import collections
+import threading
 import traceback
 import multiprocessing
 
 # import local
 from artron import utils
-from artron._py6 import iteritems, range_type
+from artron.logs import redirect
+from artron._py6 import iteritems, range_type, Queue, QueueEmpty
 from artron.task import Task, TaskDependenciesError
+from artron.serializer import PickleSerializer
 
 LOGGER = logging.getLogger(__name__)
 
+#: worker running in this process, set by `Worker.run`
+CURRENT = {'worker': None}
+
+
+def submit(tasks, childs=None):
+    """Add tasks to the running graph from a builder function.
+
+    New tasks could require any task already known by the manager, or a
+    task sent before in the same call. They are scheduled as soon as the
+    manager receives them, the running task doesn't need to finish.
+
+    Args:
+        tasks (list): `artron.task.Task` or list of tasks to add.
+        childs (Optional[list]): task ids which must wait for all `tasks`.
+            Only tasks not yet sent to workers could be delayed.
+            Defaults to None.
+
+    Raises:
+        RuntimeError: If not called from a task run by a worker.
+
+    Examples:
+        >>> class Builder(object):
+        ...     def listing(self, bucket, retry):
+        ...         submit(
+        ...             [Task(key, {'key': key}, 'process') for key in ls(bucket)],
+        ...             childs=['report'],
+        ...         )
+    """
+    worker = CURRENT['worker']
+    if worker is None or worker.events is None:
+        raise RuntimeError("submit must be called from a task run by "\
+            "a manager worker")
+
+    if isinstance(tasks, Task):
+        tasks = [tasks]
+    worker.emit(None, Task.STATE_INIT, tasks=list(tasks),
+                childs=list(childs or []))
+
+
 class Worker(multiprocessing.Process):
     """This module provides a queue implementation.
     It provides a convenient way of moving Python objects between different
@@ -29,6 +74,23 @@ class Worker(multiprocessing.Process):
         tasks (multiprocessing.managers.DictProxy): shared dict object and
             return a proxy for it.
         max_retry (str): Number of retry when task fail.
+        lock (multiprocessing.Lock): Lock on ressource access.
+        events (Optional[multiprocessing.Manager.Queue]): queue where task
+            state changes are sent to the manager. Defaults to None.
+        update_childs (bool): remove requirements of childs in `tasks` when a
+            task ends. Set to False when the manager resolves dependencies.
+        peers (Optional[list]): queues of other workers to steal tasks from
+            when `queue` is empty. Defaults to None.
+        steal_interval (float): seconds to wait on `queue` before trying to
+            steal a task.
+        prefetch (int): number of task ids fetched in background while a task
+            runs. Defaults to 0, fetch after each task.
+        serializer (Optional[artron.serializer.Serializer]): serialize
+            results sent to other workers. Defaults to
+            `artron.serializer.PickleSerializer`.
+        logs (Optional[multiprocessing.Manager.Queue]): queue where log
+            records are sent to the manager, see `artron.logs`. Defaults to
+            None, log with the handlers of this process.
 
     Attributes:
         builder (obj): Builder object with the `func` to run.
@@ -39,13 +101,28 @@ class Worker(multiprocessing.Process):
             return a proxy for it.
         max_retry (str): Number of retry when task fail.
         lock (multiprocessing.Lock): Lock on ressource access.
+        events (multiprocessing.Manager.Queue): task state changes queue.
+        update_childs (bool): update childs in `tasks` when a task ends.
+        peers (list): queues of other workers to steal tasks from.
+        steal_interval (float): seconds to wait before stealing.
+        prefetch (int): number of task ids fetched in background.
+        serializer (artron.serializer.Serializer): results serializer.
+        logs (multiprocessing.Manager.Queue): log records queue.
+        cache (collections.OrderedDict): results of the last tasks published
+            by this worker, task id as key.
+        CACHE_SIZE (int): number of results kept in `cache`.
 
     See Also:
         * http://effbot.org/librarybook/queue.htm
         * https://docs.python.org/3/library/multiprocessing.html
     """
+    CACHE_SIZE = 128
+
     # pylint: disable=line-too-long,too-many-arguments
-    def __init__(self, builder, queue, name, tasks, max_retry, lock):
+    def __init__(self, builder, queue, name, tasks, max_retry, lock,
+                 events=None, update_childs=True, peers=None,
+                 steal_interval=0.1, prefetch=0, serializer=None,
+                 logs=None):
         super(Worker, self).__init__()
         self.queue = queue
         self.name = name
@@ -53,6 +130,26 @@ class Worker(multiprocessing.Process):
         self.builder = builder
         self.max_retry = max_retry
         self.lock = lock
+        self.events = events
+        self.update_childs = update_childs
+        self.peers = peers or []
+        self.steal_interval = steal_interval
+        self.prefetch = prefetch
+        self.serializer = serializer or PickleSerializer()
+        self.logs = logs
+        self.cache = collections.OrderedDict()
+
+    def emit(self, task_id, state, **info):
+        """Send a task state change to the manager.
+
+        Args:
+            task_id (str): task id.
+            state (int): new task state.
+            **info: extra run informations (func, duration, retry...)
+        """
+        if self.events is not None:
+            info['worker'] = self.name
+            self.events.put((task_id, state, info))
 
     def stop(self):
         """Stop the worker"""
@@ -60,39 +157,158 @@ class Worker(multiprocessing.Process):
             # send sigterm
             self.terminate()
 
+    def steal(self):
+        """Try to take a task from a random peer queue.
+
+        End-of-queue markers belong to their queue and are never stolen.
+
+        Returns:
+            tuple: (queue the task comes from, queue item) or (None, None).
+        """
+        peer = random.choice(self.peers)
+        try:
+            item = peer.get_nowait()
+        except QueueEmpty:
+            return None, None
+
+        if item[0] is None:
+            peer.put((None,))
+            peer.task_done()
+            return None, None
+
+        LOGGER.debug("%s> steal task.tid=%s", self.name, item[0])
+        return peer, item
+
+    def pull(self):
+        """Get the next task id to run.
+
+        Without peers, block on `queue`. Otherwise wait `steal_interval` on
+        `queue` then try to steal from a peer, until a task is found.
+
+        Returns:
+            tuple: (queue the task comes from, queue item). Queue items are
+                (task id,) or (task id, options), task id is None for the end
+                of queue.
+        """
+        if not self.peers:
+            return self.queue, self.queue.get()
+
+        while True:
+            try:
+                return self.queue, self.queue.get(True, self.steal_interval)
+            except QueueEmpty:
+                pass
+
+            source, item = self.steal()
+            if source is not None:
+                return source, item
+
+    def fetch(self, buffer):
+        """Fill `buffer` with task ids until the end of queue.
+
+        Run in a thread when `prefetch` is set, so the next tasks are already
+        local when the running one ends. Tasks in `buffer` can't be stolen.
+
+        Args:
+            buffer (Queue.Queue): local queue bounded to `prefetch` items.
+        """
+        while True:
+            source, item = self.pull()
+            buffer.put((source, item))
+            if item[0] is None:
+                break
+
+    def values(self, task, values):
+        """Results of tasks referenced by `task` inputs.
+
+        Results in the local `cache` are taken without copy, the others are
+        deserialized from values sent by the manager or read from `tasks`.
+
+        Args:
+            task (artron.task.Task): task to run.
+            values (dict): serialized results sent by the manager, task id as
+                key.
+
+        Returns:
+            dict: task id as key and results as value.
+        """
+        for r_tid in task.references():
+            if r_tid in self.cache:
+                values[r_tid] = self.cache[r_tid]
+            elif r_tid in values:
+                values[r_tid] = self.serializer.loads(values[r_tid])
+            else:
+                values[r_tid] = self.tasks[r_tid].results
+        return values
+
+    def publish(self, task):
+        """Keep results of `task` for the next tasks of this worker.
+
+        Args:
+            task (artron.task.Task): successful task.
+        """
+        self.cache[task.tid] = task.results
+        while len(self.cache) > self.CACHE_SIZE:
+            self.cache.popitem(last=False)
+
     def run(self):
         """Run infinite while receive a marker var or exec something"""
+        CURRENT['worker'] = self
+        if self.logs is not None:
+            redirect(self.logs)
+        debug = LOGGER.isEnabledFor(logging.DEBUG)
+
+        pull = self.pull
+        if self.prefetch > 0:
+            buffer = Queue(maxsize=self.prefetch)
+            fetcher = threading.Thread(target=self.fetch, args=(buffer,))
+            fetcher.daemon = True
+            fetcher.start()
+            pull = buffer.get
+
         while self.is_alive():
-            task, = self.queue.get()
+            source, item = pull()
+            task = item[0]
+            options = item[1] if len(item) > 1 else {}
             if task is None:
                 LOGGER.debug(
                     "%s> getting end-of-queue markers",
                     self.name
                 )
                 # Indicate that a formerly enqueued task is complete
-                self.queue.task_done()
+                source.task_done()
                 # reached end of queue
                 break
 
-            LOGGER.debug("%s> begin(%s) task.tid=%s", self.name,\
-                utils.strdate(), task)
+            # arguments of hot path logs cost a proxy call or a date
+            if debug:
+                LOGGER.debug("%s> begin(%s) task.tid=%s", self.name,\
+                    utils.strdate(), task)
 
             # run the task
             with self.lock:
                 current_task = self.tasks[task]
                 current_task.state = Task.STATE_RUNNING
                 self.tasks[task] = current_task
+            self.emit(task, Task.STATE_RUNNING)
 
+            retry = 0
+            info = {}
             try:
+                values = self.values(current_task, options.get('values', {}))
                 for retry in range_type(1, self.max_retry+1):
-                    LOGGER.debug("running retry=%d task state %d", \
-                        retry, self.tasks[task].state)
+                    if debug:
+                        LOGGER.debug("running retry=%d task state %d", \
+                            retry, self.tasks[task].state)
 
-                    result = current_task.run(self.builder, retry=retry)
+                    result = current_task.run(self.builder, retry=retry,
+                                              values=values)
 
                     if current_task.state == Task.STATE_SUCCESS:
-                        LOGGER.debug("%s> end(%s) task.tid=%s results=%s",\
-                            self.name, utils.strdate(), task, result)
+                        if debug:
+                            LOGGER.debug(
+                                "%s> end(%s) task.tid=%s results=%s",
+                                self.name, utils.strdate(), task, result)
                         break
 
             except TaskDependenciesError as err:
@@ -107,16 +323,33 @@ class Worker(multiprocessing.Process):
                 LOGGER.error(trb)
 
             finally:
+                # results used as input of other tasks are only sent with
+                # the event, the manager writes them back to tasks
+                stored = current_task
+                if options.get('publish') \
+                        and current_task.state == Task.STATE_SUCCESS:
+                    self.publish(current_task)
+                    info['results'] = \
+                        self.serializer.dumps(current_task.results)
+                    stored = copy.copy(current_task)
+                    stored.results = None
+
                 # write proxydict content
                 with self.lock:
-                    self.tasks[task] = current_task
-                    LOGGER.debug("update childs of %s", task)
-                    # Update tasks depends on this task
-                    for updated in current_task.update_childs(self.tasks):
-                        for tasku_id, tasku in iteritems(updated):
-                            # LOGGER.debug("update task of %s", tasku)
-                            self.tasks[tasku_id] = tasku
-
-                self.queue.task_done()
+                    self.tasks[task] = stored
+                    self.emit(task, current_task.state,
+                              func=current_task.func, retry=retry,
+                              duration=current_task.time_duration, **info)
+                    if self.update_childs:
+                        LOGGER.debug("update childs of %s", task)
+                        # Update tasks depends on this task
+                        for updated in current_task.update_childs(self.tasks):
+                            for tasku_id, tasku in iteritems(updated):
+                                # LOGGER.debug("update task of %s", tasku)
+                                self.tasks[tasku_id] = tasku
+                                if tasku.state != Task.STATE_INIT:
+                                    self.emit(tasku_id, tasku.state)
+
+                source.task_done()
         else:
             self.queue.task_done()
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Compare results sent raw and with `artron.serializer.PickleSerializer`.
+
+A result used as input of another task goes from the worker to the manager
+through the events queue, then from the manager to the next worker with the
+task. Each hop is a put and a get on a `multiprocessing.Manager` queue.
+
+Usage:
+    PYTHONPATH=. python benchmarks/serializer.py [size in MB ...]
+    tox -e bench -- [size in MB ...]
+
+Defaults to 1 16 256 1024 MB, 1GB needs a few GB of free memory.
+"""
+from __future__ import print_function
+
+import sys
+import time
+import multiprocessing
+
+from artron.serializer import PickleSerializer
+
+
+def hop(queue, obj, serializer=None):
+    """Send `obj` through the manager as a dataflow result does.
+
+    Returns:
+        float: duration in seconds.
+    """
+    time_start = time.time()
+    # worker -> manager -> worker
+    queue.put(serializer.dumps(obj) if serializer else obj)
+    queue.put(queue.get())
+    received = queue.get()
+    if serializer:
+        received = serializer.loads(received)
+    assert len(received['data']) == len(obj['data'])
+    return time.time() - time_start
+
+
+def main(sizes):
+    """Print durations by result size."""
+    mng = multiprocessing.Manager()
+    queue = mng.Queue()
+    serializer = PickleSerializer()
+
+    print('%10s %10s %10s %8s' % ('size (MB)', 'raw (s)', 'packed (s)',
+                                   'speedup'))
+    for size in sizes:
+        obj = {'data': bytearray(size * 1024 * 1024), 'size': size}
+        raw = min(hop(queue, obj) for _ in range(3))
+        packed = min(hop(queue, obj, serializer) for _ in range(3))
+        print('%10d %10.3f %10.3f %7.1fx' % (size, raw, packed, raw / packed))
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [1, 16, 256, 1024])
@@ -36,6 +36,11 @@ setup(
     keywords=['artron', 'multiprocessing', 'parallel'],
     packages=find_packages(),
     package_data = {'': ['README.md']},
+    entry_points={
+        'console_scripts': [
+            'artron-worker = artron.remote:main',
+        ],
+    },
     python_requires=">=2.7,!=3.0.*,!=3.1.*,!=3.2.*,!=3.3.*",
     classifiers=[
         'Development Status :: 2 - Pre-Alpha',
@@ -3,7 +3,9 @@ import six
 import pytest
 
 from artron.task import Task
-from artron.graph import Graph
+from artron.graph import Graph, CSRGraph, validate, order, levels, select, \
+    ancestors, descendants, transitive_reduction, GraphError, \
+    GraphCycleError, GraphDependencyError
 
 
 task1 = Task('for_test-tid1', {'msg': 'hello1'}, 'for_test')
@@ -85,3 +87,201 @@ def test_generate_edges():
 
     print(list(graph.edges()))
     assert sorted(edges) == sorted(list(graph.edges()))
+
+
+def test_validate():
+    validate(tasks)
+    validate({})
+
+
+def test_validate_missing():
+    task_a = Task('tid-a', {}, 'func', require=['tid-b', 'tid-x'])
+    task_b = Task('tid-b', {}, 'func', require=['tid-y'])
+
+    with pytest.raises(GraphDependencyError) as err:
+        validate({task_a.tid: task_a, task_b.tid: task_b})
+    assert err.value.missing == {'tid-a': ['tid-x'], 'tid-b': ['tid-y']}
+    assert 'tid-a requires tid-x' in str(err.value)
+
+
+def test_validate_cycle():
+    task_a = Task('tid-a', {}, 'func', require=['tid-b'])
+    task_b = Task('tid-b', {}, 'func', require=['tid-c', 'tid-d'])
+    task_c = Task('tid-c', {}, 'func')
+    task_d = Task('tid-d', {}, 'func', require=['tid-a'])
+
+    with pytest.raises(GraphCycleError) as err:
+        validate({
+            task_a.tid: task_a,
+            task_b.tid: task_b,
+            task_c.tid: task_c,
+            task_d.tid: task_d
+        })
+    assert err.value.path == ['tid-a', 'tid-b', 'tid-d', 'tid-a']
+    assert isinstance(err.value, GraphError)
+
+    # finished task are not part of the run
+    task_a.state = Task.STATE_SUCCESS
+    validate({
+        task_a.tid: task_a,
+        task_b.tid: task_b,
+        task_c.tid: task_c,
+        task_d.tid: task_d
+    })
+
+
+def test_validate_self_loop():
+    task_a = Task('tid-a', {}, 'func', require=['tid-a'])
+
+    with pytest.raises(GraphCycleError) as err:
+        validate({task_a.tid: task_a})
+    assert err.value.path == ['tid-a', 'tid-a']
+    assert str(err.value) == 'Task tid-a requires itself'
+
+
+def test_validate_deep():
+    # no recursion limit on long chains
+    chain = {}
+    for idx in range(5000):
+        require = ['tid-%d' % (idx + 1)] if idx < 4999 else []
+        chain['tid-%d' % idx] = Task('tid-%d' % idx, {}, 'func', require)
+    validate(chain)
+
+
+def test_order():
+    ordered = order(tasks)
+    assert sorted(ordered) == sorted(tasks)
+    for task_id in ordered:
+        for r_tid in tasks[task_id].require:
+            assert ordered.index(r_tid) < ordered.index(task_id)
+
+    # unknown requirements ignored, cycles left out
+    task_a = Task('tid-a', {}, 'func', require=['tid-b', 'unknown'])
+    task_b = Task('tid-b', {}, 'func', require=['tid-a'])
+    task_c = Task('tid-c', {}, 'func', require=['unknown'])
+    assert order({task.tid: task for task in (task_a, task_b, task_c)}) \
+        == ['tid-c']
+
+
+def test_select():
+    assert ancestors(tasks, [task2.tid]) == set([task2.tid, task4.tid])
+    assert descendants(tasks, [task4.tid]) == \
+        set([task4.tid, task2.tid, task1.tid])
+
+    assert select(tasks) == set(tasks)
+    assert select(tasks, targets=[task2.tid, task3.tid]) == \
+        set([task2.tid, task3.tid, task4.tid])
+    assert select(tasks, from_=[task2.tid]) == set([task1.tid, task2.tid])
+    assert select(tasks, targets=[task1.tid], from_=[task3.tid]) == \
+        set([task1.tid, task3.tid])
+
+    with pytest.raises(ValueError):
+        select(tasks, targets=['unknown'])
+
+
+def test_select_large():
+    # linear on long chains
+    chain = {}
+    for idx in range(100000):
+        require = ['tid-%d' % (idx - 1)] if idx else []
+        chain['tid-%d' % idx] = Task('tid-%d' % idx, {}, 'func', require)
+    assert len(select(chain, targets=['tid-99999'])) == 100000
+    assert len(select(chain, from_=['tid-50000'])) == 50000
+
+
+def test_levels():
+    assert [sorted(level) for level in levels(tasks)] == [
+        [task3.tid, task4.tid], [task2.tid], [task1.tid]]
+    assert levels({}) == []
+
+
+def test_csr_graph():
+    task_a = Task('tid-a', {}, 'func', require=['tid-b', 'tid-c', 'tid-d'])
+    task_b = Task('tid-b', {}, 'func', require=['tid-d'])
+    task_c = Task('tid-c', {}, 'func')
+    task_d = Task('tid-d', {}, 'func')
+    task_e = Task('tid-e', {}, 'func', require=['tid-e', 'done', 'tid-a'])
+    task_done = Task('done', {}, 'func')
+    task_done.state = Task.STATE_SUCCESS
+    tasks = dict((task.tid, task) for task in \
+        (task_a, task_b, task_c, task_d, task_e, task_done))
+
+    csr = CSRGraph(tasks)
+    graph = Graph(tasks)
+
+    # same interface as Graph
+    assert sorted(csr.edges()) == sorted(graph.edges())
+    assert sorted(csr.isolated_vertices()) == \
+        sorted(graph.isolated_vertices())
+    assert csr.size == graph.size == 6
+
+    # finished requirements are interned without row
+    assert len(csr) == 6 and csr.pending == 5
+    assert csr.requires('tid-e') == ['done', 'tid-a']
+    assert csr.requires('done') == []
+    assert sorted(csr.childs('tid-d')) == ['tid-a', 'tid-b']
+
+    assert csr.order() == ['tid-c', 'tid-d', 'tid-b', 'tid-a', 'tid-e']
+    assert [sorted(level) for level in csr.levels()] == [
+        ['tid-c', 'tid-d'], ['tid-b'], ['tid-a'], ['tid-e']]
+    assert csr.ancestors(['tid-b']) == set(['tid-b', 'tid-d'])
+    assert csr.descendants(['tid-b', 'unknown']) == \
+        set(['tid-b', 'tid-a', 'tid-e'])
+
+
+def test_csr_graph_large():
+    chain = {}
+    for idx in range(100000):
+        require = ['tid-%d' % (idx - 1)] if idx else []
+        chain['tid-%d' % idx] = Task('tid-%d' % idx, {}, 'func', require)
+    csr = CSRGraph(chain)
+    assert csr.order() == order(chain)
+    assert len(csr.levels()) == 100000
+    assert len(csr.ancestors(['tid-99999'])) == 100000
+    assert len(csr.descendants(['tid-50000'])) == 50000
+
+    # cycles are left out
+    chain['tid-0'].require = ['tid-99999']
+    assert CSRGraph(chain).order() == []
+
+
+def test_transitive_reduction():
+    task_a = Task('tid-a', {}, 'func', require=['tid-b', 'tid-c', 'tid-d'])
+    task_b = Task('tid-b', {}, 'func', require=['tid-d'])
+    task_c = Task('tid-c', {}, 'func')
+    task_d = Task('tid-d', {}, 'func')
+    task_e = Task('tid-e', {}, 'func',
+                  require=['done', 'tid-a', 'tid-d', 'tid-a'])
+    task_f = Task('tid-f', {}, 'func', require=['done'])
+    task_g = Task('tid-g', {}, 'func', require=['tid-f', 'done'])
+    task_done = Task('done', {}, 'func', require=['tid-d'])
+    task_done.state = Task.STATE_SUCCESS
+    tasks = dict((task.tid, task) for task in \
+        (task_a, task_b, task_c, task_d, task_e, task_f, task_g, task_done))
+    before = levels(tasks)
+
+    removed = transitive_reduction(tasks)
+
+    assert removed == {'tid-a': 1, 'tid-e': 2, 'tid-g': 1}
+    assert task_a.require == ['tid-b', 'tid-c']
+    # finished requirements are kept unless implied by a pending task
+    assert task_e.require == ['done', 'tid-a']
+    assert task_g.require == ['tid-f']
+    assert task_done.require == ['tid-d']
+    # same ordering
+    assert levels(tasks) == before
+
+    assert transitive_reduction(tasks) == {}
+
+
+def test_transitive_reduction_large():
+    tasks = {}
+    for idx in range(20000):
+        require = ['tid-%d' % (idx - step) for step in (1, 2, 3) \
+            if idx >= step]
+        tasks['tid-%d' % idx] = Task('tid-%d' % idx, {}, 'func', require)
+
+    removed = transitive_reduction(tasks)
+
+    assert sum(removed.values()) == 2 * 20000 - 5
+    assert all(len(task.require) <= 1 for task in tasks.values())
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+from artron.task import Task, Result
+from artron.incremental import fingerprints, Fingerprints
+
+
+def make_tasks(msg='a'):
+    task1 = Task('tid1', {'msg': msg}, 'func')
+    task2 = Task('tid2', {'msg': 'b'}, 'func', require=['tid1'])
+    task3 = Task('tid3', {'msg': 'c'}, 'func')
+    return {task.tid: task for task in (task1, task2, task3)}
+
+
+def test_fingerprints():
+    prints = fingerprints(make_tasks())
+    assert prints == fingerprints(make_tasks())
+
+    # changes go down to descendants only
+    changed = fingerprints(make_tasks('z'))
+    assert changed['tid1'] != prints['tid1']
+    assert changed['tid2'] != prints['tid2']
+    assert changed['tid3'] == prints['tid3']
+
+
+def test_plan(tmpdir):
+    path = str(tmpdir.join('artron.json'))
+    store = Fingerprints(path)
+    store.load()
+    assert store.records == {}
+
+    tasks = make_tasks()
+    prints, uptodate = store.plan(tasks)
+    assert uptodate == set()
+
+    for task in tasks.values():
+        task.state = Task.STATE_SUCCESS
+        task.results = task.tid
+        store.record(task, prints[task.tid])
+    # not JSON results are not recorded
+    tasks['tid3'].results = object()
+    store.record(tasks['tid3'], prints['tid3'])
+    store.save()
+
+    store = Fingerprints(path)
+    store.load()
+    assert sorted(store.records) == ['tid1', 'tid2']
+    assert store.plan(make_tasks())[1] == set(['tid1', 'tid2'])
+    assert store.plan(make_tasks('z'))[1] == set()
+
+    # failed task is forgotten
+    tasks['tid1'].state = Task.STATE_ERROR
+    store.record(tasks['tid1'], prints['tid1'])
+    assert store.plan(make_tasks())[1] == set()
+
+
+def test_plan_result_reference():
+    tasks = make_tasks()
+    tasks['tid4'] = Task('tid4', {'msg': Result('tid1')}, 'func')
+    prints = fingerprints(tasks)
+    tasks['tid4'] = Task('tid4', {'msg': Result('tid1', 'key')}, 'func')
+    assert fingerprints(tasks)['tid4'] != prints['tid4']
+
+
+def test_plan_not_json_inputs(tmpdir):
+    class Cfg(object):
+        def __init__(self, value):
+            self.value = value
+
+        def __repr__(self):
+            return 'Cfg(...)'
+
+    def make_cfg_tasks(value):
+        tasks = make_tasks()
+        tasks['tid1'].inputs = {'cfg': Cfg(value)}
+        return tasks
+
+    prints = fingerprints(make_cfg_tasks(1))
+    assert prints['tid1'] is None
+    assert prints['tid3'] is not None
+
+    store = Fingerprints(str(tmpdir.join('artron.json')))
+    tasks = make_cfg_tasks(1)
+    for task in tasks.values():
+        task.state = Task.STATE_SUCCESS
+        task.results = task.tid
+        store.record(task, prints[task.tid])
+    assert sorted(store.records) == ['tid2', 'tid3']
+
+    # same repr, the task and its descendants are never up-to-date
+    assert store.plan(make_cfg_tasks(2))[1] == set(['tid3'])
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+import pytest
+from mock import patch
+
+from artron.task import Task
+from artron.limits import Limit, Limiter
+
+
+def test_limit_concurrency():
+    limit = Limit(concurrency=2)
+    assert limit.allows()
+    limit.acquire()
+    limit.acquire()
+    assert not limit.allows()
+    limit.release()
+    assert limit.allows()
+    assert limit.delay() == 0.0
+
+
+@patch('artron.limits.time.time')
+def test_limit_rate(now):
+    now.return_value = 100.0
+    limit = Limit(rate=2, per=10)
+    limit.acquire()
+    limit.acquire()
+    assert not limit.allows()
+    assert limit.delay() == 5.0
+
+    now.return_value = 105.0
+    assert limit.allows()
+    # no more than burst
+    now.return_value = 1000.0
+    limit.allows()
+    assert limit.tokens == 2.0
+
+
+@patch('artron.limits.time.time')
+def test_limit_fractional_rate(now):
+    now.return_value = 100.0
+    # one task every 2 seconds
+    limit = Limit(rate=0.5)
+    assert limit.burst == 1
+    assert limit.allows()
+    limit.acquire()
+    assert not limit.allows()
+    assert limit.delay() == 2.0
+
+    now.return_value = 102.0
+    assert limit.allows()
+
+
+def test_limit_wrong():
+    with pytest.raises(ValueError):
+        Limit(concurrency=0)
+    with pytest.raises(ValueError):
+        Limit(rate=-1)
+    with pytest.raises(ValueError):
+        Limit(rate=10, burst=0)
+    with pytest.raises(ValueError):
+        Limit(rate=10, burst=0.5)
+    with pytest.raises(ValueError):
+        Limiter({'func': 5})
+
+
+def test_limiter():
+    limiter = Limiter({'func': Limit(concurrency=1),
+                       'api': Limit(concurrency=2)})
+    task1 = Task('tid1', {}, 'func', tags=['api'])
+    task2 = Task('tid2', {}, 'other', tags=['api'])
+    task3 = Task('tid3', {}, 'other')
+
+    assert limiter.keys(task1) == ['func', 'api']
+    assert limiter.keys(task3) == []
+
+    limiter.acquire(task1)
+    assert limiter.blocking(Task('tid4', {}, 'func')) == 'func'
+    assert limiter.blocking(task2) is None
+    limiter.acquire(task2)
+    assert limiter.blocking(task2) == 'api'
+    assert limiter.blocking(task3) is None
+
+    limiter.release(task1.tid)
+    assert limiter.running == {'tid2': ['api']}
+    assert limiter.delay(['func', 'api']) is None
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+import logging
+
+import pytest
+
+from artron._py6 import Queue
+from artron import logs
+from artron.logs import redirect, configure, LogListener, QueueListener
+
+pytestmark = pytest.mark.skipif(QueueListener is None,
+                                reason="requires logging QueueListener")
+
+
+class Records(logging.Handler):
+
+    def __init__(self, level=logging.NOTSET):
+        super(Records, self).__init__(level)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def test_configure(monkeypatch):
+    logger = logging.getLogger('artron')
+    monkeypatch.setitem(logs._CONFIGURED, 'done', False)
+    monkeypatch.setattr(logger, 'handlers', [])
+    monkeypatch.setattr(logger, 'level', logging.NOTSET)
+    monkeypatch.setattr(logging.getLogger(), 'handlers', [])
+    configure()
+    assert logger.level == logging.ERROR
+    assert len(logger.handlers) == 1
+
+    # setup of the application is kept
+    handler = Records()
+    monkeypatch.setitem(logs._CONFIGURED, 'done', False)
+    monkeypatch.setattr(logger, 'handlers', [handler])
+    monkeypatch.setattr(logger, 'level', logging.INFO)
+    configure()
+    assert logger.level == logging.INFO
+    assert logger.handlers == [handler]
+
+
+def test_redirect():
+    queue = Queue()
+    logger = logging.getLogger('artron-test-redirect')
+    logger.setLevel(logging.INFO)
+    logger.addHandler(Records())
+
+    handler = redirect(queue, name='artron-test-redirect')
+    assert logger.handlers == [handler]
+    assert not logger.propagate
+
+    logger.debug("dropped %s", object())
+    logger.info("task %s", 'tid')
+    record = queue.get_nowait()
+    # formatted once, arguments are not sent
+    assert record.getMessage() == "task tid"
+    assert record.args is None
+    assert queue.empty()
+
+
+def test_listener():
+    queue = Queue()
+    logger = logging.getLogger('artron-test-listener')
+    records = Records(level=logging.ERROR)
+    logger.addHandler(records)
+    root = Records(level=logging.ERROR)
+    logging.getLogger().addHandler(root)
+
+    listener = LogListener(queue)
+    listener.start()
+    try:
+        for level in (logging.INFO, logging.ERROR):
+            record = logging.LogRecord('artron-test-listener.worker', level,
+                                       __file__, 1, "message %d", (level,),
+                                       None)
+            queue.put(record)
+    finally:
+        listener.stop()
+        logging.getLogger().removeHandler(root)
+
+    # handled by the parents of the record logger, up to the root one
+    assert [record.getMessage() for record in records.records] == \
+        ["message %d" % logging.ERROR]
+    assert [record.getMessage() for record in root.records] == \
+        ["message %d" % logging.ERROR]
+    assert listener.listener is None
+    # stop twice is a no-op
+    listener.stop()
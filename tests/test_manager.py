@@ -1,15 +1,26 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function
 
+import os
 import sys
+import json
+import subprocess
 import time
+import heapq
+import logging
 import multiprocessing
 
 import pytest
 from mock import patch, MagicMock
 
-from artron.task import Task
+from artron.task import Task, Result, Barrier
 from artron.manager import Manager
+from artron.worker import submit
+from artron.limits import Limit
+from artron.scheduler import Scheduler
+from artron.planner import chains
+from artron import remote
+from artron.graph import GraphCycleError, GraphDependencyError
 
 class Builder(object):
     
@@ -29,6 +40,22 @@ class Builder(object):
         time.sleep(0.1)
         return "builder_func_4 ==> " + msg
 
+    def builder_listing(self, msg, retry):
+        tasks = [
+            Task('%s-%d' % (msg, idx), {'msg': msg}, 'builder_func_4')
+            for idx in range(3)
+        ]
+        tasks.append(Task('%s-fail' % msg, {'msg': msg}, 'builder_func_4',
+                          require=['unknown']))
+        submit(tasks, childs=['task-id-report'])
+        return len(tasks)
+
+    def builder_split(self, msg, retry):
+        return {'words': msg.split(), 'pid': os.getpid()}
+
+    def builder_count(self, words, pid, retry):
+        return {'count': len(words), 'same': pid == os.getpid()}
+
 
 class ProgressBar(object):
     """Simple progress bar"""
@@ -166,5 +193,816 @@ def test_default():
     assert manager2.sleep == 2
     assert manager2.tasks == {1:2}
 
+
+def test_metrics(tmpdir):
+    path = str(tmpdir.join('artron.prom'))
+    manager = Manager(Builder(), nb_workers=2, sleep=0.1, metrics_path=path)
+
+    task1 = Task('task-id-1', {'msg': 'task-1-msg'}, 'builder_func_1')
+    task2 = Task('task-id-2', {'msg': 'task-2-msg'}, 'builder_func_3')
+    task3 = Task('task-id-3', {'msg': 'task-3-msg'}, 'builder_func_4',
+                 require=[task2.tid])
+    manager.add(task1)
+    manager.add(task2)
+    manager.add(task3)
+
+    manager.start()
+
+    assert manager.metrics.states[Task.STATE_SUCCESS] == 1
+    assert manager.metrics.states[Task.STATE_ERROR] == 1
+    assert manager.metrics.states[Task.STATE_DEPENDENCY] == 1
+    assert manager.metrics.states[Task.STATE_INIT] == 0
+    assert manager.metrics.retries['builder_func_3'] == 2
+
+    text = open(path).read()
+    assert 'artron_tasks{state="success"} 1' in text
+    assert 'artron_task_duration_seconds_count{func="builder_func_1"} 1' \
+        in text
+
+
+def test_start_cycle():
+    manager = Manager(Builder(), nb_workers=1)
+
+    manager.add(Task('task-id-1', {'msg': 'task-1-msg'}, 'builder_func_1',
+                     require=['task-id-2']))
+    manager.add(Task('task-id-2', {'msg': 'task-2-msg'}, 'builder_func_1',
+                     require=['task-id-1']))
+
+    with pytest.raises(GraphCycleError):
+        manager.start()
+
+    assert not manager.workers[0].is_alive()
+
+
+def test_add_many():
+    manager = Manager(Builder(), nb_workers=2, sleep=0.1)
+
+    count = manager.add_many(
+        Task('task-id-%d' % idx, {'msg': 'task-msg'}, 'builder_func_4')
+        for idx in range(10)
+    )
+    assert count == 10
+    assert len(manager.tasks) == 10
+
+    with pytest.raises(ValueError):
+        manager.add_many([Task('dup', {}, 'func'), Task('dup', {}, 'func')])
+
+    with pytest.raises(ValueError):
+        manager.add_many([1])
+
+    # nothing sent on error
+    assert len(manager.tasks) == 10
+
+    results = manager.start()
+    assert results['results']['success'] == 10
+    assert results['exit_code'] == 0
+
+
+def test_init_tasks_iterable():
+    task1 = Task('task-id-1', {'msg': 'task-1-msg'}, 'builder_func_4')
+    task2 = Task('task-id-2', {'msg': 'task-2-msg'}, 'builder_func_4',
+                 require=[task1.tid])
+
+    manager = Manager(Builder(), nb_workers=1, sleep=0.1,
+                      tasks=[task1, task2])
+    assert sorted(manager.tasks.keys()) == [task1.tid, task2.tid]
+
+    results = manager.start()
+    assert results['exit_code'] == 0
+
+
+def test_submit():
+    manager = Manager(Builder(), nb_workers=2, sleep=0.1)
+
+    manager.add(Task('task-id-list', {'msg': 'sub'}, 'builder_listing'))
+    manager.add(Task('task-id-report', {'msg': 'report'}, 'builder_func_4',
+                     require=['task-id-list']))
+
+    results = manager.start()
+
+    states = dict((task['tid'], task['state']) for task in results['tasks'])
+    assert states == {
+        'task-id-list': Task.STATE_SUCCESS,
+        'task-id-report': Task.STATE_SUCCESS,
+        'sub-0': Task.STATE_SUCCESS,
+        'sub-1': Task.STATE_SUCCESS,
+        'sub-2': Task.STATE_SUCCESS,
+        'sub-fail': Task.STATE_WRONG,
+    }
+    report = manager.tasks['task-id-report']
+    assert report.date_start > max(manager.tasks['sub-%d' % idx].date_end
+                                   for idx in range(3))
+
+
+def test_submit_wrong_state():
+    manager = Manager(Builder(), nb_workers=1, sleep=0.1)
+    manager.scheduler = Scheduler()
+    task = Task('tid', {}, 'func')
+    task.state = Task.STATE_SUCCESS
+
+    with patch('artron.manager.LOGGER') as logger:
+        batch = manager._submit([task], [])
+
+    assert batch['tid'].state == Task.STATE_WRONG
+    # reason is the state, not requirements
+    args = logger.error.call_args[0]
+    assert 'state' in args[0]
+    assert args[1:] == ('tid', Task.STATE_SUCCESS, Task.STATE_INIT)
+
+
+def test_submit_outside_worker():
+    with pytest.raises(RuntimeError):
+        submit(Task('tid', {}, 'func'))
+
+
+def test_map():
+    manager = Manager(Builder(), nb_workers=2, sleep=0.1)
+    manager.add(Task('task-id-1', {'msg': 'task-1-msg'}, 'builder_func_4'))
+
+    lazy = manager.map(
+        'mapped',
+        'builder_func_4',
+        ({'msg': 'msg-%d' % idx} for idx in range(6)),
+        require=['task-id-1'],
+        window=2,
+    )
+    kept = manager.generate(
+        (Task('kept-%d' % idx, {'msg': 'kept'}, 'builder_func_4') \
+            for idx in range(2)),
+        keep=True,
+    )
+
+    results = manager.start()
+
+    assert lazy.created == 6
+    assert not lazy.active
+    assert results['results']['success'] == 9
+    assert results['exit_code'] == 0
+    # successful mapped tasks are only counted
+    assert sorted(manager.tasks.keys()) == ['kept-0', 'kept-1', 'task-id-1']
+
+
+def test_map_failed_require():
+    manager = Manager(Builder(), nb_workers=1, sleep=0.1)
+    manager.add(Task('task-id-3', {'msg': 'task-3-msg'}, 'builder_func_3'))
+    lazy = manager.map('mapped', 'builder_func_4', [{'msg': 'msg'}],
+                       require=['task-id-3'])
+
+    results = manager.start()
+
+    assert lazy.created == 0
+    assert results['exit_code'] == 1
+
+
+def test_generate_failed_dependency():
+    manager = Manager(Builder(), nb_workers=1, sleep=0.1, run_timeout=30)
+    manager.add(Task('task-id-3', {'msg': 'task-3-msg'}, 'builder_func_3'))
+    lazy = manager.generate(
+        (Task('gen-%d' % idx, {'msg': 'msg'}, 'builder_func_4',
+              require=['task-id-3']) for idx in range(4)),
+        window=2,
+    )
+
+    time_start = time.time()
+    results = manager.start()
+
+    assert time.time() - time_start < 10
+    assert lazy.created == 4
+    assert not lazy.active
+    assert results['results']['deps'] == 4
+
+
+def test_generate_forgotten_require():
+    manager = Manager(Builder(), nb_workers=1, sleep=0.1, run_timeout=30)
+
+    def tasks():
+        yield Task('gen-0', {'msg': 'msg'}, 'builder_func_4')
+        # materialized once gen-0 is finished and forgotten
+        yield Task('gen-1', {'msg': 'msg'}, 'builder_func_4',
+                   require=['gen-0'])
+
+    lazy = manager.generate(tasks(), window=1)
+
+    time_start = time.time()
+    results = manager.start()
+
+    assert time.time() - time_start < 10
+    assert lazy.created == 2
+    assert results['exit_code'] == 0
+    assert results['results']['success'] == 2
+
+
+def test_generate_bounded_states():
+    manager = Manager(Builder(), nb_workers=2, sleep=0.1)
+    manager.add(Task('task-id-1', {'msg': 'task-1-msg'}, 'builder_func_4'))
+    lazy = manager.generate(
+        (Task('gen-%d' % idx, {'msg': 'msg'}, 'builder_func_4',
+              require=['task-id-1', 'gen-%d' % (idx - 1)] if idx \
+                  else ['task-id-1']) for idx in range(20)),
+        window=2,
+    )
+
+    results = manager.start()
+
+    assert results['exit_code'] == 0
+    assert results['results']['success'] == 21
+    # forgotten tasks are only counted
+    assert list(lazy.recent) == ['gen-18', 'gen-19']
+    assert sorted(manager.scheduler.states) == [
+        'gen-18', 'gen-19', 'task-id-1']
+
+
+def test_map_unknown_require():
+    manager = Manager(Builder(), nb_workers=1)
+    manager.map('mapped', 'builder_func_4', [], require=['unknown'])
+
+    with pytest.raises(GraphDependencyError):
+        manager.start()
+
+
+def test_steal():
+    manager = Manager(Builder(), nb_workers=3, sleep=0.1, steal=True)
+    assert list(manager.inboxes) == ['worker-0', 'worker-1', 'worker-2']
+    assert manager.workers[0].queue is manager.inboxes['worker-0']
+    assert len(manager.workers[0].peers) == 3
+
+    manager.add_many(
+        Task('task-id-%d' % idx, {'msg': 'task-msg'}, 'builder_func_4',
+             require=['task-id-%d' % (idx - 3)] if idx >= 3 else None)
+        for idx in range(12)
+    )
+
+    results = manager.start()
+
+    assert results['results']['success'] == 12
+    assert results['exit_code'] == 0
+
+
+def test_prefetch():
+    manager = Manager(Builder(), nb_workers=2, sleep=0.1, prefetch=2,
+                      steal=True)
+    assert manager.workers[0].prefetch == 2
+
+    manager.add_many(
+        Task('task-id-%d' % idx, {'msg': 'task-msg'}, 'builder_func_4')
+        for idx in range(8)
+    )
+
+    results = manager.start()
+
+    assert results['results']['success'] == 8
+
+
+def test_remote():
+    manager = Manager(Builder(), nb_workers=0, sleep=0.1,
+                      address=('127.0.0.1', 0), authkey=b'secret')
+    assert manager.address[1] > 0
+    assert manager.workers == []
+
+    manager.add(Task('task-id-1', {'msg': 'task-1-msg'}, 'builder_func_4'))
+    manager.add(Task('task-id-2', {'msg': 'task-2-msg'}, 'builder_func_4',
+                     require=['task-id-1']))
+    manager.add(Task('task-id-3', {'msg': 'task-3-msg'}, 'builder_func_3'))
+
+    # two hosts on localhost
+    hosts = [
+        multiprocessing.Process(
+            target=remote.work,
+            args=(manager.address, b'secret', Builder()),
+            kwargs={'nb_workers': 2, 'name': 'host%d' % idx},
+        )
+        for idx in range(2)
+    ]
+    for host in hosts:
+        host.start()
+
+    results = manager.start()
+
+    for host in hosts:
+        host.join(10)
+        assert host.exitcode == 0
+
+    assert manager.remote_workers == set(
+        ['host0-0', 'host0-1', 'host1-0', 'host1-1'])
+    assert results['results']['success'] == 2
+    assert results['results']['failures'] == 1
+    assert manager.tasks['task-id-2'].results == 'builder_func_4 ==> '\
+        'task-2-msg'
+
+
+def test_remote_authkey():
+    with pytest.raises(ValueError):
+        Manager(Builder(), nb_workers=0, address=('127.0.0.1', 0))
+
+
+def test_affinity():
+    manager = Manager(Builder(), nb_workers=3, steal=True)
+    assert manager._route(affinity='tenant-a') == 'worker-0'
+
+    # a key keeps its worker, a new one goes to the least loaded worker
+    manager._loads['worker-0'] = 2
+    assert manager._route(affinity='tenant-a') == 'worker-0'
+    assert manager._route(affinity='tenant-b') == 'worker-1'
+
+    # overloaded owner, fallback to the least loaded worker
+    manager._loads['worker-0'] = manager.AFFINITY_SLACK + 1
+    assert manager._route(affinity='tenant-a') == 'worker-1'
+    assert manager.affinities['tenant-a'] == 'worker-0'
+
+    # without worker queues, the shared queue
+    manager = Manager(Builder(), nb_workers=1)
+    assert manager._route(affinity='tenant-a') is None
+
+
+def test_affinity_run():
+    manager = Manager(Builder(), nb_workers=2, sleep=0.1, steal=True)
+    manager.add_many(
+        Task('task-id-%d' % idx, {'msg': 'task-msg'}, 'builder_func_4',
+             affinity='tenant-%d' % (idx % 2))
+        for idx in range(6)
+    )
+
+    results = manager.start()
+
+    assert results['exit_code'] == 0
+    assert sorted(manager.affinities) == ['tenant-0', 'tenant-1']
+    assert all(load == 0 for load in manager._loads.values())
+
+
+def test_dataflow():
+    manager = Manager(Builder(), nb_workers=2, sleep=0.1, steal=True)
+    manager.add_many([
+        Task('split', {'msg': 'a b c'}, 'builder_split'),
+        Task('count', {'words': Result('split', 'words'),
+                       'pid': Result('split', 'pid')}, 'builder_count'),
+        Task('failed', {'msg': 'x'}, 'builder_func_3'),
+        Task('never', {'words': Result('failed'), 'pid': 0}, 'builder_count'),
+    ])
+    assert manager.tasks['count'].require == ['split']
+
+    results = manager.start()
+
+    assert manager.tasks['count'].state == Task.STATE_SUCCESS
+    assert manager.tasks['count'].results['count'] == 3
+    assert manager.tasks['never'].state == Task.STATE_DEPENDENCY
+    assert results['results']['success'] == 2
+    # nothing left referenced, published results are back in tasks
+    assert manager.values == {}
+    assert manager.tasks['split'].results['words'] == ['a', 'b', 'c']
+
+
+def test_incremental(tmpdir):
+    path = str(tmpdir.join('artron.json'))
+
+    def run(msg):
+        manager = Manager(Builder(), nb_workers=2, sleep=0.1,
+                          incremental=path)
+        manager.add_many([
+            Task('split', {'msg': msg}, 'builder_split'),
+            Task('count', {'words': Result('split', 'words'),
+                           'pid': Result('split', 'pid')}, 'builder_count'),
+            Task('other', {'msg': 'x'}, 'builder_func_4'),
+            Task('failed', {'msg': 'x'}, 'builder_func_3'),
+        ])
+        return manager, manager.start()
+
+    manager, results = run('a b c')
+    assert results['results']['uptodate'] == 0
+    assert results['results']['success'] == 3
+
+    # only the failed task runs again
+    manager, results = run('a b c')
+    assert manager.uptodate == set(['split', 'count', 'other'])
+    assert results['results']['uptodate'] == 3
+    assert results['results']['failures'] == 1
+    assert manager.tasks['count'].results['count'] == 3
+
+    # changed task and its descendants run again
+    manager, results = run('a b')
+    assert manager.uptodate == set(['other'])
+    assert manager.tasks['count'].results['count'] == 2
+
+
+def test_start_targets():
+    def tasks():
+        return [
+            Task('task-id-1', {'msg': 'msg'}, 'builder_func_4'),
+            Task('task-id-2', {'msg': 'msg'}, 'builder_func_4',
+                 require=['task-id-1']),
+            Task('task-id-3', {'msg': 'msg'}, 'builder_func_4',
+                 require=['task-id-2']),
+            Task('task-id-4', {'msg': 'msg'}, 'builder_func_3'),
+        ]
+
+    manager = Manager(Builder(), nb_workers=2, sleep=0.1, tasks=tasks())
+    results = manager.start(targets=['task-id-2'])
+    assert sorted(task['tid'] for task in results['tasks']) == \
+        ['task-id-1', 'task-id-2']
+    assert results['exit_code'] == 0
+    assert manager.tasks['task-id-3'].state == Task.STATE_INIT
+
+    # requirements out of the selection are considered done
+    manager = Manager(Builder(), nb_workers=2, sleep=0.1, tasks=tasks())
+    results = manager.start(from_=['task-id-2'])
+    assert sorted(task['tid'] for task in results['tasks']) == \
+        ['task-id-2', 'task-id-3']
+    assert results['exit_code'] == 0
+    assert manager.tasks['task-id-1'].state == Task.STATE_INIT
+
+    with pytest.raises(ValueError):
+        manager.start(targets=['unknown'])
+
+
+def test_limits():
+    manager = Manager(Builder(), nb_workers=3, sleep=0.1,
+                      limits={'builder_func_1': Limit(concurrency=1)})
+    manager.add_many(
+        [Task('limited-%d' % idx, {'msg': 'msg'}, 'builder_func_1')
+         for idx in range(3)] +
+        [Task('free-%d' % idx, {'msg': 'msg'}, 'builder_func_4')
+         for idx in range(3)]
+    )
+
+    results = manager.start()
+    assert results['exit_code'] == 0
+
+    # limited tasks never overlap
+    limited = sorted((manager.tasks['limited-%d' % idx].date_start,
+                      manager.tasks['limited-%d' % idx].date_end)
+                     for idx in range(3))
+    for previous, current in zip(limited, limited[1:]):
+        assert previous[1] <= current[0]
+    assert manager.limiter.running == {}
+    assert manager._held == {}
+
+
+def test_fail_fast():
+    manager = Manager(Builder(), nb_workers=2, sleep=0.1, fail_fast=True,
+                      max_retry=1)
+    manager.add_many([
+        Task('failed', {'msg': 'msg'}, 'builder_func_3'),
+        Task('long', {'msg': 'msg'}, 'builder_func_2'),
+    ] + [
+        Task('next-%d' % idx, {'msg': 'msg'}, 'builder_func_4',
+             require=['long'])
+        for idx in range(5)
+    ])
+
+    results = manager.start()
+
+    assert manager.aborted_by == 'failed'
+    assert results['exit_code'] == 1
+    assert results['results']['failures'] == 1
+    # running task terminated, nothing sent after the failure
+    assert results['results']['aborted'] == 1
+    assert results['results']['nrun'] == 5
+
+
+def test_critical():
+    manager = Manager(Builder(), nb_workers=1, sleep=0.1)
+    manager.add_many([
+        Task('failed', {'msg': 'msg'}, 'builder_func_3'),
+        Task('other', {'msg': 'msg'}, 'builder_func_4', require=['failed']),
+        Task('free', {'msg': 'msg'}, 'builder_func_4'),
+    ])
+    results = manager.start()
+    # not critical, the run continues
+    assert manager.aborted_by is None
+    assert results['results']['success'] == 1
+
+    manager = Manager(Builder(), nb_workers=1, sleep=0.1)
+    manager.add_many([
+        Task('critical', {'msg': 'msg'}, 'builder_func_3', critical=True,
+             priority=1),
+        Task('free-1', {'msg': 'msg'}, 'builder_func_4', require=['wait']),
+        Task('free-2', {'msg': 'msg'}, 'builder_func_4', require=['wait']),
+        Task('wait', {'msg': 'msg'}, 'builder_func_1'),
+    ])
+    results = manager.start()
+    assert manager.aborted_by == 'critical'
+    assert results['exit_code'] == 1
+    # 'wait' is not sent while the only worker runs 'critical'
+    assert results['results']['nrun'] == 3
+
+    # a critical task failed by its requirement can't run anymore
+    manager = Manager(Builder(), nb_workers=1, sleep=0.1)
+    manager.add_many([
+        Task('failed', {'msg': 'msg'}, 'builder_func_3', priority=1),
+        Task('critical', {'msg': 'msg'}, 'builder_func_4', critical=True,
+             require=['failed']),
+    ])
+    manager.add_many(
+        Task('free-%d' % idx, {'msg': 'msg'}, 'builder_func_4')
+        for idx in range(5)
+    )
+    results = manager.start()
+    assert manager.aborted_by == 'critical'
+    assert results['exit_code'] == 1
+    assert results['results']['nrun'] == 5
+
+
+def test_priority_released_later():
+    manager = Manager(Builder(), nb_workers=1, sleep=0.1)
+    manager.add(Task('first', {'msg': 'msg'}, 'builder_func_4', priority=1))
+    manager.add(Task('high', {'msg': 'msg'}, 'builder_func_4',
+                     require=['first'], priority=100))
+    manager.add_many(
+        Task('low-%d' % idx, {'msg': 'msg'}, 'builder_func_4')
+        for idx in range(20)
+    )
+
+    results = manager.start()
+
+    assert results['exit_code'] == 0
+    # ready low priority tasks are not queued ahead of it
+    high = manager.tasks['high'].date_start
+    assert sum(manager.tasks['low-%d' % idx].date_start < high
+               for idx in range(20)) <= 1
+
+
+def test_ready_queue_depth():
+    manager = Manager(Builder(), nb_workers=1, prefetch=1)
+    manager.add_many(
+        Task('task-id-%d' % idx, {'msg': 'msg'}, 'builder_func_4')
+        for idx in range(5)
+    )
+    manager.scheduler.load(manager.tasks)
+
+    manager._dispatch()
+
+    # one running, one prefetched, the others wait in the scheduler
+    assert manager.queue.qsize() == 2
+    assert manager.metrics.queued == 3
+    assert 'artron_ready_queue_depth 3' in manager.metrics.render()
+
+
+def test_progress_eta():
+    class Progress(ProgressBar):
+        postfix = None
+
+        def set_postfix_str(self, postfix):
+            self.postfix = postfix
+
+    manager = Manager(Builder(), nb_workers=1, sleep=0.1)
+    manager.progress = Progress(total=4)
+    manager.add_many([
+        Task('task-id-%d' % idx, {'msg': 'msg'}, 'builder_func_4',
+             require=['task-id-%d' % (idx - 1)] if idx else None)
+        for idx in range(3)
+    ] + [Task('task-id-fail', {'msg': 'msg'}, 'builder_func_3')])
+
+    # no scan of tasks to count finished ones
+    with patch.object(Task, 'is_finished') as is_finished:
+        results = manager.start()
+    assert not is_finished.called
+
+    assert manager.progress.n == 4
+    assert manager.progress.postfix == 'eta 00:00:00'
+    assert manager.eta() == 0.0
+
+
+def test_eta():
+    manager = Manager(Builder(), nb_workers=2, costs={'builder_func_4': 10})
+    manager.progress = ProgressBar()
+    manager.add_many([
+        Task('task-id-%d' % idx, {'msg': 'msg'}, 'builder_func_4',
+             require=['task-id-%d' % (idx - 1)] if idx else None)
+        for idx in range(3)
+    ] + [Task('task-id-%d' % idx, {'msg': 'msg'}, 'builder_func_1')
+         for idx in range(3, 5)])
+
+    snapshot = manager.tasks.copy()
+    manager.metrics.reset(snapshot)
+    manager.scheduler.load(snapshot)
+    manager._chains = [(-length, task_id) for task_id, length
+                       in chains(snapshot, manager.costs).items()]
+    heapq.heapify(manager._chains)
+
+    # critical path of 3 tasks of 10 seconds
+    assert manager.eta() == 30.0
+
+    # without costs nor observation
+    manager.costs = None
+    manager._chains = [(-2.0, 'task-id-1'), (-1.0, 'task-id-3')]
+    assert manager.eta() is None
+    manager.metrics.observe('builder_func_1', 20.0)
+    # 5 tasks of 20 seconds on 2 workers
+    assert manager.eta() == 50.0
+    # chain of 4 tasks of 20 seconds
+    manager._chains = [(-4.0, 'task-id-0')]
+    assert manager.eta() == 80.0
+    # finished tasks are skipped
+    manager.scheduler.states['task-id-0'] = Task.STATE_SUCCESS
+    assert manager.eta() == 50.0
+
+
+def test_report(tmpdir):
+    path = str(tmpdir.join('run.jsonl'))
+    manager = Manager(Builder(), nb_workers=2, sleep=0.1, report=path)
+    manager.add_many([
+        Task('task-id-1', {'msg': 'msg'}, 'builder_func_4'),
+        Task('task-id-2', {'msg': 'msg'}, 'builder_func_3'),
+        Task('task-id-3', {'msg': 'msg'}, 'builder_func_4',
+             require=['task-id-2']),
+    ])
+    manager.map('mapped', 'builder_func_4',
+                ({'msg': 'msg'} for _ in range(3)), window=2)
+
+    results = manager.start()
+
+    assert results['tasks'] == []
+    assert results['results']['success'] == 4
+    assert results['results']['failures'] == 1
+    assert results['results']['deps'] == 1
+    assert results['exit_code'] == 1
+
+    with open(path) as fd:
+        lines = [json.loads(line) for line in fd]
+    assert sorted(line['tid'] for line in lines[:-1]) == [
+        'mapped-0', 'mapped-1', 'mapped-2',
+        'task-id-1', 'task-id-2', 'task-id-3']
+    assert lines[-1]['summary']['results'] == results['results']
+    assert 'tasks' not in lines[-1]['summary']
+
+
+def test_report_not_finished(tmpdir):
+    path = str(tmpdir.join('run.jsonl'))
+    manager = Manager(Builder(), nb_workers=1, sleep=0.1, report=path,
+                      fail_fast=True)
+    done = Task('done', {'msg': 'msg'}, 'builder_func_4')
+    done.state = Task.STATE_SUCCESS
+    manager.add_many([
+        done,
+        Task('failed', {'msg': 'msg'}, 'builder_func_3', priority=1),
+    ])
+    manager.add_many(
+        Task('left-%d' % idx, {'msg': 'msg'}, 'builder_func_4')
+        for idx in range(3)
+    )
+
+    results = manager.start()
+
+    assert manager.aborted_by == 'failed'
+    with open(path) as fd:
+        lines = [json.loads(line) for line in fd]
+    # finished before the run and not run tasks are reported too
+    states = dict((line['tid'], line['state']) for line in lines[:-1])
+    assert states == {
+        'done': Task.STATE_SUCCESS,
+        'failed': Task.STATE_ERROR,
+        'left-0': Task.STATE_INIT,
+        'left-1': Task.STATE_INIT,
+        'left-2': Task.STATE_INIT,
+    }
+    assert lines[-1]['summary']['results'] == results['results']
+    assert results['results']['nrun'] == 3
+
+
+def test_logs():
+    records = []
+
+    class Handler(logging.Handler):
+        def emit(self, record):
+            records.append(record.getMessage())
+
+    root_records = []
+
+    class RootHandler(logging.Handler):
+        def emit(self, record):
+            root_records.append(record.getMessage())
+
+    logger = logging.getLogger('artron')
+    handler = Handler(level=logging.ERROR)
+    logger.addHandler(handler)
+    root_handler = RootHandler(level=logging.ERROR)
+    logging.getLogger().addHandler(root_handler)
+    try:
+        manager = Manager(Builder(), nb_workers=1, max_retry=1)
+        manager.add(Task('task-id-3', {'msg': 'task-3-msg'}, 'builder_func_3'))
+        manager.start()
+    finally:
+        logger.removeHandler(handler)
+        logging.getLogger().removeHandler(root_handler)
+
+    if manager.logs is None:
+        return
+    # worker records are handled in this process, and propagated
+    assert any('ERROR builder_func_3' in record for record in records)
+    assert any('ERROR builder_func_3' in record for record in root_records)
+    assert manager.logs.empty()
+
+
+def test_lazy_server():
+    manager = Manager(Builder(), nb_workers=1)
+    manager.add(Task('task-id-4', {'msg': 'task-4-msg'}, 'builder_func_4'))
+
+    # listed without starting the server
+    assert not manager._connected
+    assert isinstance(manager.tasks, dict)
+    assert list(manager.tasks.keys()) == ['task-id-4']
+
+    results = manager.start()
+
+    assert manager._connected
+    assert results['exit_code'] == 0
+    assert manager.tasks['task-id-4'].state == Task.STATE_SUCCESS
+
+
+def test_lazy_import():
+    code = "import sys, artron; " \
+        "assert 'artron.manager' not in sys.modules; " \
+        "assert artron.Manager.__module__ == 'artron.manager'; " \
+        "assert 'http.server' not in sys.modules; " \
+        "assert 'logging.config' not in sys.modules"
+    if sys.version_info >= (3, 7):
+        subprocess.check_call([sys.executable, '-c', code])
+
+
+def test_reduce_edges():
+    manager = Manager(Builder(), nb_workers=2, sleep=0.1, reduce_edges=True)
+    task1 = Task('task-id-1', {'msg': 'task-1-msg'}, 'builder_func_4',
+                 require=['task-id-2', 'task-id-3', 'task-id-4'])
+    task2 = Task('task-id-2', {'msg': 'task-2-msg'}, 'builder_func_4',
+                 require=['task-id-4'])
+    task3 = Task('task-id-3', {'msg': 'task-3-msg'}, 'builder_func_4')
+    task4 = Task('task-id-4', {'msg': 'task-4-msg'}, 'builder_func_4')
+    manager.add_many([task1, task2, task3, task4])
+
+    results = manager.start()
+
+    assert results['exit_code'] == 0
+    assert results['results']['reduced'] == 1
+    assert manager.tasks['task-id-2'].date_end \
+        <= manager.tasks['task-id-1'].date_start
+
+
+def test_barrier():
+    manager = Manager(Builder(), nb_workers=4, sleep=0.1)
+    manager.add_many(
+        Task('extract-%d' % idx, {'msg': 'extract'}, 'builder_func_4')
+        for idx in range(6)
+    )
+    manager.add(Barrier('extracted',
+                        require=['extract-%d' % idx for idx in range(6)]))
+    manager.add_many(
+        Task('transform-%d' % idx, {'msg': 'transform'}, 'builder_func_4',
+             require=['extracted'])
+        for idx in range(8)
+    )
+
+    results = manager.start()
+
+    assert results['exit_code'] == 0
+    assert results['results']['success'] == 15
+    assert manager.metrics.completed == 14
+    last_extract = max(manager.tasks['extract-%d' % idx].date_end \
+        for idx in range(6))
+    assert all(manager.tasks['transform-%d' % idx].date_start >= last_extract
+               for idx in range(8))
+
+
+def test_coalesce():
+    manager = Manager(Builder(), nb_workers=2, sleep=0.1, coalesce=True)
+    manager.add_many([
+        Task('task-id-1', {'msg': 'same'}, 'builder_func_4'),
+        Task('task-id-2', {'msg': 'same'}, 'builder_func_4'),
+        Task('task-id-3', {'msg': 'other'}, 'builder_func_4',
+             require=['task-id-2']),
+        Task('task-id-4', {'msg': 'fail'}, 'builder_func_3'),
+        Task('task-id-5', {'msg': 'fail'}, 'builder_func_3'),
+        Task('task-id-6', {'msg': 'next'}, 'builder_func_4',
+             require=['task-id-5']),
+    ])
+
+    results = manager.start()
+
+    assert results['results']['coalesced'] == 2
+    assert results['results']['success'] == 3
+    assert results['results']['failures'] == 2
+    assert results['results']['deps'] == 1
+    assert manager.metrics.completed == 3
+    assert manager.aliases == {'task-id-2': 'task-id-1',
+                               'task-id-5': 'task-id-4'}
+    assert manager.tasks['task-id-2'].results \
+        == manager.tasks['task-id-1'].results
+    assert manager.tasks['task-id-3'].date_start \
+        >= manager.tasks['task-id-1'].date_end
+    assert manager.tasks['task-id-5'].state == Task.STATE_ERROR
+    assert manager.tasks['task-id-5'].results == 'ERROR builder_func_3'
+    assert manager.tasks['task-id-6'].state == Task.STATE_DEPENDENCY
+
+
+def test_coalesce_submit():
+    manager = Manager(Builder(), nb_workers=2, sleep=0.1, coalesce=True)
+    manager.add(Task('task-id-1', {'msg': 'same'}, 'builder_func_1'))
+    manager.map('copy', 'builder_func_1', [{'msg': 'same'}] * 3)
+
+    results = manager.start()
+
+    assert results['exit_code'] == 0
+    assert results['results']['coalesced'] == 3
+    assert manager.metrics.completed == 1
+
+
 if __name__ == '__main__':
     test_default()
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import threading
+
+import pytest
+
+from artron._py6 import PY2
+from artron.task import Task
+from artron.metrics import Metrics, MetricsExporter
+
+if PY2:
+    from urllib2 import urlopen
+else:
+    from urllib.request import urlopen
+
+
+def test_transition():
+    metrics = Metrics()
+    metrics.reset({
+        'tid1': Task('tid1', {}, 'func'),
+        'tid2': Task('tid2', {}, 'func'),
+    })
+    assert metrics.states[Task.STATE_INIT] == 2
+
+    metrics.transition(Task.STATE_INIT, Task.STATE_READY)
+    metrics.transition(Task.STATE_READY, Task.STATE_RUNNING)
+    assert metrics.states[Task.STATE_INIT] == 1
+    assert metrics.states[Task.STATE_READY] == 0
+    assert metrics.states[Task.STATE_RUNNING] == 1
+
+    # same state is a no-op
+    metrics.transition(Task.STATE_RUNNING, Task.STATE_RUNNING)
+    assert metrics.states[Task.STATE_RUNNING] == 1
+
+
+def test_observe():
+    metrics = Metrics(window=100)
+    for value in range(100):
+        metrics.observe('func', float(value), retry=1)
+    metrics.observe('other', 1.0, retry=3)
+
+    assert metrics.completed == 101
+    assert metrics.quantile('func', 0.95) == 95.0
+    assert metrics.quantile('missing', 0.95) == 0.0
+    assert metrics.retries == {'func': 0, 'other': 2}
+    assert metrics.durations_count['func'] == 100
+    assert len(metrics.durations['func']) == 100
+
+
+def test_render():
+    metrics = Metrics()
+    metrics.workers = 4
+    metrics.transition(Task.STATE_INIT, Task.STATE_READY)
+    metrics.observe('func', 2.0, retry=2)
+    metrics.queued = 7
+
+    text = metrics.render()
+    assert 'artron_tasks{state="ready"} 1' in text
+    # ready tasks not sent to workers yet
+    assert 'artron_ready_queue_depth 7' in text
+    assert 'artron_workers 4' in text
+    assert 'artron_task_retries_total{func="func"} 1' in text
+    assert 'artron_task_duration_seconds{func="func",quantile="0.95"} 2.0' \
+        in text
+    assert 'artron_task_duration_seconds_count{func="func"} 1' in text
+    assert text.endswith('\n')
+
+
+def test_render_concurrent():
+    metrics = Metrics(window=10)
+    errors = []
+
+    def scrape():
+        try:
+            for _ in range(200):
+                metrics.render()
+        except Exception as error: # pylint: disable=broad-except
+            errors.append(error)
+
+    thread = threading.Thread(target=scrape)
+    thread.start()
+    # new funcs and full windows while the exporter thread renders
+    for value in range(5000):
+        metrics.observe('func%d' % (value % 50), float(value))
+    thread.join()
+
+    assert not errors
+    assert metrics.completed == 5000
+
+
+def test_exporter_file(tmpdir):
+    path = str(tmpdir.join('artron.prom'))
+    metrics = Metrics()
+    exporter = MetricsExporter(metrics, path=path, interval=3600)
+
+    exporter.tick()
+    assert 'artron_workers 0' in open(path).read()
+
+    # interval not elapsed
+    metrics.workers = 2
+    exporter.tick()
+    assert 'artron_workers 0' in open(path).read()
+
+    exporter.stop()
+    assert 'artron_workers 2' in open(path).read()
+    assert os.listdir(str(tmpdir)) == ['artron.prom']
+
+
+def test_exporter_http():
+    metrics = Metrics()
+    metrics.workers = 3
+    exporter = MetricsExporter(metrics, port=0)
+    exporter.start()
+    try:
+        body = urlopen('http://127.0.0.1:%d/metrics' % exporter.port).read()
+        assert b'artron_workers 3' in body
+    finally:
+        exporter.stop()
+    assert exporter.server is None
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from artron.task import Task
+from artron.metrics import Metrics
+from artron.graph import GraphCycleError
+from artron.planner import plan, cost_hints
+
+
+def make_tasks():
+    # a -> b -> d, a -> c -> d, e alone
+    tasks = [
+        Task('a', {}, 'download'),
+        Task('b', {}, 'parse', require=['a']),
+        Task('c', {}, 'parse', require=['a']),
+        Task('d', {}, 'report', require=['b', 'c']),
+        Task('e', {}, 'parse'),
+    ]
+    return dict((task.tid, task) for task in tasks)
+
+
+def test_plan():
+    result = plan(make_tasks(), nb_workers=2)
+    assert [sorted(level) for level in result.levels] == \
+        [['a', 'e'], ['b', 'c'], ['d']]
+    assert result.widths == [2, 2, 1]
+    assert result.critical_path[0] == 'a'
+    assert result.critical_path[-1] == 'd'
+    assert result.length == 3.0
+    assert result.work == 5.0
+    assert result.makespan == 3.0
+
+    # serialized on one worker
+    assert plan(make_tasks(), nb_workers=1).makespan == 5.0
+    assert 'level 1: 2 tasks' in result.summary()
+
+
+def test_plan_costs():
+    tasks = make_tasks()
+    result = plan(tasks, nb_workers=2,
+                  costs={'download': 10, 'parse': 2, 'c': 5})
+    assert result.critical_path == ['a', 'c', 'd']
+    assert result.length == 16.0
+    assert result.makespan == 16.0
+
+    # finished tasks are not planned
+    tasks['a'].state = Task.STATE_SUCCESS
+    assert plan(tasks, nb_workers=2).widths == [3, 1]
+
+
+def test_plan_cycle():
+    tasks = make_tasks()
+    tasks['a'].require = ['d']
+    with pytest.raises(GraphCycleError):
+        plan(tasks)
+
+
+def test_cost_hints():
+    metrics = Metrics()
+    metrics.observe('parse', 1.0)
+    metrics.observe('parse', 3.0)
+    assert cost_hints(metrics) == {'parse': 2.0}
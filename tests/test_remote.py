@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+import os
+import collections
+
+import pytest
+
+from artron import remote
+
+
+def test_parse_address():
+    assert remote.parse_address('localhost:50000') == ('localhost', 50000)
+    assert remote.parse_address(':50000') == ('', 50000)
+
+    with pytest.raises(ValueError):
+        remote.parse_address('localhost')
+
+    with pytest.raises(ValueError):
+        remote.parse_address('localhost:port')
+
+
+def test_load_builder():
+    builder = remote.load_builder('collections:OrderedDict')
+    assert isinstance(builder, collections.OrderedDict)
+    assert remote.load_builder('os.path') is os.path
+    assert remote.load_builder('os:path') is os.path
+
+
+def test_main_authkey(monkeypatch):
+    monkeypatch.delenv('ARTRON_AUTHKEY', raising=False)
+    with pytest.raises(SystemExit):
+        remote.main(['--address', 'localhost:50000',
+                     '--builder', 'collections:OrderedDict'])
+
+
+def test_shared():
+    assert remote.get_queue() is remote.get_queue()
+    assert remote.get_tasks() is remote.get_tasks()
+    assert remote.get_events() is not remote.get_queue()
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+import json
+
+from artron.task import Task
+from artron.report import Report
+
+
+def read(path):
+    with open(path) as fd:
+        return [json.loads(line) for line in fd]
+
+
+def test_report(tmpdir):
+    path = str(tmpdir.join('run.jsonl'))
+    report = Report(path, chunk=2, interval=3600)
+    report.open()
+
+    report.write(Task('tid1', {'msg': 'msg'}, 'func'))
+    report.tick()
+    # buffered until the chunk is full
+    assert read(path) == []
+
+    report.write(Task('tid2', {'msg': 'msg'}, 'func'))
+    assert [line['tid'] for line in read(path)] == ['tid1', 'tid2']
+
+    report.write(Task('tid3', {'msg': 'msg'}, 'func'))
+    report.interval = 0
+    report.tick()
+    assert len(read(path)) == 3
+
+    report.close({'exit_code': 0})
+    lines = read(path)
+    assert lines[-1] == {'summary': {'exit_code': 0}}
+    assert report.count == 3
+
+    # closing twice is a no-op
+    report.close({'exit_code': 1})
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from artron.task import Task, Barrier
+from artron.scheduler import Scheduler, LazyTasks
+
+
+def make_tasks():
+    task1 = Task('tid1', {}, 'func', require=['tid2', 'tid3'])
+    task2 = Task('tid2', {}, 'func', require=['tid4'])
+    task3 = Task('tid3', {}, 'func')
+    task4 = Task('tid4', {}, 'func')
+    return dict((task.tid, task) for task in (task1, task2, task3, task4))
+
+
+def run(scheduler, task_id, state=Task.STATE_SUCCESS):
+    scheduler.states[task_id] = state
+    return scheduler.finish(task_id, state)
+
+
+def test_load():
+    scheduler = Scheduler()
+    assert scheduler.load(make_tasks()) == []
+    assert scheduler.pending == 4
+    assert sorted(entry[2] for entry in scheduler.ready) == ['tid3', 'tid4']
+    assert scheduler.childs == {
+        'tid2': ['tid1'],
+        'tid3': ['tid1'],
+        'tid4': ['tid2'],
+    }
+
+
+def test_load_finished():
+    tasks = make_tasks()
+    tasks['tid4'].state = Task.STATE_SUCCESS
+    tasks['tid3'].state = Task.STATE_ERROR
+
+    scheduler = Scheduler()
+    assert scheduler.load(tasks) == [('tid1', ['tid2'])]
+    assert scheduler.pending == 1
+    assert scheduler.pop() == 'tid2'
+
+
+def test_finish():
+    scheduler = Scheduler()
+    scheduler.load(make_tasks())
+
+    assert scheduler.pop() == 'tid3'
+    assert scheduler.pop() == 'tid4'
+    assert scheduler.pop() is None
+
+    assert run(scheduler, 'tid4') == []
+    assert scheduler.pop() == 'tid2'
+    assert run(scheduler, 'tid3') == []
+    assert scheduler.pop() is None
+    assert run(scheduler, 'tid2') == []
+    assert scheduler.pop() == 'tid1'
+    assert run(scheduler, 'tid1') == []
+    assert scheduler.pending == 0
+
+
+def test_finish_error():
+    scheduler = Scheduler()
+    scheduler.load(make_tasks())
+    scheduler.pop()
+    scheduler.pop()
+
+    assert run(scheduler, 'tid4', Task.STATE_ERROR) == [
+        ('tid2', []),
+        ('tid1', ['tid3']),
+    ]
+    # tid1 already failed by tid2
+    assert run(scheduler, 'tid3') == []
+    assert scheduler.pop() is None
+    assert scheduler.pending == 0
+
+
+def test_add_link():
+    scheduler = Scheduler()
+    scheduler.load(make_tasks())
+    scheduler.pop()
+    scheduler.pop()
+
+    assert scheduler.add('tid5', ['tid3']) == []
+    assert scheduler.pending == 5
+    assert scheduler.link('tid1', 'tid5')
+    assert scheduler.requires['tid1'] == ['tid2', 'tid3', 'tid5']
+
+    # running task could not wait
+    assert not scheduler.link('tid4', 'tid5')
+    # cycle
+    assert not scheduler.link('tid5', 'tid1')
+    # self loop
+    assert not scheduler.link('tid5', 'tid5')
+
+    run(scheduler, 'tid3')
+    assert scheduler.pop() == 'tid5'
+    run(scheduler, 'tid4')
+    assert scheduler.pop() == 'tid2'
+    run(scheduler, 'tid2')
+    assert scheduler.pop() is None
+    run(scheduler, 'tid5')
+    assert scheduler.pop() == 'tid1'
+
+
+def test_link_ready():
+    scheduler = Scheduler()
+    scheduler.load(make_tasks())
+    scheduler.add('tid5', ['tid1'])
+
+    # tid3 is ready but not sent yet
+    assert scheduler.link('tid3', 'tid4')
+    assert scheduler.pop() == 'tid4'
+    assert scheduler.pop() is None
+    run(scheduler, 'tid4')
+    assert sorted([scheduler.pop(), scheduler.pop()]) == ['tid2', 'tid3']
+
+
+def test_lazy_tasks():
+    lazy = LazyTasks(
+        (Task('tid-%d' % idx, {}, 'func') for idx in range(5)),
+        window=2,
+        require=['tid-parent'],
+    )
+    assert lazy.active
+
+    # requirement not finished
+    assert lazy.take({}) == []
+    assert lazy.take({'tid-parent': Task.STATE_RUNNING}) == []
+
+    states = {'tid-parent': Task.STATE_SUCCESS}
+    assert [task.tid for task in lazy.take(states)] == ['tid-0', 'tid-1']
+    assert lazy.take(states) == []
+
+    lazy.done()
+    assert [task.tid for task in lazy.take(states)] == ['tid-2']
+    lazy.done()
+    lazy.done()
+    assert [task.tid for task in lazy.take(states)] == ['tid-3', 'tid-4']
+    assert lazy.take(states) == []
+
+    lazy.done()
+    assert lazy.take(states) == []
+    assert lazy.exhausted
+    assert lazy.active
+
+    lazy.done()
+    assert not lazy.active
+    assert lazy.created == 5
+
+
+def test_lazy_tasks_failed():
+    lazy = LazyTasks(iter([Task('tid', {}, 'func')]), window=2,
+                     require=['tid-parent'])
+    assert lazy.take({'tid-parent': Task.STATE_ERROR}) == []
+    assert lazy.failed == 'tid-parent'
+    assert not lazy.active
+
+
+def test_priority():
+    scheduler = Scheduler(aging=10)
+    scheduler.add('low', [])
+    scheduler.add('high', [], priority=2)
+    scheduler.add('mid', [], priority=1)
+    assert [scheduler.pop() for _ in range(3)] == ['high', 'mid', 'low']
+    assert scheduler.priorities == {}
+
+
+def test_priority_aging():
+    scheduler = Scheduler(aging=10)
+    scheduler.add('old', [])
+    # high priority tasks made ready after 'old' go first...
+    for idx in range(9):
+        scheduler.add('high-%d' % idx, [], priority=1)
+    assert scheduler.pop() == 'high-0'
+    # ...until they waited long enough
+    scheduler.add('late', [], priority=1)
+    for idx in range(8):
+        assert scheduler.pop().startswith('high-')
+    assert scheduler.pop() == 'old'
+    assert scheduler.pop() == 'late'
+
+
+def test_priority_many():
+    scheduler = Scheduler()
+    for idx in range(100000):
+        scheduler.add('tid-%d' % idx, [], priority=idx % 3)
+    assert scheduler.pop() == 'tid-2'
+    assert len(scheduler.ready) == 99999
+
+
+def test_barrier():
+    tasks = dict(('extract-%d' % idx, Task('extract-%d' % idx, {}, 'func')) \
+        for idx in range(200))
+    tasks['extracted'] = Barrier('extracted', require=list(tasks) * 2)
+    for idx in range(300):
+        tasks['transform-%d' % idx] = Task('transform-%d' % idx, {}, 'func',
+                                           require=['extracted'])
+
+    scheduler = Scheduler()
+    assert scheduler.load(tasks) == []
+    assert scheduler.barriers == set(['extracted'])
+    # N + M edges
+    assert sum(len(childs) for childs in scheduler.childs.values()) == 500
+    assert scheduler.link('extracted', 'extract-0')
+
+    for idx in range(200):
+        assert scheduler.pop() == 'extract-%d' % idx
+        run(scheduler, 'extract-%d' % idx)
+    assert scheduler.pop() == 'extracted'
+    assert scheduler.pop() is None
+
+    run(scheduler, 'extracted')
+    assert scheduler.barriers == set()
+    assert len([scheduler.pop() for _ in range(300)]) == 300
+
+
+def test_barrier_failed():
+    tasks = {
+        'tid1': Task('tid1', {}, 'func'),
+        'tid2': Task('tid2', {}, 'func'),
+        'stage': Barrier('stage', require=['tid1', 'tid2']),
+        'tid3': Task('tid3', {}, 'func', require=['stage']),
+    }
+    scheduler = Scheduler()
+    scheduler.load(tasks)
+    failed = run(scheduler, 'tid1', Task.STATE_ERROR)
+    assert failed == [('stage', ['tid2']), ('tid3', [])]
+    assert scheduler.barriers == set()
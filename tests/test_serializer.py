@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+import pickle
+
+import pytest
+
+from artron.serializer import Serializer, PickleSerializer, Packed, PROTOCOL
+
+
+def test_serializer():
+    with pytest.raises(NotImplementedError):
+        Serializer().dumps({})
+    with pytest.raises(NotImplementedError):
+        Serializer().loads(b'')
+
+
+def test_pickle_serializer():
+    serializer = PickleSerializer()
+    obj = {'n': 1, 'key': ('a', None), 'small': b'xx'}
+    packed = serializer.dumps(obj)
+    assert isinstance(packed, Packed)
+    assert packed.buffers == []
+    assert serializer.loads(packed) == obj
+
+
+@pytest.mark.skipif(PROTOCOL < 5, reason="requires pickle protocol 5")
+def test_pickle_serializer_out_of_band():
+    serializer = PickleSerializer(threshold=1024)
+    payload = bytearray(b'x' * 4096)
+    obj = {'data': payload, 'parts': [b'y' * 2048, b'z']}
+    packed = serializer.dumps(obj)
+
+    # large payloads are not copied in the pickle
+    assert len(packed.header) < 1024
+    assert [len(buf) for buf in packed.buffers] == [4096, 2048]
+    assert len(packed) == len(packed.header) + 4096 + 2048
+
+    # sent through a process boundary with any protocol
+    for protocol in (2, PROTOCOL):
+        buffers = []
+        kwargs = {'buffer_callback': buffers.append} if protocol >= 5 else {}
+        data = pickle.dumps(packed, protocol=protocol, **kwargs)
+        received = pickle.loads(data, buffers=buffers)
+        loaded = serializer.loads(received)
+        assert loaded == obj
+        assert type(loaded['data']) is bytearray
+        assert type(loaded['parts'][0]) is bytes
+
+
+def test_pickle_serializer_protocol():
+    serializer = PickleSerializer(protocol=2)
+    packed = serializer.dumps({'data': b'x' * 100000})
+    assert packed.buffers == []
+    assert serializer.loads(packed) == {'data': b'x' * 100000}
@@ -5,7 +5,7 @@ import pytest
 from mock import patch, MagicMock
 
 from artron import _py6
-from artron.task import TaskDependenciesError, Task
+from artron.task import TaskDependenciesError, Task, Result, Barrier
 
 
 task = Task("tid", {"for": "bar"}, "func")
@@ -201,3 +201,66 @@ def test_update_childs_loop():
     }
 
     list(task1.update_childs(tasks))
+
+
+def test_result():
+    task_r = Task("tid3", {"path": Result("tid1", "path"), "n": 1}, "func",
+                  require=["tid2"])
+    assert task_r.references() == ["tid1"]
+    assert task_r.require == ["tid2", "tid1"]
+    assert "Result('tid1', 'path')" in repr(task_r)
+
+    task_r.require = []
+    builder = MagicMock()
+    task_r.run(builder, 1, values={"tid1": {"path": "/tmp/file"}})
+    builder.func.assert_called_once_with(retry=1, path="/tmp/file", n=1)
+    assert task_r.state == Task.STATE_SUCCESS
+
+    # missing value fails the task
+    task_r.run(builder, 1)
+    assert task_r.state == Task.STATE_ERROR
+
+
+def test_barrier():
+    barrier = Barrier('stage', require=['tid1'])
+    assert barrier.func is None and barrier.inputs == {}
+
+    with pytest.raises(TaskDependenciesError):
+        barrier.run(None, retry=1)
+
+    barrier.require = []
+    barrier.run(None, retry=1)
+    assert barrier.state == Task.STATE_SUCCESS
+    assert barrier.date_end is not None
+
+
+def test_signature():
+    task1 = Task('tid1', {'a': 1, 'b': Result('tid0')}, 'func')
+    task2 = Task('tid2', {'b': Result('tid0'), 'a': 1}, 'func',
+                 require=['tid3'])
+    assert task1.signature() == task2.signature()
+    assert task1.signature() != Task('tid3', {'a': 2}, 'func').signature()
+    assert task1.signature() != Task('tid4', {'a': 1}, 'other').signature()
+    # keys which can't be sorted
+    assert Task('tid5', {1: 1, 'a': 1}, 'func').signature() is None
+
+
+def test_signature_plain_json():
+    class Cfg(object):
+        def __init__(self, value):
+            self.value = value
+
+        def __repr__(self):
+            return 'Cfg(...)'
+
+    # not hashed from their repr
+    assert Task('tid1', {'x': Cfg(1)}, 'func').signature() is None
+    assert Task('tid2', {'x': b'abc'}, 'func').signature() is None
+    assert Task('tid3', {'x': (1, 2)}, 'func').signature() is None
+    assert Task('tid4', {'x': {1: 'a'}}, 'func').signature() is None
+
+    values = [1, 1.0, True, '1', [1], {'1': 1}, Result('tid0'),
+              ['result', 'tid0', None], "Result('tid0')"]
+    signatures = set(Task('tid', {'x': value}, 'func').signature()
+                     for value in values)
+    assert len(signatures) == len(values)
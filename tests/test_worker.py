@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 import json
 import time
+import threading
 import multiprocessing
 
 import pytest
@@ -9,7 +10,8 @@ import mock
 
 from artron import _py6
 from artron.worker import Worker
-from artron.task import TaskDependenciesError, Task
+from artron.task import TaskDependenciesError, Task, Result
+from artron.serializer import PickleSerializer
 
 class Builder(object):
     
@@ -267,3 +269,127 @@ def test_worker_loop(is_alive):
 
     assert is_alive.call_count == 1
 
+
+
+@patch('artron.worker.Worker.is_alive', return_value=True)
+def test_worker_steal(is_alive):
+    mng = multiprocessing.Manager()
+
+    task1 = Task('task-id-1', {'msg': 'task-1-msg'}, 'builder_func_1')
+    task2 = Task('task-id-2', {'msg': 'task-2-msg'}, 'builder_func_1')
+    tasks = mng.dict({task1.tid: task1, task2.tid: task2})
+
+    own = mng.Queue()
+    peer = mng.Queue()
+
+    worker = Worker(
+        builder=Builder(),
+        queue=own,
+        tasks=tasks,
+        name="worker1",
+        max_retry=1,
+        lock=mng.RLock(),
+        peers=[peer],
+        steal_interval=0.01,
+    )
+
+    # nothing to steal
+    assert worker.steal() == (None, None)
+
+    # end-of-queue marker of the peer is not stolen
+    peer.put((None,))
+    assert worker.steal() == (None, None)
+    assert peer.get_nowait() == (None,)
+    peer.task_done()
+
+    peer.put((task1.tid,))
+    peer.put((task2.tid,))
+    peer.put((None,))
+
+    # own queue stays empty until both tasks are stolen
+    timer = threading.Timer(1, own.put, ((None,),))
+    timer.start()
+    worker.run()
+    timer.join()
+
+    assert tasks[task1.tid].state == Task.STATE_SUCCESS
+    assert tasks[task2.tid].state == Task.STATE_SUCCESS
+    # own marker consumed, peer marker left
+    assert own.empty()
+    assert peer.get_nowait() == (None,)
+
+
+@patch('artron.worker.Worker.is_alive', return_value=True)
+def test_worker_prefetch(is_alive):
+    mng = multiprocessing.Manager()
+
+    task1 = Task('task-id-1', {'msg': 'task-1-msg'}, 'builder_func_1')
+    task2 = Task('task-id-2', {'msg': 'task-2-msg'}, 'builder_func_1')
+    task3 = Task('task-id-3', {'msg': 'task-3-msg'}, 'builder_func_1')
+    tasks = mng.dict({task1.tid: task1, task2.tid: task2, task3.tid: task3})
+
+    worker = Worker(
+        builder=Builder(),
+        queue=mng.Queue(),
+        tasks=tasks,
+        name="worker1",
+        max_retry=1,
+        lock=mng.RLock(),
+        prefetch=2,
+    )
+    for task in (task1, task2, task3):
+        worker.queue.put((task.tid,))
+    worker.queue.put((None,))
+
+    worker.run()
+
+    for task in (task1, task2, task3):
+        assert tasks[task.tid].state == Task.STATE_SUCCESS
+    assert worker.queue.empty()
+
+
+@patch('artron.worker.Worker.is_alive', return_value=True)
+def test_worker_dataflow(is_alive):
+    mng = multiprocessing.Manager()
+
+    task1 = Task('task-id-1', {'msg': 'task-1-msg'}, 'builder_func_1')
+    task2 = Task('task-id-2', {'msg': Result(task1.tid)}, 'builder_func_1')
+    task3 = Task('task-id-3', {'msg': Result('task-id-0')}, 'builder_func_1')
+    task2.require = task3.require = []
+    tasks = mng.dict({task1.tid: task1, task2.tid: task2, task3.tid: task3})
+
+    worker = Worker(
+        builder=Builder(),
+        queue=mng.Queue(),
+        tasks=tasks,
+        name="worker1",
+        max_retry=1,
+        lock=mng.RLock(),
+        events=mng.Queue(),
+    )
+    worker.queue.put((task1.tid, {'publish': True}))
+    # task1 results from the cache, task-id-0 sent by the manager
+    worker.queue.put((task2.tid,))
+    worker.queue.put((task3.tid, {
+        'values': {'task-id-0': PickleSerializer().dumps('sent')},
+    }))
+    worker.queue.put((None,))
+
+    worker.run()
+
+    assert list(worker.cache) == [task1.tid]
+    # published results are only sent with the event
+    assert tasks[task1.tid].results is None
+    assert tasks[task2.tid].results == \
+        "builder_func_1 ==> builder_func_1 ==> task-1-msg"
+    assert tasks[task3.tid].results == "builder_func_1 ==> sent"
+
+    events = [worker.events.get_nowait() for _ in range(6)]
+    info = events[1][2]
+    assert worker.serializer.loads(info.pop('results')) == \
+        "builder_func_1 ==> task-1-msg"
+    assert events[1] == (task1.tid, Task.STATE_SUCCESS, {
+        'worker': 'worker1', 'func': 'builder_func_1', 'retry': 1,
+        'duration': tasks[task1.tid].time_duration,
+    })
+    assert 'results' not in events[3][2]